@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        for number in range(15):
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Тестовый пост #{number}',
+            )
+        cls.post = Post.objects.first()
+        for number in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий #{number}')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_cursor_pagination_walks_all_posts(self):
+        """Курсоры проходят по всем постам без пропусков и повторов."""
+        ids = []
+        params = {'limit': 4}
+        while True:
+            data = self.client.get(reverse('api:post_list'), params).json()
+            ids += [post['id'] for post in data['results']]
+            if data['next'] is None:
+                break
+            params['cursor'] = data['next']
+        self.assertEqual(
+            ids, list(Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True)))
+
+    def test_sparse_fieldsets(self):
+        """Клиент получает только запрошенные поля."""
+        data = self.client.get(
+            reverse('api:post_detail', kwargs={'post_id': self.post.id}),
+            {'fields': 'id,author'},
+        ).json()
+        self.assertEqual(data, {'id': self.post.id, 'author': 'Author'})
+
+    def test_unknown_field_and_bad_cursor(self):
+        """Неверные параметры дают ответ 400."""
+        address = reverse('api:post_list')
+        for params in ({'fields': 'password'}, {'cursor': 'broken'}):
+            with self.subTest(params=params):
+                response = self.client.get(address, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_comments_in_chronological_order(self):
+        data = self.client.get(reverse(
+            'api:comment_list', kwargs={'post_id': self.post.id})).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['results']],
+            ['Комментарий #0', 'Комментарий #1', 'Комментарий #2'],
+        )
+
+    def test_profile_and_group(self):
+        profile = self.client.get(reverse(
+            'api:profile', kwargs={'username': 'Author'})).json()
+        self.assertEqual(profile['posts_count'], 15)
+        groups = self.client.get(reverse('api:group_list')).json()
+        self.assertEqual(groups['results'][0]['slug'], self.group.slug)
+        response = self.client.get(reverse(
+            'api:group_detail', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_follow_feed(self):
+        """Лента подписок доступна только авторизованному пользователю."""
+        response = self.client.get(reverse('api:follow_feed'))
+        self.assertEqual(response.status_code, 401)
+        Follow.objects.create(user=self.user, author=self.author)
+        data = self.authorized_client.get(
+            reverse('api:follow_feed'), {'limit': 100}).json()
+        self.assertEqual(len(data['results']), 15)
+
+    def test_bulk_follow_and_unfollow(self):
+        """Подписки меняются пачкой, лишние имена игнорируются."""
+        for number in range(3):
+            User.objects.create_user(username=f'Writer{number}')
+        address = reverse('api:follow_authors')
+        response = self.authorized_client.post(
+            address,
+            {'follow': ['Author', 'Writer0', 'Writer1', 'User', 'Nobody']},
+            content_type='application/json',
+        )
+        self.assertEqual(
+            response.json(), {'following': ['Author', 'Writer0', 'Writer1']})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.post(
+                address,
+                {'follow': ['Author', 'Writer2'], 'unfollow': ['Writer0']},
+                content_type='application/json',
+            )
+        # Считаются только запросы к подпискам: сессия, пользователь и
+        # прочее middleware к операции не относятся. Пачка подписок -
+        # один INSERT, отписок - один DELETE, плюс чтение итогового списка.
+        follow_queries = [
+            query['sql'] for query in queries
+            if Follow._meta.db_table in query['sql']
+        ]
+        self.assertEqual(len(follow_queries), 3)
+        self.assertEqual(
+            response.json(), {'following': ['Author', 'Writer1', 'Writer2']})
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 3)
+
+    def test_bulk_follow_errors(self):
+        """Неверное тело запроса даёт 400, аноним получает 401."""
+        address = reverse('api:follow_authors')
+        response = self.client.post(
+            address, {'follow': ['Author']}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        for body in ('broken', '[]', '{"follow": "Author"}'):
+            with self.subTest(body=body):
+                response = self.authorized_client.post(
+                    address, body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
@@ -0,0 +1,145 @@
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_http_methods
+
+from core import pagination
+
+
+class ApiError(Exception):
+    """Ошибка в параметрах запроса, отдаётся клиенту со статусом 400."""
+
+
+def json_response(data, status=200):
+    return JsonResponse(
+        data,
+        status=status,
+        json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False},
+    )
+
+
+def api_view(view_func=None, methods=('GET',)):
+    """Отдаёт ошибки представления API в виде JSON."""
+    if view_func is None:
+        return lambda func: api_view(func, methods)
+
+    @require_http_methods(list(methods))
+    @wraps(view_func)
+    def wrapped_view(request, *args, **kwargs):
+        try:
+            return view_func(request, *args, **kwargs)
+        except ApiError as error:
+            return json_response({'error': str(error)}, status=400)
+        except Http404:
+            return json_response({'error': 'Не найдено'}, status=404)
+    return wrapped_view
+
+
+def parse_json(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        raise ApiError('Тело запроса должно быть JSON')
+    if not isinstance(data, dict):
+        raise ApiError('Тело запроса должно быть объектом JSON')
+    return data
+
+
+def parse_usernames(data, key, limit):
+    usernames = data.get(key, [])
+    if not isinstance(usernames, list) or not all(
+            isinstance(username, str) for username in usernames):
+        raise ApiError(f'{key} должен быть списком имён пользователей')
+    if len(usernames) > limit:
+        raise ApiError(f'{key}: не больше {limit} имён за запрос')
+    return usernames
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+CONVERTERS = {
+    'image': image_url,
+}
+
+
+def parse_fields(request, available):
+    """Возвращает поля из ?fields=a,b или все доступные поля."""
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(available)
+    fields = fields.split(',')
+    unknown = set(fields) - set(available)
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return fields
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.AMOUNT_POSTS))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    return max(1, min(limit, settings.API_MAX_LIMIT))
+
+
+def decode_cursor(cursor):
+    try:
+        return pagination.decode_cursor(cursor)
+    except ValueError as error:
+        raise ApiError(str(error))
+
+
+def serialize(rows, fields):
+    """Собирает словари из кортежей values_list без создания моделей."""
+    converters = [CONVERTERS.get(field) for field in fields]
+    results = []
+    for row in rows:
+        item = {}
+        for field, converter, value in zip(fields, converters, row):
+            item[field] = converter(value) if converter else value
+        results.append(item)
+    return results
+
+
+def serialize_object(queryset, available, request):
+    fields = parse_fields(request, available)
+    row = queryset.values_list(*(available[field] for field in fields))
+    row = row.first()
+    if row is None:
+        raise Http404
+    return serialize([row], fields)[0]
+
+
+def paginate(request, queryset, available, date_field, descending=True):
+    """Курсорная пагинация по (date_field, id).
+
+    В отличие от OFFSET, стоимость страницы не растёт с её номером,
+    а новые записи не сдвигают уже полученные клиентом страницы.
+    """
+    fields = parse_fields(request, available)
+    limit = parse_limit(request)
+    sign, lookup = ('-', 'lt') if descending else ('', 'gt')
+    queryset = queryset.order_by(f'{sign}{date_field}', f'{sign}id')
+    cursor = request.GET.get('cursor')
+    if cursor:
+        date, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__{lookup}': date})
+            | Q(**{date_field: date, f'id__{lookup}': pk})
+        )
+    paths = [available[field] for field in fields]
+    rows = list(queryset.values_list(*paths, date_field, 'id')[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = pagination.encode_cursor(*rows[-1][-2:])
+    return {
+        'results': serialize(rows, fields),
+        'next': next_cursor,
+    }
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import Comment, Follow, Group, Post, User
+from .utils import (api_view, json_response, paginate, parse_fields,
+                    parse_json, parse_usernames, serialize, serialize_object)
+
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+}
+GROUP_FIELDS = {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+PROFILE_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'posts_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+    'parent': 'parent_id',
+}
+
+
+@api_view
+def post_list(request):
+    posts = Post.objects.all()
+    if 'group' in request.GET:
+        posts = posts.filter(group__slug=request.GET['group'])
+    if 'author' in request.GET:
+        posts = posts.filter(author__username=request.GET['author'])
+    return json_response(paginate(request, posts, POST_FIELDS, 'pub_date'))
+
+
+@api_view
+def post_detail(request, post_id):
+    post = serialize_object(
+        Post.objects.filter(id=post_id), POST_FIELDS, request)
+    return json_response(post)
+
+
+@api_view
+def comment_list(request, post_id):
+    if not Post.objects.filter(id=post_id).exists():
+        return json_response({'error': 'Не найдено'}, status=404)
+    comments = Comment.objects.filter(post_id=post_id)
+    return json_response(paginate(
+        request, comments, COMMENT_FIELDS, 'created', descending=False))
+
+
+@api_view
+def group_list(request):
+    fields = parse_fields(request, GROUP_FIELDS)
+    groups = Group.objects.order_by('title').values_list(
+        *(GROUP_FIELDS[field] for field in fields))
+    return json_response({'results': serialize(groups, fields)})
+
+
+@api_view
+def group_detail(request, slug):
+    group = serialize_object(
+        Group.objects.filter(slug=slug), GROUP_FIELDS, request)
+    return json_response(group)
+
+
+@api_view
+def profile(request, username):
+    profile = serialize_object(
+        User.objects.filter(username=username).annotate(
+            posts_count=Count('posts')),
+        PROFILE_FIELDS,
+        request,
+    )
+    return json_response(profile)
+
+
+@api_view
+def follow_feed(request):
+    if not request.user.is_authenticated:
+        return json_response({'error': 'Требуется авторизация'}, status=401)
+    posts = Post.objects.filter(author__following__user=request.user)
+    return json_response(paginate(request, posts, POST_FIELDS, 'pub_date'))
+
+
+@api_view(methods=('GET', 'POST'))
+def follow_authors(request):
+    """Подписки пользователя; POST меняет их пачкой.
+
+    Тело POST: {"follow": [...], "unfollow": [...]} со списками имён.
+    В ответе - итоговый отсортированный список подписок.
+    """
+    if not request.user.is_authenticated:
+        return json_response({'error': 'Требуется авторизация'}, status=401)
+    if request.method == 'POST':
+        data = parse_json(request)
+        limit = settings.API_MAX_LIMIT
+        follow = parse_usernames(data, 'follow', limit)
+        unfollow = parse_usernames(data, 'unfollow', limit)
+        with transaction.atomic():
+            if unfollow:
+                Follow.objects.unfollow(request.user, unfollow)
+            if follow:
+                Follow.objects.follow(request.user, follow)
+    following = Follow.objects.following_usernames(request.user)
+    return json_response({'following': sorted(following)})
@@ -0,0 +1,9 @@
+from django.conf import settings
+
+
+def pytest_configure(config):
+    # Быстрый хешер паролей для тестов, как при manage.py test.
+    settings.TESTING = True
+    settings.PASSWORD_HASHER = 'md5'
+    settings.PASSWORD_HASHERS = [
+        settings.PASSWORD_HASHER_CHOICES['md5'], *settings.PASSWORD_HASHERS]
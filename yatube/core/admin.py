@@ -0,0 +1,68 @@
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import RequestProfile
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Самые медленные из профилированных запросов.
+
+    Файл стеков открывается в flamegraph.pl или speedscope.
+    """
+
+    list_display = (
+        'path',
+        'method',
+        'view_name',
+        'status_code',
+        'duration',
+        'sql_count',
+        'sql_time',
+        'template_time',
+        'created',
+        'flame_graph',
+    )
+    list_filter = ('view_name', 'created')
+    search_fields = ('path',)
+    ordering = ('-duration',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Стеки')
+    def flame_graph(self, profile):
+        url = reverse('admin:core_requestprofile_folded', args=[profile.pk])
+        return format_html('<a href="{}">{}.folded</a>', url, profile.pk)
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:profile_id>/folded/',
+                self.admin_site.admin_view(self.folded),
+                name='core_requestprofile_folded',
+            ),
+        ] + super().get_urls()
+
+    def folded(self, request, profile_id):
+        if not self.has_view_permission(request):
+            raise Http404
+        profile = get_object_or_404(RequestProfile, pk=profile_id)
+        try:
+            file = open(profile.folded_path(), 'rb')
+        except FileNotFoundError:
+            raise Http404
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename=f'{profile.pk}.folded',
+            content_type='text/plain; charset=utf-8',
+        )
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
@@ -0,0 +1,74 @@
+import asyncio
+import time
+from urllib.parse import parse_qs
+
+from django.conf import settings
+
+from .events import (AsyncSubscription, format_event, get_broker,
+                     parse_channels, stream_start)
+from .views import EVENT_STREAM_HEADERS
+
+
+class EventStreamMiddleware:
+    """Отдаёт поток событий EVENTS_PATH прямо из цикла событий.
+
+    ASGI-обработчик Django 3.2 читает потоковый ответ синхронно и
+    заблокировал бы цикл на всё время соединения, поэтому запросы к
+    EVENTS_PATH обрабатываются здесь, остальные передаются Django.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != settings.EVENTS_PATH:
+            return await self.app(scope, receive, send)
+        query = parse_qs(scope['query_string'].decode())
+        try:
+            channels = parse_channels(query.get('channels', [''])[0])
+        except ValueError as error:
+            return await self.respond(send, 400, str(error))
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (name.lower().encode(), value.encode())
+                for name, value in EVENT_STREAM_HEADERS.items()
+            ],
+        })
+        broker = get_broker()
+        subscription = AsyncSubscription(channels)
+        broker.subscribe(subscription)
+        disconnect = asyncio.ensure_future(self.wait_disconnect(receive))
+        deadline = time.monotonic() + settings.EVENTS_STREAM_TIMEOUT
+        try:
+            await self.send_body(send, stream_start())
+            while time.monotonic() < deadline and not disconnect.done():
+                event = await subscription.get(settings.EVENTS_HEARTBEAT)
+                await self.send_body(send, format_event(event))
+            await self.send_body(send, '', more_body=False)
+        finally:
+            broker.unsubscribe(subscription)
+            disconnect.cancel()
+
+    @staticmethod
+    async def wait_disconnect(receive):
+        # Сначала приходят сообщения http.request с телом запроса.
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    @staticmethod
+    async def send_body(send, text, more_body=True):
+        await send({
+            'type': 'http.response.body',
+            'body': text.encode(),
+            'more_body': more_body,
+        })
+
+    async def respond(self, send, status, text):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'text/plain; charset=utf-8')],
+        })
+        await self.send_body(send, text, more_body=False)
@@ -0,0 +1,107 @@
+import time
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.core.cache import cache
+from django.db import transaction
+
+
+def generation_key(scope):
+    return f'gen:{scope}'
+
+
+def get_generations(scopes):
+    """Возвращает номера поколений для областей кеша.
+
+    Поколение меняется при каждой инвалидации области, поэтому его
+    включают в ключи кеша страниц и в валидаторы ответов.
+    """
+    keys = {generation_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    for key, generation in missing.items():
+        if not cache.add(key, generation, None):
+            generation = cache.get(key, generation)
+        found[key] = generation
+    return {keys[key]: generation for key, generation in found.items()}
+
+
+def get_generation(scope):
+    return get_generations([scope])[scope]
+
+
+class InvalidationCollector:
+    """Собирает ключи кеша, которые нужно сбросить после записи.
+
+    Ключи копятся в пределах запроса (см. batch) или транзакции,
+    дедуплицируются и удаляются одним delete_many после коммита.
+    Ключи, вычисление которых требует запросов к базе, передаются
+    функциями и вычисляются один раз при сбросе.
+    """
+
+    def __init__(self):
+        self._local = Local()
+
+    @property
+    def _state(self):
+        if not hasattr(self._local, 'keys'):
+            self._local.keys = set()
+            self._local.resolvers = {}
+            self._local.depth = 0
+        return self._local
+
+    def add(self, *keys):
+        self._state.keys.update(keys)
+        self._schedule()
+
+    def add_lazy(self, token, resolver):
+        """Добавляет ключи, которые вернёт resolver() при сбросе.
+
+        Повторные вызовы с тем же token вычисляются один раз.
+        """
+        self._state.resolvers.setdefault(token, resolver)
+        self._schedule()
+
+    def invalidate(self, *scopes):
+        self.add(*(generation_key(scope) for scope in scopes))
+
+    @contextmanager
+    def batch(self):
+        """Откладывает сброс до выхода из блока (и коммита)."""
+        self.start_batch()
+        try:
+            yield self
+        finally:
+            self.end_batch()
+
+    def start_batch(self):
+        self._state.depth += 1
+
+    def end_batch(self):
+        self._state.depth -= 1
+        self._schedule()
+
+    def has_pending(self):
+        state = self._state
+        return bool(state.keys or state.resolvers)
+
+    def _schedule(self):
+        state = self._state
+        if state.depth or not (state.keys or state.resolvers):
+            return
+        connection = transaction.get_connection()
+        if any(func == self.flush for _, func in connection.run_on_commit):
+            return
+        transaction.on_commit(self.flush)
+
+    def flush(self):
+        state = self._state
+        keys, state.keys = state.keys, set()
+        resolvers, state.resolvers = state.resolvers, {}
+        for resolver in resolvers.values():
+            keys.update(resolver())
+        if keys:
+            cache.delete_many(keys)
+
+
+invalidation = InvalidationCollector()
@@ -0,0 +1,13 @@
+from functools import partial
+
+from posts.notifications import get_unread_count
+
+
+def notifications(request):
+    """Добавляет число непрочитанных уведомлений.
+
+    Число вычисляется, только если шаблон его выводит.
+    """
+    return {
+        'unread_notifications': partial(get_unread_count, request.user)
+    }
@@ -0,0 +1,262 @@
+"""События в реальном времени для браузеров (server-sent events).
+
+Код, который что-то опубликовал, вызывает publish(каналы, тип, данные);
+после коммита событие получают все открытые потоки, подписанные хотя бы
+на один из каналов. Доставку выполняет брокер EVENTS_BACKEND:
+
+* LocalBroker - только потокам текущего процесса;
+* DatabaseBroker - потокам всех процессов: события пишутся в таблицу,
+  а каждый процесс забирает новые строки пачками раз в
+  EVENTS_POLL_INTERVAL секунд, сколько бы клиентов к нему ни было
+  подключено.
+
+Клиенту, который не успевает читать поток, лишние события не
+доставляются: очередь подписки ограничена QUEUE_SIZE.
+"""
+import asyncio
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Event
+from .routers import primary
+
+logger = logging.getLogger(__name__)
+
+Message = namedtuple('Message', 'id type data')
+
+QUEUE_SIZE = 100
+# Сколько событий DatabaseBroker читает одним запросом.
+POLL_BATCH_SIZE = 500
+# Сколько хранятся события в таблице DatabaseBroker.
+RETENTION = timedelta(minutes=10)
+CHANNEL_RE = re.compile(r'^(posts|(author|group|post):\d+)$')
+
+
+class Subscription:
+    """Очередь событий одного потока, читается из его потока."""
+
+    def __init__(self, channels):
+        self.channels = frozenset(channels)
+        self.queue = queue.Queue(QUEUE_SIZE)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            pass
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription(Subscription):
+    """Очередь событий потока, который читают из цикла событий."""
+
+    def __init__(self, channels):
+        super().__init__(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def put(self, event):
+        self.loop.call_soon_threadsafe(self.put_nowait, event)
+
+    def put_nowait(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    """Раздаёт события подпискам текущего процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+        self.last_id = 0
+
+    def subscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscriptions[channel].add(subscription)
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.subscriptions.get(channel, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self.subscriptions.pop(channel, None)
+
+    def publish(self, channels, event_type, data):
+        with self.lock:
+            self.last_id += 1
+            event = Message(self.last_id, event_type, data)
+        self.dispatch(channels, event)
+
+    def dispatch(self, channels, event):
+        """Кладёт событие в каждую подписку на любой из каналов (один раз)."""
+        with self.lock:
+            targets = set().union(*(
+                self.subscriptions.get(channel, ()) for channel in channels))
+        for subscription in targets:
+            subscription.put(event)
+
+
+class DatabaseBroker(LocalBroker):
+    """Раздаёт события подпискам всех процессов через таблицу Event.
+
+    Порядок id не совпадает с порядком коммитов: событие с меньшим id
+    может стать видно позже большего. Поэтому события читаются по
+    времени записи с запасом EVENTS_POLL_OVERLAP секунд (он покрывает и
+    расхождение часов процессов), а уже разданные отсеиваются по id.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.poller = None
+        # Время записи последнего разданного события.
+        self.since = timezone.now()
+        # id разданных событий за время запаса: id -> время записи.
+        self.seen = {}
+
+    def subscribe(self, subscription):
+        super().subscribe(subscription)
+        with self.lock:
+            if self.poller is None:
+                self.poller = threading.Thread(
+                    target=self.run, name='events-poller', daemon=True)
+                self.poller.start()
+
+    def publish(self, channels, event_type, data):
+        Event.objects.create(
+            channels=list(channels), type=event_type, data=data)
+
+    def run(self):
+        # События, записанные до запуска, не раздаются.
+        self.since = timezone.now()
+        with primary():
+            self.seen = dict(Event.objects.filter(
+                created__gte=self.since - self.overlap(),
+            ).values_list('pk', 'created'))
+        pruned = time.monotonic()
+        while True:
+            time.sleep(settings.EVENTS_POLL_INTERVAL)
+            try:
+                # Реплика может ещё не получить новые события.
+                with primary():
+                    self.poll()
+                    if (time.monotonic() - pruned
+                            > RETENTION.total_seconds()):
+                        Event.objects.filter(
+                            created__lt=timezone.now() - RETENTION).delete()
+                        pruned = time.monotonic()
+            except Exception:
+                logger.exception('Events poll failed')
+            finally:
+                close_old_connections()
+
+    @staticmethod
+    def overlap():
+        return timedelta(seconds=settings.EVENTS_POLL_OVERLAP)
+
+    def poll(self):
+        """Раздаёт ещё не разданные события, записанные не раньше чем
+        за EVENTS_POLL_OVERLAP до последнего разданного.
+
+        Читает пачками по POLL_BATCH_SIZE, пока пачки полные.
+        """
+        created, pk = self.since - self.overlap(), 0
+        while True:
+            rows = list(Event.objects.filter(
+                Q(created__gt=created) | Q(created=created, pk__gt=pk),
+            ).order_by('created', 'pk')[:POLL_BATCH_SIZE])
+            for row in rows:
+                if row.pk not in self.seen:
+                    self.seen[row.pk] = row.created
+                    self.dispatch(
+                        row.channels, Message(row.pk, row.type, row.data))
+                    self.since = max(self.since, row.created)
+            if len(rows) < POLL_BATCH_SIZE:
+                break
+            created, pk = rows[-1].created, rows[-1].pk
+        horizon = self.since - self.overlap()
+        self.seen = {
+            pk: created for pk, created in self.seen.items()
+            if created >= horizon
+        }
+
+
+@lru_cache(maxsize=None)
+def get_broker(backend=None):
+    return import_string(backend or settings.EVENTS_BACKEND)()
+
+
+def publish(channels, event_type, data):
+    """Публикует событие после коммита текущей транзакции."""
+    transaction.on_commit(
+        lambda: get_broker().publish(channels, event_type, data))
+
+
+def parse_channels(value):
+    """'posts,group:1' -> ['posts', 'group:1'] или ValueError."""
+    channels = list(dict.fromkeys(filter(None, value.split(','))))
+    if not channels or len(channels) > settings.EVENTS_MAX_CHANNELS:
+        raise ValueError('Неверное число каналов')
+    if not all(CHANNEL_RE.match(channel) for channel in channels):
+        raise ValueError('Неизвестный канал')
+    return channels
+
+
+def format_event(event):
+    if event is None:
+        # Комментарий держит соединение открытым через прокси.
+        return ': ping\n\n'
+    data = json.dumps(event.data, ensure_ascii=False)
+    return f'id: {event.id}\nevent: {event.type}\ndata: {data}\n\n'
+
+
+def stream_start():
+    # После закрытия потока браузер переподключится через столько мс.
+    return f'retry: {settings.EVENTS_RETRY * 1000}\n\n'
+
+
+def stream(channels):
+    """Поток событий для синхронного StreamingHttpResponse.
+
+    Подписка создаётся при первом чтении потока и снимается при его
+    закрытии; через EVENTS_STREAM_TIMEOUT поток заканчивается, и
+    браузер открывает новый.
+    """
+    broker = get_broker()
+    subscription = Subscription(channels)
+    broker.subscribe(subscription)
+    deadline = time.monotonic() + settings.EVENTS_STREAM_TIMEOUT
+    try:
+        yield stream_start()
+        while time.monotonic() < deadline:
+            yield format_event(subscription.get(settings.EVENTS_HEARTBEAT))
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,73 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post, User
+from users.backends import user_key
+
+
+class Command(BaseCommand):
+    help = ('Замеряет накладные расходы сессий на страницах постов '
+            'для каждого движка сессий.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Сколько раз запрашивать каждую страницу.')
+
+    def handle(self, *args, **options):
+        # Пользователь, пост и сессии откатываются вместе с транзакцией.
+        with transaction.atomic():
+            user = User.objects.create_user(username='benchmark-sessions')
+            post = Post.objects.create(author=user, text='Тестовый пост')
+            urls = [
+                reverse('posts:follow_index'),
+                reverse('posts:profile', args=[user.username]),
+                reverse('posts:post_detail', args=[post.pk]),
+            ]
+            # Лимиты запросов ответили бы 429, и замер считал бы их.
+            with override_settings(
+                    REQUEST_RATELIMIT=None,
+                    MAX_CONCURRENT_REQUESTS=None,
+                    CONCURRENCY_LIMITS={},
+                    DEGRADED_MODE=False):
+                for name, engine in settings.SESSION_ENGINE_CHOICES.items():
+                    with override_settings(SESSION_ENGINE=engine):
+                        self.measure(name, user, urls, options['requests'])
+            cache.delete(user_key(user.pk))
+            transaction.set_rollback(True)
+
+    def measure(self, name, user, urls, number):
+        client = Client()
+        client.force_login(user)
+        # CachedModelBackend кладёт пользователя в кеш после коммита,
+        # а замер идёт в транзакции: кеш заполняется здесь, как после
+        # первого запроса в работе.
+        cache.set(user_key(user.pk), user, settings.USER_CACHE_TIMEOUT)
+        self.get(client, urls[0])
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(number):
+                for url in urls:
+                    self.get(client, url)
+            seconds = time.perf_counter() - start
+        requests = number * len(urls)
+        session_queries = sum(
+            'django_session' in query['sql'] for query in queries)
+        self.stdout.write(
+            f'{name:15} {seconds / requests * 1000:7.2f} мс/запрос, '
+            f'запросов к БД: {len(queries) / requests:5.2f}, '
+            f'из них к сессиям: {session_queries / requests:4.2f}')
+
+    @staticmethod
+    def get(client, url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(
+                f'{url} ответил {response.status_code}, замер неверен.')
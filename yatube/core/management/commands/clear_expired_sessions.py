@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.routers import primary
+from core.sessions import clear_expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Удаляет истёкшие сессии из базы пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Сколько сессий удалять одним запросом.')
+
+    def handle(self, *args, **options):
+        with primary():
+            total = clear_expired_sessions(options['batch_size'])
+        self.stdout.write(f'Удалено сессий: {total}')
@@ -0,0 +1,336 @@
+"""Метрики в текстовом формате Prometheus (METRICS_PATH).
+
+Счётчики и гистограммы хранятся в памяти процесса; запись - словарь
+под блокировкой, без обращений к кешу или базе. Если процессов
+несколько, каждый раз в METRICS_FLUSH_INTERVAL секунд пишет свои
+значения в METRICS_DIR, а /metrics складывает файлы всех процессов.
+Память процесса (gauge) помечается его pid; значения процессов, чей
+файл давно не обновлялся, не выводятся. Веб-процессы запускают запись
+в MetricsMiddleware, фоновые обработчики (run_tasks, send_queued_mail)
+- через exporting().
+"""
+import bisect
+import contextlib
+import contextvars
+import glob
+import json
+import logging
+import math
+import multiprocessing.util
+import os
+import resource
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = []
+# Границы корзин гистограмм, секунды.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Через сколько интервалов записи процесс считается остановленным.
+STALE_INTERVALS = 3
+
+# Представление, которое обрабатывает текущий запрос.
+current_view = contextvars.ContextVar('current_view', default='')
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def snapshot(self):
+        with self.lock:
+            return [
+                [list(labels), value] for labels, value in self.values.items()
+            ]
+
+    def samples(self, labels, value):
+        yield self.name, self.label_pairs(labels), value
+
+    def label_pairs(self, labels):
+        return list(zip(self.labelnames, labels))
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    @staticmethod
+    def merge(total, value):
+        return total + value
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, *labels):
+        with self.lock:
+            self.values[labels] = value
+
+    @staticmethod
+    def merge(total, value):
+        return value
+
+
+class Histogram(Metric):
+    """Гистограмма: число наблюдений по корзинам BUCKETS и их сумма."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.values.get(labels)
+            if counts is None:
+                # Корзины, +Inf и сумма значений.
+                counts = [0] * (len(self.buckets) + 2)
+                self.values[labels] = counts
+            counts[index] += 1
+            counts[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return [
+                [list(labels), list(counts)]
+                for labels, counts in self.values.items()
+            ]
+
+    @staticmethod
+    def merge(total, value):
+        return [first + second for first, second in zip(total, value)]
+
+    def samples(self, labels, counts):
+        pairs = self.label_pairs(labels)
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            yield (f'{self.name}_bucket',
+                   pairs + [('le', format_value(bound))], cumulative)
+        yield f'{self.name}_sum', pairs, counts[-1]
+        yield f'{self.name}_count', pairs, cumulative
+
+
+REQUESTS = Counter(
+    'yatube_http_requests_total',
+    'HTTP requests by view, method and status.',
+    ('view', 'method', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    'yatube_http_request_duration_seconds',
+    'HTTP request latency by view.',
+    ('view',),
+)
+QUERIES = Counter(
+    'yatube_db_queries_total',
+    'SQL queries by view (empty outside requests).',
+    ('view',),
+)
+QUERY_DURATION = Counter(
+    'yatube_db_query_seconds_total',
+    'Time spent in SQL queries by view.',
+    ('view',),
+)
+PAGE_CACHE = Counter(
+    'yatube_page_cache_requests_total',
+    'Page cache lookups by cache and result (hit or miss).',
+    ('cache', 'result'),
+)
+THUMBNAILS = Histogram(
+    'yatube_thumbnail_generation_seconds',
+    'Thumbnails generated and generation latency.',
+)
+MEMORY = Gauge(
+    'process_resident_memory_bytes',
+    'Resident memory of the worker process.',
+    ('pid',),
+)
+MAX_MEMORY = Gauge(
+    'process_max_resident_memory_bytes',
+    'Peak resident memory of the worker process.',
+    ('pid',),
+)
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка выполнения SQL (см. signals.connection_metrics)."""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        view = current_view.get()
+        QUERY_DURATION.inc(view, amount=time.perf_counter() - start)
+        QUERIES.inc(view)
+
+
+def page_cache(cache, hit):
+    PAGE_CACHE.inc(cache, 'hit' if hit else 'miss')
+
+
+def update_memory():
+    pid = str(os.getpid())
+    # ru_maxrss в Linux - в килобайтах.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    MAX_MEMORY.set(peak, pid)
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        MEMORY.set(pages * resource.getpagesize(), pid)
+    except OSError:
+        MEMORY.set(peak, pid)
+
+
+def snapshot_path(pid):
+    return os.path.join(settings.METRICS_DIR, f'{pid}.json')
+
+
+_flush_lock = threading.Lock()
+
+
+def flush():
+    """Записывает значения процесса в METRICS_DIR."""
+    update_memory()
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = snapshot_path(os.getpid())
+    with _flush_lock:
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(
+                {metric.name: metric.snapshot() for metric in REGISTRY},
+                file)
+        os.replace(f'{path}.tmp', path)
+
+
+def flush_quietly():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Metrics flush failed')
+
+
+def run_flusher():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        flush_quietly()
+
+
+# Процесс, в котором запущен поток записи: после fork его нет.
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def start_flusher():
+    """Запускает запись значений в METRICS_DIR, если он задан.
+
+    Значения пишутся каждые METRICS_FLUSH_INTERVAL секунд и при выходе
+    из процесса. Годится как initializer пула процессов.
+    """
+    global _flusher_pid
+    if not settings.METRICS_DIR:
+        return
+    with _flusher_lock:
+        if _flusher_pid != os.getpid():
+            _flusher_pid = os.getpid()
+            threading.Thread(
+                target=run_flusher, name='metrics-flusher', daemon=True,
+            ).start()
+            # В отличие от atexit, вызывается и при выходе дочернего
+            # процесса multiprocessing.
+            multiprocessing.util.Finalize(
+                None, flush_quietly, exitpriority=0)
+
+
+@contextlib.contextmanager
+def exporting():
+    """Запись значений фонового обработчика в METRICS_DIR.
+
+    Пока блок выполняется, значения пишутся периодически, по выходе из
+    него - сразу.
+    """
+    start_flusher()
+    try:
+        yield
+    finally:
+        if settings.METRICS_DIR:
+            flush_quietly()
+
+
+def other_processes():
+    """Значения других процессов из METRICS_DIR."""
+    own = snapshot_path(os.getpid())
+    stale = time.time() - (
+        settings.METRICS_FLUSH_INTERVAL * STALE_INTERVALS)
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        if path == own:
+            continue
+        try:
+            with open(path) as file:
+                state = json.load(file)
+            modified = os.path.getmtime(path)
+        except (OSError, ValueError):
+            continue
+        if modified < stale:
+            for metric in REGISTRY:
+                if metric.type == 'gauge':
+                    state.pop(metric.name, None)
+        yield state
+
+
+def collect():
+    """Пары (метрика, {метки: значение}) по всем процессам."""
+    update_memory()
+    states = [{metric.name: metric.snapshot() for metric in REGISTRY}]
+    if settings.METRICS_DIR:
+        states += other_processes()
+    for metric in REGISTRY:
+        values = {}
+        for state in states:
+            for labels, value in state.get(metric.name, ()):
+                labels = tuple(labels)
+                if labels in values:
+                    value = metric.merge(values[labels], value)
+                values[labels] = value
+        yield metric, values
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"')
+         .replace('\n', r'\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render():
+    lines = []
+    for metric, values in collect():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for labels, value in sorted(values.items()):
+            for name, pairs, sample in metric.samples(labels, value):
+                lines.append(
+                    f'{name}{format_labels(pairs)} {format_value(sample)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,308 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from . import metrics
+from .cache import invalidation
+from .ratelimit import get_client_ip, parse_rate, take_token
+from .routers import pin_to_primary, reset_pinning, was_written
+
+ALL_REQUESTS = '*'
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class HybridMiddleware:
+    """Основа middleware, работающего и в синхронной цепочке, и в асинхронной.
+
+    Под ASGI асинхронные представления выполняются в цикле событий, только
+    если всё middleware умеет работать асинхронно, иначе Django выполняет
+    каждый запрос в отдельном потоке через async_to_sync. Наследники
+    реализуют call() и acall(), а также aprocess_view(), если у них есть
+    process_view().
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Так обработчик Django узнаёт асинхронный экземпляр.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            if hasattr(self, 'aprocess_view'):
+                self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        return self.call(request)
+
+
+class ReplicaPinningMiddleware(HybridMiddleware):
+    """Закрепляет клиента за основной базой на время после записи.
+
+    Реплики отстают от основной базы, поэтому после запроса с записью
+    (например, создания поста и редиректа на профиль) клиент ещё
+    REPLICA_PIN_SECONDS секунд читает данные с основной базы.
+    """
+
+    def call(self, request):
+        self.start(request)
+        try:
+            return self.finish(self.get_response(request))
+        finally:
+            reset_pinning()
+
+    async def acall(self, request):
+        self.start(request)
+        try:
+            return self.finish(await self.get_response(request))
+        finally:
+            reset_pinning()
+
+    @staticmethod
+    def start(request):
+        reset_pinning()
+        if settings.REPLICA_PIN_COOKIE in request.COOKIES:
+            pin_to_primary()
+
+    @staticmethod
+    def finish(response):
+        if was_written():
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+            )
+        return response
+
+
+class BatchedInvalidationMiddleware(HybridMiddleware):
+    """Сбрасывает кеш, затронутый запросом, одной операцией в конце."""
+
+    def call(self, request):
+        with invalidation.batch():
+            return self.get_response(request)
+
+    async def acall(self, request):
+        invalidation.start_batch()
+        try:
+            return await self.get_response(request)
+        finally:
+            if invalidation.has_pending():
+                # Сброс может обратиться к базе.
+                await sync_to_async(invalidation.end_batch)()
+            else:
+                invalidation.end_batch()
+
+
+class LoadSheddingMiddleware(HybridMiddleware):
+    """Сбрасывает лишнюю нагрузку до того, как она дойдёт до базы.
+
+    * REQUEST_RATELIMIT - лимит запросов одного IP-адреса, сверх него 429;
+    * MAX_CONCURRENT_REQUESTS и CONCURRENCY_LIMITS - сколько запросов
+      (всего и к группе представлений) процесс обрабатывает одновременно;
+    * если предел достигнут или включён DEGRADED_MODE, GET-запрос
+      получает сохранённую копию публичной страницы, остальные - 503.
+
+    Потоки событий (EVENTS_PATH) и сбор метрик (METRICS_PATH) в
+    одновременных запросах не считаются.
+
+    Ответы middleware не рендерят шаблоны и не обращаются к базе.
+    Счётчики одновременных запросов свои у каждого процесса. В
+    асинхронной цепочке обращения к кешу выполняются в пуле потоков,
+    как в cache_page_async, чтобы не блокировать цикл событий.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.limits = {ALL_REQUESTS: settings.MAX_CONCURRENT_REQUESTS}
+        self.groups = {}
+        for group, config in settings.CONCURRENCY_LIMITS.items():
+            self.limits[group] = config['limit']
+            for view_name in config['views']:
+                self.groups[view_name] = group
+        self.active = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def call(self, request):
+        if self.skip(request):
+            return self.get_response(request)
+        rejected = self.admit(request)
+        if rejected is not None:
+            return rejected
+        try:
+            response = self.get_response(request)
+        finally:
+            self.release(request._shed_groups)
+        if self.storable(request, response):
+            self.remember(request, response)
+        return response
+
+    async def acall(self, request):
+        if self.skip(request):
+            return await self.get_response(request)
+        rejected = await sync_to_async(self.admit)(request)
+        if rejected is not None:
+            return rejected
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.release(request._shed_groups)
+        if self.storable(request, response):
+            await sync_to_async(self.remember)(request, response)
+        return response
+
+    @staticmethod
+    def skip(request):
+        return request.path.startswith(
+            (settings.STATIC_URL, settings.MEDIA_URL))
+
+    def admit(self, request):
+        """Ответ 429 или сохранённая копия, если запрос не пропущен."""
+        if settings.REQUEST_RATELIMIT:
+            capacity, period = parse_rate(settings.REQUEST_RATELIMIT)
+            key = f'ratelimit:request:ip:{get_client_ip(request)}'
+            wait = take_token(key, capacity, period)
+            if wait:
+                return self.unavailable(429, wait)
+        if settings.DEGRADED_MODE:
+            return self.degraded(request)
+        request._shed_groups = ()
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if self.acquire(request):
+            return None
+        return await sync_to_async(self.degraded)(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.acquire(request):
+            return None
+        return self.degraded(request)
+
+    def acquire(self, request):
+        """Занимает места запроса в группах, False - если мест нет."""
+        if request.path in (settings.EVENTS_PATH, settings.METRICS_PATH):
+            # Поток событий открыт минутами и почти не нагружает сервер,
+            # а метрики нужны как раз под нагрузкой.
+            return True
+        groups = [ALL_REQUESTS]
+        group = self.groups.get(request.resolver_match.view_name)
+        if group is not None:
+            groups.append(group)
+        groups = [
+            group for group in groups if self.limits[group] is not None]
+        with self.lock:
+            if any(self.active[g] >= self.limits[g] for g in groups):
+                return False
+            for group in groups:
+                self.active[group] += 1
+        request._shed_groups = groups
+        return True
+
+    def release(self, groups):
+        with self.lock:
+            for group in groups:
+                self.active[group] -= 1
+
+    @staticmethod
+    def stale_key(request):
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        return f'stale:{path}'
+
+    @staticmethod
+    def storable(request, response):
+        """Страницу можно отдать кому угодно."""
+        return (
+            request.method == 'GET' and response.status_code == 200
+            and not response.streaming
+            and 'public' in response.get('Cache-Control', '')
+        )
+
+    def remember(self, request, response):
+        """Сохраняет копию страницы storable()."""
+        key = self.stale_key(request)
+        if cache.add(f'{key}:fresh', True, settings.STALE_PAGE_REFRESH):
+            cache.set(
+                key,
+                (response.content, response['Content-Type']),
+                settings.STALE_PAGE_TIMEOUT,
+            )
+
+    def degraded(self, request):
+        if request.method in ('GET', 'HEAD'):
+            stale = cache.get(self.stale_key(request))
+            if stale is not None:
+                content, content_type = stale
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Degraded'] = 'stale'
+                return response
+        return self.unavailable(503, settings.STALE_PAGE_REFRESH)
+
+    @staticmethod
+    def unavailable(status, retry_after):
+        response = HttpResponse(
+            'Сервис перегружен, попробуйте позже.',
+            status=status,
+            content_type='text/plain; charset=utf-8',
+        )
+        response['Retry-After'] = str(max(1, round(retry_after)))
+        return response
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Считает запросы и их время по представлениям (см. metrics).
+
+    Стоит первым, чтобы учесть время остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        metrics.start_flusher()
+
+    def call(self, request):
+        start = time.perf_counter()
+        token = metrics.current_view.set('')
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_view.reset(token)
+        return self.record(request, response, start)
+
+    async def acall(self, request):
+        start = time.perf_counter()
+        token = metrics.current_view.set('')
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_view.reset(token)
+        return self.record(request, response, start)
+
+    @staticmethod
+    def record(request, response, start):
+        match = request.resolver_match
+        view = match.view_name if match else ''
+        method = request.method if request.method in METHODS else 'other'
+        metrics.REQUESTS.inc(view, method, str(response.status_code))
+        metrics.REQUEST_DURATION.observe(time.perf_counter() - start, view)
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.set_view(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.set_view(request)
+
+    @staticmethod
+    def set_view(request):
+        metrics.current_view.set(request.resolver_match.view_name)
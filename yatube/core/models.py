@@ -0,0 +1,60 @@
+import os
+
+from django.conf import settings
+from django.db import models
+
+
+class Event(models.Model):
+    """Событие для потоков всех процессов (см. events.DatabaseBroker)."""
+
+    channels = models.JSONField(verbose_name='Каналы')
+    type = models.CharField(verbose_name='Тип', max_length=32)
+    data = models.JSONField(verbose_name='Данные')
+    created = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'Событие'
+        verbose_name_plural = 'События'
+
+    def __str__(self):
+        return f'{self.type} {self.channels}'
+
+
+class RequestProfile(models.Model):
+    """Профиль запроса, снятый profiling.ProfilingMiddleware."""
+
+    PATH_LENGTH = 500
+
+    method = models.CharField(verbose_name='Метод', max_length=8)
+    path = models.CharField(verbose_name='Адрес', max_length=PATH_LENGTH)
+    view_name = models.CharField(
+        verbose_name='Представление',
+        max_length=100,
+        blank=True,
+    )
+    status_code = models.PositiveSmallIntegerField(verbose_name='Код ответа')
+    duration = models.FloatField(verbose_name='Время, с', db_index=True)
+    sql_count = models.PositiveIntegerField(verbose_name='SQL-запросов')
+    sql_time = models.FloatField(verbose_name='Время SQL, с')
+    template_time = models.FloatField(verbose_name='Время шаблонов, с')
+    samples = models.PositiveIntegerField(verbose_name='Снимков стека')
+    created = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        ordering = ['-duration']
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
+
+    def folded_path(self):
+        """Файл стеков в свёрнутом формате для flame graph."""
+        return os.path.join(settings.PROFILING_DIR, f'{self.pk}.folded')
@@ -0,0 +1,76 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+def encode_cursor(date, pk):
+    """Курсор keyset-пагинации по паре (дата, id)."""
+    data = json.dumps([date.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор encode_cursor, при ошибке - ValueError."""
+    try:
+        date, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        date = parse_datetime(date)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError('Неверный курсор')
+    if date is None or not isinstance(pk, int):
+        raise ValueError('Неверный курсор')
+    return date, pk
+
+
+def estimate_count(model, using='default'):
+    """Примерное число строк таблицы без COUNT(*).
+
+    PostgreSQL хранит оценку в статистике таблицы, для остальных баз
+    берётся максимальный первичный ключ (удалённые строки не учтены).
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return row[0]
+    return model._default_manager.using(using).aggregate(
+        last=Max('pk'))['last'] or 0
+
+
+def is_whole_table(queryset):
+    """True, если queryset выбирает все строки таблицы модели."""
+    query = queryset.query
+    return not (
+        query.where or query.distinct or query.combinator
+        or query.group_by is not None
+    )
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор для больших таблиц.
+
+    Число строк всей таблицы больше ESTIMATED_COUNT_THRESHOLD берётся
+    из estimate_count. Выборка с фильтрами, DISTINCT, группировкой или
+    объединением и маленькие таблицы считаются точно, иначе строки за
+    порогом были бы недоступны.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if is_whole_table(queryset):
+            estimate = estimate_count(queryset.model, queryset.db)
+            if estimate > settings.ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return queryset.order_by().count()
@@ -0,0 +1,210 @@
+"""Выборочное профилирование запросов.
+
+Профилируется доля PROFILING_SAMPLE_RATE запросов и запросы, в
+которых заголовок PROFILING_HEADER равен секрету PROFILING_TOKEN
+(адрес клиента для этого не годится: за прокси он у всех один).
+Пока запрос выполняется, отдельный поток каждые PROFILING_INTERVAL
+секунд снимает стек потока запроса; стеки сохраняются в PROFILING_DIR
+в свёрнутом формате (строка «кадр;кадр;кадр число»), который читают
+flamegraph.pl, speedscope и inferno. Время SQL-запросов и рендеринга шаблонов
+замеряется точно и сохраняется вместе со ссылкой на файл в
+RequestProfile, самые медленные запросы видны в админке. Хранятся
+только последние PROFILING_MAX_PROFILES профилей и их файлы.
+"""
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.backends.django import Template
+from django.utils.crypto import constant_time_compare
+
+from .middleware import HybridMiddleware
+from .models import RequestProfile
+
+# Замеры профилируемого запроса; видны и в потоках sync_to_async.
+current_capture = contextvars.ContextVar('current_capture', default=None)
+
+
+class Capture:
+    """Замеры одного профилируемого запроса."""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0
+        self.template_time = 0
+        self.template_depth = 0
+        self.token = None
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка выполнения SQL (см. signals.connection_metrics)."""
+    capture = current_capture.get()
+    if capture is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        capture.sql_time += time.perf_counter() - start
+        capture.sql_count += 1
+
+
+class Sampler(threading.Thread):
+    """Снимает стек потока thread_id, пока не вызван stop()."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[fold(frame)] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def frame_label(frame):
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+def fold(frame):
+    """Стек от внешнего вызова к frame через ';'."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def render_template(self, context=None, request=None):
+    """Template.render, замеряющий время в профилируемом запросе.
+
+    Вложенные рендеры (render_to_string внутри тега) не считаются
+    повторно.
+    """
+    capture = current_capture.get()
+    if capture is None:
+        return _render(self, context, request)
+    capture.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _render(self, context, request)
+    finally:
+        capture.template_depth -= 1
+        if not capture.template_depth:
+            capture.template_time += time.perf_counter() - start
+
+
+_render = Template.render
+
+
+def should_profile(request):
+    if request.path == settings.EVENTS_PATH:
+        return False
+    token = request.META.get(settings.PROFILING_HEADER, '')
+    if (settings.PROFILING_TOKEN and token
+            and constant_time_compare(token, settings.PROFILING_TOKEN)):
+        return True
+    return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def save(request, response, capture, sampler, duration):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    match = request.resolver_match
+    profile = RequestProfile.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:RequestProfile.PATH_LENGTH],
+        view_name=match.view_name if match else '',
+        status_code=response.status_code,
+        duration=duration,
+        sql_count=capture.sql_count,
+        sql_time=capture.sql_time,
+        template_time=capture.template_time,
+        samples=sum(sampler.stacks.values()),
+    )
+    with open(profile.folded_path(), 'w') as file:
+        for stack, count in sampler.stacks.items():
+            file.write(f'{stack} {count}\n')
+    prune(profile.pk)
+    return profile
+
+
+def prune(last_id):
+    """Удаляет профили старше PROFILING_MAX_PROFILES последних.
+
+    Файлы стеков удаляет сигнал post_delete; обычно за раз удаляется
+    один профиль.
+    """
+    RequestProfile.objects.filter(
+        pk__lte=last_id - settings.PROFILING_MAX_PROFILES).delete()
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """Профилирует выбранные запросы (см. модуль), если PROFILING_ENABLED.
+
+    Стоит сразу после MetricsMiddleware, чтобы учесть время остальных
+    middleware. Снимается поток, в котором выполняется middleware: в
+    синхронной цепочке в нём же работают представления, в асинхронной
+    это поток цикла событий, а запросы к базе и рендеринг выполняются
+    в пуле потоков и видны по замерам SQL и шаблонов.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        Template.render = render_template
+
+    def call(self, request):
+        if not should_profile(request):
+            return self.get_response(request)
+        capture, sampler, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(capture, sampler)
+        duration = time.perf_counter() - start
+        save(request, response, capture, sampler, duration)
+        return response
+
+    async def acall(self, request):
+        if not should_profile(request):
+            return await self.get_response(request)
+        capture, sampler, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(capture, sampler)
+        duration = time.perf_counter() - start
+        await sync_to_async(save)(request, response, capture, sampler,
+                                  duration)
+        return response
+
+    @staticmethod
+    def start():
+        capture = Capture()
+        capture.token = current_capture.set(capture)
+        sampler = Sampler(threading.get_ident(), settings.PROFILING_INTERVAL)
+        sampler.start()
+        return capture, sampler, time.perf_counter()
+
+    @staticmethod
+    def stop(capture, sampler):
+        sampler.stop()
+        current_capture.reset(capture.token)
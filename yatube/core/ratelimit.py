@@ -0,0 +1,114 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .views import too_many_requests
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60): ёмкость ведра и время его наполнения."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def take_tokens(buckets, period):
+    """Забирает по жетону из каждого ведра (key, capacity) или ни из одного.
+
+    Возвращает 0 или секунды, через которые жетоны будут во всех вёдрах.
+    Ведро вмещает capacity жетонов и наполняется за period секунд.
+    Состояние (жетоны, время) хранится в кеше; гонки параллельных
+    запросов могут пропустить лишний запрос, но не заблокировать
+    пользователя.
+    """
+    now = time.time()
+    states = cache.get_many([key for key, _ in buckets])
+    levels = {}
+    wait = 0
+    for key, capacity in buckets:
+        tokens, updated = states.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * capacity / period)
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) * period / capacity)
+        levels[key] = (tokens - 1, now)
+    if wait:
+        # Отказ не расходует жетоны других вёдер.
+        return wait
+    cache.set_many(levels, period)
+    return 0
+
+
+def take_token(key, capacity, period):
+    """Забирает жетон из ведра key, возвращает 0 или секунды до жетона."""
+    return take_tokens([(key, capacity)], period)
+
+
+def get_client_ip(request):
+    """Адрес клиента с учётом доверенных прокси (CLIENT_IP_HEADER).
+
+    Прокси дописывают адреса справа, поэтому клиентом считается адрес
+    на TRUSTED_PROXY_COUNT позиций от конца: всё левее него прислал
+    сам клиент. Без заголовка или с более коротким списком - REMOTE_ADDR.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR', '')
+    if not settings.CLIENT_IP_HEADER:
+        return remote_addr
+    forwarded = [
+        address.strip() for address in request.META.get(
+            settings.CLIENT_IP_HEADER, '').split(',')
+    ]
+    count = settings.TRUSTED_PROXY_COUNT
+    if count < 1 or len(forwarded) < count or not forwarded[-count]:
+        return remote_addr
+    return forwarded[-count]
+
+
+def check_rate(request, group):
+    """Проверяет лимиты группы для пользователя и IP-адреса.
+
+    Возвращает секунды до следующей разрешённой попытки или 0; при
+    отказе жетоны не списываются ни с одного ведра. С одного адреса
+    могут писать несколько пользователей (NAT), поэтому лимит адреса в
+    RATELIMIT_IP_MULTIPLIER раз выше.
+    """
+    capacity, period = parse_rate(settings.RATELIMITS[group])
+    buckets = [(
+        f'ratelimit:{group}:ip:{get_client_ip(request)}',
+        capacity * settings.RATELIMIT_IP_MULTIPLIER,
+    )]
+    if request.user.is_authenticated:
+        buckets.append(
+            (f'ratelimit:{group}:user:{request.user.pk}', capacity))
+    return take_tokens(buckets, period)
+
+
+def ratelimit(group, methods=('POST',)):
+    """Ограничивает частоту запросов к представлению.
+
+    Лимиты задаются в RATELIMITS; при превышении отдаётся 429.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            if request.method in methods:
+                wait = check_rate(request, group)
+                if wait:
+                    return too_many_requests(request, wait)
+            return view_func(request, *args, **kwargs)
+        return wrapped_view
+    return decorator
+
+
+def is_duplicate(scope, user_id, text):
+    """True, если user_id уже отправлял такой текст за DUPLICATE_WINDOW.
+
+    Тексты сравниваются по хешу без учёта регистра и пробелов.
+    """
+    normalized = ' '.join(text.lower().split())
+    digest = hashlib.md5(normalized.encode()).hexdigest()
+    key = f'duplicate:{scope}:{user_id}:{digest}'
+    return not cache.add(key, True, settings.DUPLICATE_WINDOW)
@@ -0,0 +1,77 @@
+import random
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import router
+
+# Состояние запроса: в асинхронной цепочке - своё у каждого запроса и
+# общее с потоками sync_to_async, иначе - своё у каждого потока.
+_state = Local()
+
+
+def pin_to_primary():
+    """Направляет все последующие чтения потока в основную базу."""
+    _state.pinned = True
+
+
+def reset_pinning():
+    _state.pinned = False
+    _state.written = False
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def was_written():
+    return getattr(_state, 'written', False)
+
+
+@contextmanager
+def primary():
+    """Читает внутри блока с основной базы, после блока снимает закрепление.
+
+    Закрепление снимает только ReplicaPinningMiddleware, поэтому фоновые
+    задачи, обработчики очередей и команды выполняют каждую единицу
+    работы в этом блоке: иначе поток до первой записи читал бы отстающие
+    реплики, а после неё оставался бы закреплён навсегда. Состояние
+    потока (например, запроса, в котором выполнилась задача) после
+    блока восстанавливается; запись в блоке остаётся записью запроса.
+    """
+    pinned, written = is_pinned(), was_written()
+    _state.pinned = True
+    try:
+        yield
+    finally:
+        _state.pinned = pinned
+        _state.written = written or was_written()
+
+
+def raw_delete(queryset):
+    """Удаляет строки queryset одним DELETE, без сигналов и каскада.
+
+    queryset.db для чтения - это реплика, поэтому база берётся у
+    роутера для записи. Возвращает число удалённых строк.
+    """
+    return queryset._raw_delete(router.db_for_write(queryset.model))
+
+
+class PrimaryReplicaRouter:
+    """Чтение с реплик, запись и чтение после записи - с основной базы."""
+
+    def db_for_read(self, model, **hints):
+        if is_pinned() or not settings.REPLICA_DATABASES:
+            return 'default'
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        _state.written = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from .routers import raw_delete
+
+
+def clear_expired_sessions(batch_size=None):
+    """Удаляет истёкшие сессии пачками, возвращает их число.
+
+    В отличие от clearsessions, который удаляет всё одним запросом и
+    надолго блокирует таблицу, каждая пачка удаляется отдельным
+    коротким запросом по индексу expire_date.
+    """
+    batch_size = batch_size or settings.SESSION_CLEANUP_BATCH_SIZE
+    now = timezone.now()
+    expired = Session.objects.filter(expire_date__lt=now).order_by(
+        'expire_date')
+    total = 0
+    while True:
+        keys = list(expired.values_list('pk', flat=True)[:batch_size])
+        if keys:
+            total += raw_delete(Session.objects.filter(pk__in=keys))
+        if len(keys) < batch_size:
+            return total
@@ -0,0 +1,25 @@
+import os
+
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import metrics, profiling
+from .models import RequestProfile
+
+
+@receiver(connection_created)
+def connection_metrics(sender, connection, **kwargs):
+    # Соединение открывается заново после каждого закрытия, а обёртки
+    # ставятся первыми, чтобы execute_wrapper() снимал свою, а не их.
+    for wrapper in (profiling.record_query, metrics.record_query):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, wrapper)
+
+
+@receiver(post_delete, sender=RequestProfile)
+def profile_deleted(sender, instance, **kwargs):
+    try:
+        os.remove(instance.folded_path())
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,82 @@
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import path, reverse
+from django.utils.module_loading import import_string
+
+from posts.models import Post
+from .. import metrics
+
+User = get_user_model()
+probe_threads = []
+
+
+async def probe(request):
+    probe_threads.append(threading.get_ident())
+    return HttpResponse('ok')
+
+
+async def write(request):
+    author = await sync_to_async(User.objects.get)(username='User')
+    await sync_to_async(Post.objects.create)(author=author, text='Новый пост')
+    return HttpResponse('ok')
+
+
+urlpatterns = [
+    path('probe/', probe, name='probe'),
+    path('write/', write),
+]
+
+
+class AsyncMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_middleware_is_async_capable(self):
+        """Всё middleware умеет работать в асинхронной цепочке."""
+        for middleware in settings.MIDDLEWARE:
+            with self.subTest(middleware=middleware):
+                self.assertTrue(import_string(middleware).async_capable)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    async def test_async_view_runs_in_event_loop(self):
+        """Асинхронное представление выполняется в потоке цикла событий,
+        а не через async_to_sync в отдельном потоке."""
+        response = await AsyncClient().get('/probe/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(probe_threads, [threading.get_ident()])
+        self.assertEqual(
+            metrics.REQUESTS.values.get(('probe', 'GET', '200')), 1)
+
+    async def test_async_view(self):
+        """Страница поста отдаётся через асинхронную цепочку."""
+        response = await AsyncClient().get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertContains(response, 'Тестовый пост')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    async def test_write_pins_client(self):
+        """Запись в асинхронной цепочке закрепляет клиента за основной
+        базой."""
+        response = await AsyncClient().get('/write/')
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertTrue(
+            await sync_to_async(
+                Post.objects.filter(text='Новый пост').exists)())
+
+    @override_settings(DEGRADED_MODE=True)
+    async def test_degraded_mode(self):
+        """В режиме деградации без сохранённой копии отдаётся 503."""
+        response = await AsyncClient().get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 503)
@@ -0,0 +1,55 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..cache import (InvalidationCollector, generation_key, get_generation,
+                     invalidation)
+
+
+class GenerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_generation_is_stable(self):
+        """Поколение не меняется без инвалидации."""
+        self.assertEqual(get_generation('scope'), get_generation('scope'))
+
+    def test_invalidation_changes_generation(self):
+        """После инвалидации области её поколение меняется."""
+        generation = get_generation('scope')
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidation.invalidate('scope')
+        self.assertNotEqual(get_generation('scope'), generation)
+
+
+class InvalidationCollectorTests(TestCase):
+    def setUp(self):
+        self.collector = InvalidationCollector()
+
+    def test_keys_are_deleted_after_commit(self):
+        """Ключи удаляются только после коммита транзакции."""
+        with mock.patch.object(cache, 'delete_many') as delete_many:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.collector.add('a')
+                delete_many.assert_not_called()
+        delete_many.assert_called_once_with({'a'})
+
+    def test_batch_dedupes_keys(self):
+        """Повторные ключи в пачке удаляются одним вызовом."""
+        resolver = mock.Mock(return_value=['c'])
+        with mock.patch.object(cache, 'delete_many') as delete_many:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.collector.batch():
+                    for _ in range(10):
+                        self.collector.add('a', 'b')
+                        self.collector.add_lazy('token', resolver)
+        self.assertEqual(len(callbacks), 1)
+        resolver.assert_called_once_with()
+        delete_many.assert_called_once_with({'a', 'b', 'c'})
+
+    def test_generation_key_is_collected(self):
+        with mock.patch.object(cache, 'delete_many') as delete_many:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.collector.invalidate('index')
+        delete_many.assert_called_once_with({generation_key('index')})
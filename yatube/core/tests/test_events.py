@@ -0,0 +1,230 @@
+import asyncio
+import json
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+from .. import events
+from ..asgi import EventStreamMiddleware
+from ..events import (DatabaseBroker, LocalBroker, Message, Subscription,
+                      parse_channels)
+from ..models import Event
+
+User = get_user_model()
+
+
+class BrokerTests(TestCase):
+    def test_parse_channels(self):
+        """Каналы проверяются, повторы отбрасываются."""
+        self.assertEqual(
+            parse_channels('posts,group:1,posts'), ['posts', 'group:1'])
+        for value in ('', 'users', 'group:x', 'post:1;drop'):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    parse_channels(value)
+        with override_settings(EVENTS_MAX_CHANNELS=2):
+            with self.assertRaises(ValueError):
+                parse_channels('author:1,author:2,author:3')
+
+    def test_local_broker(self):
+        """Событие доставляется подписке один раз, сколько бы каналов ни
+        совпало."""
+        broker = LocalBroker()
+        both = Subscription(['posts', 'group:1'])
+        other = Subscription(['group:2'])
+        broker.subscribe(both)
+        broker.subscribe(other)
+        broker.publish(['posts', 'group:1'], 'post', {'id': 1})
+        self.assertEqual(both.get(0), Message(1, 'post', {'id': 1}))
+        self.assertIsNone(both.get(0))
+        self.assertIsNone(other.get(0))
+        broker.unsubscribe(both)
+        broker.unsubscribe(other)
+        self.assertEqual(broker.subscriptions, {})
+
+    def test_database_broker(self):
+        """DatabaseBroker раздаёт записанные в таблицу события."""
+        broker = DatabaseBroker()
+        subscription = Subscription(['post:1'])
+        # Без поллера: опрос вызывается явно.
+        super(DatabaseBroker, broker).subscribe(subscription)
+        broker.publish(['post:1'], 'comment', {'id': 5})
+        broker.publish(['post:2'], 'comment', {'id': 6})
+        with self.assertNumQueries(1):
+            broker.poll()
+        event = subscription.get(0)
+        self.assertEqual((event.type, event.data), ('comment', {'id': 5}))
+        self.assertIsNone(subscription.get(0))
+        broker.poll()
+        self.assertIsNone(subscription.get(0))
+
+    def test_database_broker_late_commit(self):
+        """Событие с меньшим id, ставшее видимым позже, не теряется."""
+        broker = DatabaseBroker()
+        subscription = Subscription(['posts'])
+        super(DatabaseBroker, broker).subscribe(subscription)
+        # Строка, которую ещё не закоммитила другая транзакция.
+        late_id = Event.objects.create(
+            channels=['posts'], type='post', data=1).pk
+        Event.objects.filter(pk=late_id).delete()
+        broker.publish(['posts'], 'post', 2)
+        broker.poll()
+        self.assertEqual(subscription.get(0).data, 2)
+        Event.objects.create(
+            pk=late_id, channels=['posts'], type='post', data=1)
+        broker.poll()
+        self.assertEqual(subscription.get(0), Message(late_id, 'post', 1))
+        self.assertIsNone(subscription.get(0))
+
+    def test_database_broker_backlog(self):
+        """За один опрос раздаются все новые события, а не одна пачка."""
+        broker = DatabaseBroker()
+        subscription = Subscription(['posts'])
+        super(DatabaseBroker, broker).subscribe(subscription)
+        for number in range(5):
+            broker.publish(['posts'], 'post', number)
+        with mock.patch.object(events, 'POLL_BATCH_SIZE', 2), \
+                self.assertNumQueries(3):
+            broker.poll()
+        self.assertEqual(
+            [subscription.get(0).data for _ in range(5)], list(range(5)))
+
+
+@override_settings(EVENTS_HEARTBEAT=0.01, EVENTS_STREAM_TIMEOUT=0.5)
+class StreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        events.get_broker.cache_clear()
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def tearDown(self):
+        events.get_broker.cache_clear()
+
+    def test_bad_channels(self):
+        """Неизвестный канал - 400."""
+        response = Client().get(reverse('events'), {'channels': 'users'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream(self):
+        """Поток отдаёт события подписанных каналов после коммита."""
+        response = Client().get(reverse('events'), {'channels': 'group:1'})
+        self.assertEqual(response['Content-Type'],
+                         'text/event-stream; charset=utf-8')
+        chunks = iter(response.streaming_content)
+        self.assertEqual(next(chunks), b'retry: 3000\n\n')
+        self.assertEqual(next(chunks), b': ping\n\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                author=self.user, text='Текст', group=self.group)
+        self.assertEqual(
+            next(chunks),
+            f'id: 1\nevent: post\ndata: {{"id": {post.pk}}}\n\n'.encode())
+        self.assertEqual(set(chunks), {b': ping\n\n'})
+
+    def test_no_event_before_commit(self):
+        """До коммита события не публикуются."""
+        subscription = Subscription(['posts'])
+        events.get_broker().subscribe(subscription)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Post.objects.create(author=self.user, text='Текст')
+        self.assertIsNone(subscription.get(0))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(subscription.get(0).type, 'post')
+
+    def test_comment_event(self):
+        """Событие комментария несёт его разметку."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        subscription = Subscription([f'post:{post.pk}'])
+        events.get_broker().subscribe(subscription)
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = Comment.objects.create(
+                post=post, author=self.user, text='Новый комментарий')
+        event = subscription.get(0)
+        self.assertEqual(event.type, 'comment')
+        self.assertEqual(event.data['id'], comment.pk)
+        self.assertIsNone(event.data['parent'])
+        self.assertIn(f'id="comment-{comment.pk}"', event.data['html'])
+        self.assertIn('Новый комментарий', event.data['html'])
+
+    def test_asgi_stream(self):
+        """Под ASGI поток отдаётся из цикла событий."""
+        async def app(scope, receive, send):
+            raise AssertionError('Запрос не должен дойти до Django')
+
+        messages = []
+        requests = [{'type': 'http.request', 'body': b''}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await asyncio.sleep(60)
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if len(messages) == 3:
+                events.get_broker().publish(['posts'], 'post', {'id': 7})
+
+        scope = {
+            'type': 'http',
+            'path': '/events/',
+            'query_string': b'channels=posts',
+        }
+        asyncio.run(EventStreamMiddleware(app)(scope, receive, send))
+        self.assertEqual(messages[0]['status'], 200)
+        body = b''.join(message.get('body', b'') for message in messages)
+        self.assertTrue(body.startswith(b'retry: 3000\n\n: ping\n\n'))
+        self.assertIn(
+            b'event: post\ndata: ' + json.dumps({'id': 7}).encode(), body)
+        self.assertFalse(messages[-1]['more_body'])
+        self.assertEqual(events.get_broker().subscriptions, {})
+
+    @override_settings(EVENTS_STREAM_TIMEOUT=60)
+    def test_asgi_disconnect(self):
+        """Поток закрывается, когда клиент отключился."""
+        async def app(scope, receive, send):
+            raise AssertionError('Запрос не должен дойти до Django')
+
+        messages = [
+            {'type': 'http.disconnect'},
+            {'type': 'http.request', 'body': b''},
+        ]
+
+        async def receive():
+            await asyncio.sleep(0.05)
+            return messages.pop()
+
+        async def send(message):
+            pass
+
+        scope = {
+            'type': 'http',
+            'path': '/events/',
+            'query_string': b'channels=posts',
+        }
+        start = time.monotonic()
+        asyncio.run(EventStreamMiddleware(app)(scope, receive, send))
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(messages, [])
+        self.assertEqual(events.get_broker().subscriptions, {})
+
+    def test_post_card(self):
+        """Карточка поста для вставки в ленту."""
+        post = Post.objects.create(
+            author=self.user, text='Текст карточки', group=self.group)
+        url = reverse('posts:post_card', args=[post.pk])
+        response = Client().get(url)
+        self.assertContains(response, 'Текст карточки')
+        self.assertContains(response, f'data-post-id="{post.pk}"')
+        with self.assertNumQueries(0):
+            Client().get(url)
+        missing = reverse('posts:post_card', args=[post.pk + 1])
+        self.assertEqual(Client().get(missing).status_code, 404)
@@ -0,0 +1,106 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+NO_POST_DETAIL = {
+    'post_detail': {'views': ['posts:post_detail'], 'limit': 0},
+}
+
+
+class LoadSheddingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.other = Post.objects.create(author=cls.user, text='Другой пост')
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(REQUEST_RATELIMIT='2/m')
+    def test_client_rate_limit(self):
+        """Сверх лимита клиент получает 429 без обращения к представлению."""
+        client = Client()
+        for _ in range(2):
+            self.assertEqual(
+                client.get(reverse('posts:index')).status_code, 200)
+        response = client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(REQUEST_RATELIMIT='1/m',
+                       CLIENT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_clients_behind_proxy(self):
+        """За прокси у каждого клиента своё ведро, а не одно на всех."""
+        address = reverse('posts:index')
+        for forwarded in ('203.0.113.5', '203.0.113.6'):
+            with self.subTest(forwarded=forwarded):
+                response = Client().get(
+                    address, HTTP_X_FORWARDED_FOR=forwarded)
+                self.assertEqual(response.status_code, 200)
+        response = Client().get(address, HTTP_X_FORWARDED_FOR='203.0.113.5')
+        self.assertEqual(response.status_code, 429)
+
+    def test_concurrency_cap_serves_stale_page(self):
+        """При перегрузке группы отдаётся сохранённая копия или 503."""
+        address = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id})
+        fresh = Client().get(address)
+        with override_settings(CONCURRENCY_LIMITS=NO_POST_DETAIL):
+            client = Client()
+            response = client.get(address)
+            self.assertEqual(response['X-Degraded'], 'stale')
+            self.assertEqual(response.content, fresh.content)
+            response = client.get(reverse(
+                'posts:post_detail', kwargs={'post_id': self.other.id}))
+            self.assertEqual(response.status_code, 503)
+            response = client.get(reverse('posts:index'))
+            self.assertEqual(response.status_code, 200)
+
+    def test_private_pages_are_not_stored(self):
+        """Страницы конкретного пользователя не сохраняются как копии."""
+        client = Client()
+        client.force_login(self.user)
+        client.get(reverse('posts:follow_index'))
+        with override_settings(DEGRADED_MODE=True):
+            response = Client().get(reverse('posts:follow_index'))
+            self.assertEqual(response.status_code, 503)
+            response = Client().post(reverse('posts:post_create'))
+            self.assertEqual(response.status_code, 503)
+
+    @override_settings(CONCURRENCY_LIMITS=NO_POST_DETAIL)
+    async def test_async_cache_calls_off_event_loop(self):
+        """В асинхронной цепочке кеш не вызывается из цикла событий."""
+        threads = set()
+
+        def record(method):
+            def wrapper(*args, **kwargs):
+                threads.add(threading.get_ident())
+                return method(*args, **kwargs)
+            return wrapper
+
+        methods = ('get', 'get_many', 'set', 'set_many', 'add')
+        patches = [
+            mock.patch.object(cache, name, record(getattr(cache, name)))
+            for name in methods
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        client = AsyncClient()
+        response = await client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        response = await client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.get_ident(), threads)
@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from posts.tasks import make_thumbnails
+from .. import metrics
+
+User = get_user_model()
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def value(metric, *labels):
+    return metric.values.get(labels, 0)
+
+
+def observations(histogram, *labels):
+    counts = histogram.values.get(labels)
+    # Последний элемент - сумма значений.
+    return sum(counts[:-1]) if counts else 0
+
+
+@override_settings(MEDIA_ROOT=os.path.join(TEMP_DIR, 'media'))
+class MetricsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.user, text='Текст')
+
+    def test_request_metrics(self):
+        """Запросы, их время и SQL-запросы считаются по представлениям."""
+        view = 'posts:post_detail'
+        requests = value(metrics.REQUESTS, view, 'GET', '200')
+        queries = value(metrics.QUERIES, view)
+        Client().get(reverse(view, args=[self.post.pk]))
+        self.assertEqual(
+            value(metrics.REQUESTS, view, 'GET', '200'), requests + 1)
+        self.assertGreater(value(metrics.QUERIES, view), queries)
+        self.assertGreater(value(metrics.QUERY_DURATION, view), 0)
+        with override_settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            text = Client().get(reverse('metrics')).content.decode()
+        self.assertIn(
+            '# TYPE yatube_http_request_duration_seconds histogram', text)
+        self.assertIn(
+            'yatube_http_request_duration_seconds_bucket'
+            '{view="posts:post_detail",le="+Inf"}', text)
+        self.assertIn(
+            'yatube_http_requests_total{view="posts:post_detail",'
+            'method="GET",status="200"}', text)
+        self.assertIn(f'process_resident_memory_bytes{{pid="{os.getpid()}"}}',
+                      text)
+
+    def test_closed_by_default(self):
+        """Без настроек метрики не отдаются никому, и локальным адресам."""
+        response = Client().get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_allowed_ips(self):
+        """Метрики отдаются только адресам METRICS_ALLOWED_IPS."""
+        response = Client(REMOTE_ADDR='10.0.0.1').get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+        response = Client().get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'],
+                       CLIENT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_allowed_ips_behind_proxy(self):
+        """За прокси проверяется адрес клиента, а не прокси."""
+        response = Client().get(
+            reverse('metrics'), HTTP_X_FORWARDED_FOR='10.0.0.1')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        """С токеном метрики отдаются с любого адреса."""
+        client = Client(REMOTE_ADDR='10.0.0.1')
+        response = client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        response = client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_cache(self):
+        """Попадания в кеш страниц считаются."""
+        hits = value(metrics.PAGE_CACHE, 'index_page', 'hit')
+        misses = value(metrics.PAGE_CACHE, 'index_page', 'miss')
+        Client().get(reverse('posts:index'))
+        Client().get(reverse('posts:index'))
+        self.assertEqual(
+            value(metrics.PAGE_CACHE, 'index_page', 'miss'), misses + 1)
+        self.assertEqual(
+            value(metrics.PAGE_CACHE, 'index_page', 'hit'), hits + 1)
+
+    def test_thumbnails(self):
+        """Создание миниатюры замеряется."""
+        post = Post.objects.create(
+            author=self.user,
+            text='С картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        generated = observations(metrics.THUMBNAILS)
+        make_thumbnails(post.pk)
+        self.assertEqual(observations(metrics.THUMBNAILS), generated + 1)
+
+    def test_processes(self):
+        """Значения процессов из METRICS_DIR складываются."""
+        metrics_dir = os.path.join(TEMP_DIR, 'metrics')
+        labels = ['posts:index', 'GET', '200']
+        with override_settings(METRICS_DIR=metrics_dir):
+            metrics.flush()
+            self.assertTrue(
+                os.path.exists(metrics.snapshot_path(os.getpid())))
+            other = {
+                metrics.REQUESTS.name: [[labels, 5]],
+                metrics.MEMORY.name: [[['1'], 100]],
+            }
+            with open(metrics.snapshot_path(1), 'w') as file:
+                json.dump(other, file)
+            stale = dict(other, **{metrics.MEMORY.name: [[['2'], 200]]})
+            with open(metrics.snapshot_path(2), 'w') as file:
+                json.dump(stale, file)
+            os.utime(metrics.snapshot_path(2), (0, 0))
+            collected = dict(metrics.collect())
+        requests = collected[metrics.REQUESTS]
+        self.assertEqual(
+            requests[tuple(labels)],
+            value(metrics.REQUESTS, *labels) + 10)
+        memory = collected[metrics.MEMORY]
+        self.assertEqual(memory[('1',)], 100)
+        self.assertNotIn(('2',), memory)
+        self.assertIn((str(os.getpid()),), memory)
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from ..models import RequestProfile
+
+User = get_user_model()
+PROFILING_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    PROFILING_ENABLED=True,
+    PROFILING_SAMPLE_RATE=0,
+    PROFILING_INTERVAL=0.0005,
+    PROFILING_DIR=PROFILING_DIR,
+    PROFILING_TOKEN='secret',
+)
+class ProfilingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.user, text='Текст')
+        self.url = reverse('posts:post_detail', args=[self.post.pk])
+
+    def test_header_with_token(self):
+        """Запрос с секретом в заголовке профилируется с любого адреса."""
+        Client(REMOTE_ADDR='10.0.0.1').get(self.url, HTTP_X_PROFILE='secret')
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.path, self.url)
+        self.assertEqual(profile.view_name, 'posts:post_detail')
+        self.assertEqual(profile.status_code, 200)
+        self.assertGreater(profile.sql_count, 0)
+        self.assertGreater(profile.template_time, 0)
+        self.assertLess(profile.sql_time, profile.duration)
+        self.assertLess(profile.template_time, profile.duration)
+        with open(profile.folded_path()) as file:
+            lines = file.read().splitlines()
+        counts = [int(line.rsplit(' ', 1)[1]) for line in lines]
+        self.assertEqual(sum(counts), profile.samples)
+
+    async def test_async(self):
+        """В асинхронной цепочке замеряются SQL-запросы и шаблоны."""
+        # AsyncClient в Django 3.2 принимает имена заголовков как есть.
+        await AsyncClient().get(self.url, **{'x-profile': 'secret'})
+        profile = await sync_to_async(RequestProfile.objects.get)()
+        self.assertGreater(profile.sql_count, 0)
+        self.assertGreater(profile.template_time, 0)
+
+    def test_header_without_token(self):
+        """Заголовок без верного секрета и запросы без него не
+        профилируются."""
+        Client().get(self.url, HTTP_X_PROFILE='1')
+        Client().get(self.url)
+        with override_settings(PROFILING_TOKEN=''):
+            Client().get(self.url, HTTP_X_PROFILE='secret')
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampling(self):
+        """Выборка профилирует запросы без заголовка."""
+        Client(REMOTE_ADDR='10.0.0.1').get(self.url)
+        self.assertEqual(RequestProfile.objects.count(), 1)
+
+    @override_settings(PROFILING_ENABLED=False, PROFILING_SAMPLE_RATE=1)
+    def test_disabled(self):
+        """Без PROFILING_ENABLED middleware отключается."""
+        Client().get(self.url, HTTP_X_PROFILE='secret')
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILING_MAX_PROFILES=1)
+    def test_prune(self):
+        """Старые профили удаляются вместе с файлами стеков."""
+        Client().get(self.url, HTTP_X_PROFILE='secret')
+        old = RequestProfile.objects.get()
+        Client().get(self.url, HTTP_X_PROFILE='secret')
+        profile = RequestProfile.objects.get()
+        self.assertNotEqual(profile.pk, old.pk)
+        self.assertFalse(os.path.exists(old.folded_path()))
+        self.assertTrue(os.path.exists(profile.folded_path()))
+
+    def test_admin(self):
+        """Админка показывает профили и отдаёт файл стеков."""
+        Client().get(self.url, HTTP_X_PROFILE='secret')
+        profile = RequestProfile.objects.get()
+        admin = User.objects.create_superuser(username='admin')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:core_requestprofile_changelist'))
+        self.assertContains(response, self.url)
+        folded = reverse('admin:core_requestprofile_folded', args=[profile.pk])
+        response = client.get(folded)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        anonymous = Client().get(folded)
+        self.assertEqual(anonymous.status_code, 302)
+        profile.delete()
+        self.assertFalse(os.path.exists(profile.folded_path()))
@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (Client, RequestFactory, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from ..ratelimit import get_client_ip, is_duplicate, take_token, take_tokens
+
+User = get_user_model()
+
+
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch('core.ratelimit.time.time')
+    def test_bucket_empties_and_refills(self, now):
+        """Ведро пропускает capacity запросов и наполняется со временем."""
+        now.return_value = 1000.0
+        for _ in range(3):
+            self.assertEqual(take_token('bucket', 3, 60), 0)
+        self.assertEqual(take_token('bucket', 3, 60), 20)
+        now.return_value = 1020.0
+        self.assertEqual(take_token('bucket', 3, 60), 0)
+        self.assertGreater(take_token('bucket', 3, 60), 0)
+
+    @mock.patch('core.ratelimit.time.time', return_value=1000.0)
+    def test_all_buckets_or_none(self, now):
+        """Пустое ведро отклоняет запрос, не расходуя остальные вёдра."""
+        take_token('user', 1, 60)
+        self.assertEqual(take_tokens([('ip', 1), ('user', 1)], 60), 60)
+        self.assertEqual(take_token('ip', 1, 60), 0)
+
+    def test_duplicate_text(self):
+        """Повтор текста с точностью до регистра и пробелов - дубликат."""
+        self.assertFalse(is_duplicate('comment', 1, 'Привет, мир'))
+        self.assertTrue(is_duplicate('comment', 1, '  привет,   МИР '))
+        self.assertFalse(is_duplicate('comment', 2, 'Привет, мир'))
+
+
+class ClientIpTests(TestCase):
+    def request(self, forwarded):
+        return RequestFactory().get(
+            '/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=forwarded)
+
+    def test_remote_addr_by_default(self):
+        """Без CLIENT_IP_HEADER заголовки прокси не учитываются."""
+        self.assertEqual(
+            get_client_ip(self.request('203.0.113.5')), '10.0.0.1')
+
+    @override_settings(CLIENT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_trusted_proxies(self):
+        """Клиент - адрес на TRUSTED_PROXY_COUNT позиций от конца."""
+        cases = {
+            (1, '1.1.1.1, 203.0.113.5'): '203.0.113.5',
+            (2, '1.1.1.1, 203.0.113.5, 10.0.0.2'): '203.0.113.5',
+            (2, '203.0.113.5'): '10.0.0.1',
+            (1, ''): '10.0.0.1',
+        }
+        for (count, forwarded), address in cases.items():
+            with self.subTest(forwarded=forwarded, count=count):
+                with override_settings(TRUSTED_PROXY_COUNT=count):
+                    self.assertEqual(
+                        get_client_ip(self.request(forwarded)), address)
+
+
+@override_settings(RATELIMITS={'comment': '2/m', 'post': '20/h',
+                               'follow': '60/m'})
+class RateLimitedViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def comment(self, text):
+        return self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': text},
+        )
+
+    def test_add_comment_limited(self):
+        """Сверх лимита комментарии отклоняются с кодом 429."""
+        self.assertEqual(self.comment('Первый').status_code, 302)
+        self.assertEqual(self.comment('Второй').status_code, 302)
+        response = self.comment('Третий')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_duplicate_comment_dropped(self):
+        """Повторный комментарий с тем же текстом не сохраняется."""
+        self.comment('Одинаковый текст')
+        self.comment('Одинаковый  текст')
+        self.assertEqual(Comment.objects.count(), 1)
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from ..routers import (PrimaryReplicaRouter, is_pinned, pin_to_primary,
+                       primary, reset_pinning)
+
+User = get_user_model()
+
+
+@override_settings(REPLICA_DATABASES=['replica_1'])
+class PrimaryReplicaRouterTests(TestCase):
+    def setUp(self):
+        reset_pinning()
+        self.router = PrimaryReplicaRouter()
+
+    def tearDown(self):
+        reset_pinning()
+
+    def test_reads_go_to_replica(self):
+        """Чтение без предшествующей записи идёт на реплику."""
+        self.assertEqual(self.router.db_for_read(Post), 'replica_1')
+
+    def test_writes_go_to_primary(self):
+        """Запись идёт в основную базу."""
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_read_after_write_goes_to_primary(self):
+        """После записи чтение закреплено за основной базой."""
+        self.router.db_for_write(Post)
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_pinned_reads_go_to_primary(self):
+        pin_to_primary()
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas_reads_go_to_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_primary_block(self):
+        """В блоке primary() чтение идёт в основную базу, после - снова
+        на реплику, даже если в блоке была запись."""
+        with primary():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+            self.router.db_for_write(Post)
+        self.assertFalse(is_pinned())
+        self.assertEqual(self.router.db_for_read(Post), 'replica_1')
+        pin_to_primary()
+        with primary():
+            pass
+        self.assertTrue(is_pinned())
+
+
+class ReplicaPinningMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.author = User.objects.create_user(username='Author')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_write_sets_pin_cookie(self):
+        """После записи клиент получает cookie закрепления."""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Новый пост'})
+        cookie = response.cookies.get(settings.REPLICA_PIN_COOKIE)
+        self.assertIsNotNone(cookie)
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+
+    def test_read_does_not_set_pin_cookie(self):
+        """Запрос без записи не закрепляет клиента."""
+        response = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': self.author}))
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
@@ -0,0 +1,80 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Post
+from ..sessions import clear_expired_sessions
+
+User = get_user_model()
+
+
+class SessionTests(TestCase):
+    def test_clear_expired_sessions(self):
+        """Удаляются только истёкшие сессии, пачками."""
+        now = timezone.now()
+        for number in range(5):
+            Session.objects.create(
+                session_key=f'expired{number}',
+                session_data='',
+                expire_date=now - timedelta(days=1),
+            )
+        Session.objects.create(
+            session_key='active',
+            session_data='',
+            expire_date=now + timedelta(days=1),
+        )
+        with self.assertNumQueries(6):
+            self.assertEqual(clear_expired_sessions(batch_size=2), 5)
+        self.assertEqual(
+            list(Session.objects.values_list('pk', flat=True)), ['active'])
+        out = StringIO()
+        call_command('clear_expired_sessions', stdout=out)
+        self.assertIn('Удалено сессий: 0', out.getvalue())
+
+    def test_benchmark_leaves_no_data(self):
+        """Замер сессий не оставляет пользователя и пост в базе."""
+        out = StringIO()
+        call_command('benchmark_sessions', requests=1, stdout=out)
+        self.assertIn('cached_db', out.getvalue())
+        self.assertFalse(
+            User.objects.filter(username='benchmark-sessions').exists())
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(REQUEST_RATELIMIT='2/m')
+    def test_benchmark_measures_normal_requests(self):
+        """Замер не упирается в лимит запросов и не читает пользователя
+        сессии из базы."""
+        with mock.patch.object(
+                ModelBackend, 'get_user', wraps=ModelBackend.get_user,
+                autospec=True) as get_user:
+            call_command('benchmark_sessions', requests=2, stdout=StringIO())
+        get_user.assert_not_called()
+
+    def session_queries(self, engine):
+        with override_settings(SESSION_ENGINE=engine):
+            client = Client()
+            client.force_login(User.objects.create_user(username=engine))
+            client.get(reverse('posts:follow_index'))
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 200)
+        return [query for query in queries if 'django_session' in query['sql']]
+
+    def test_cached_sessions_skip_database(self):
+        """Сессии из кеша и из cookie не читают django_session."""
+        self.assertTrue(
+            self.session_queries('django.contrib.sessions.backends.db'))
+        self.assertFalse(
+            self.session_queries('django.contrib.sessions.backends.cached_db'))
+        self.assertFalse(self.session_queries(
+            'django.contrib.sessions.backends.signed_cookies'))
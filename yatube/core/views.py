@@ -1,4 +1,18 @@
+from django.conf import settings
+from django.http import (Http404, HttpResponse, HttpResponseBadRequest,
+                         StreamingHttpResponse)
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .events import parse_channels, stream
+from .metrics import render as render_metrics
+
+EVENT_STREAM_HEADERS = {
+    'Content-Type': 'text/event-stream; charset=utf-8',
+    'Cache-Control': 'no-cache',
+    # nginx не должен буферизовать поток.
+    'X-Accel-Buffering': 'no',
+}
 
 
 def page_not_found(request, exception):
@@ -7,3 +21,52 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def too_many_requests(request, retry_after):
+    response = render(request, 'core/429.html', status=429)
+    response['Retry-After'] = str(max(1, round(retry_after)))
+    return response
+
+
+def events(request):
+    """Поток событий каналов ?channels=... для WSGI-сервера.
+
+    Каждый открытый поток занимает поток сервера; под ASGI поток
+    отдаёт core.asgi.EventStreamMiddleware без участия Django.
+    """
+    try:
+        channels = parse_channels(request.GET.get('channels', ''))
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(stream(channels))
+    for header, value in EVENT_STREAM_HEADERS.items():
+        response[header] = value
+    return response
+
+
+def metrics_allowed(request):
+    """Запрос с токеном METRICS_TOKEN или с адреса METRICS_ALLOWED_IPS.
+
+    Адрес клиента берётся через get_client_ip: за прокси без
+    CLIENT_IP_HEADER это адрес прокси.
+    """
+    # ratelimit импортирует views.
+    from .ratelimit import get_client_ip
+
+    scheme, _, token = request.META.get(
+        'HTTP_AUTHORIZATION', '').partition(' ')
+    if (settings.METRICS_TOKEN and scheme.lower() == 'bearer'
+            and constant_time_compare(token, settings.METRICS_TOKEN)):
+        return True
+    return get_client_ip(request) in settings.METRICS_ALLOWED_IPS
+
+
+def metrics(request):
+    """Метрики для Prometheus, по умолчанию закрыты (см. metrics_allowed)."""
+    if not metrics_allowed(request):
+        raise Http404
+    return HttpResponse(
+        render_metrics(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,21 @@
+from django.contrib import admin
+
+from .models import OutgoingEmail
+
+
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'subject',
+        'to',
+        'status',
+        'attempts',
+        'send_after',
+        'sent',
+    )
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('locked_by', 'locked_at', 'last_error')
+
+
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
@@ -0,0 +1,38 @@
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .models import OutgoingEmail
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Сохраняет письма в очередь вместо отправки.
+
+    Запрос, отправляющий письмо, не ждёт SMTP: письма записываются в
+    таблицу OutgoingEmail одним INSERT в текущей транзакции, а
+    отправляет их `manage.py send_queued_mail` через
+    MAIL_DELIVERY_BACKEND. Вложения не поддерживаются.
+    """
+
+    def send_messages(self, email_messages):
+        emails = []
+        for message in email_messages:
+            if message.attachments:
+                if self.fail_silently:
+                    continue
+                raise ValueError('Письма с вложениями нельзя поставить '
+                                 'в очередь.')
+            emails.append(OutgoingEmail(
+                subject=message.subject,
+                body=message.body,
+                from_email=message.from_email,
+                to=message.to,
+                cc=message.cc,
+                bcc=message.bcc,
+                reply_to=message.reply_to,
+                headers=message.extra_headers,
+                alternatives=[
+                    list(alternative) for alternative in getattr(
+                        message, 'alternatives', [])
+                ],
+            ))
+        OutgoingEmail.objects.bulk_create(emails)
+        return len(emails)
@@ -0,0 +1,41 @@
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import metrics
+from core.routers import primary
+from mail.outbox import claim, deliver
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch', type=int, default=settings.MAIL_BATCH_SIZE,
+            help='Сколько писем отправлять через одно соединение.')
+        parser.add_argument(
+            '--sleep', type=float, default=5.0,
+            help='Пауза в секундах, когда очередь пуста.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Отправить готовые письма и завершиться.')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        sent = 0
+        with metrics.exporting():
+            while True:
+                with primary():
+                    emails = claim(worker, options['batch'])
+                    if emails:
+                        sent += deliver(emails)
+                if emails:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        self.stdout.write(f'Отправлено писем: {sent}')
@@ -0,0 +1,90 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutgoingEmail(models.Model):
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (SENDING, 'Отправляется'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    subject = models.TextField(
+        verbose_name='Тема',
+        blank=True,
+    )
+    body = models.TextField(
+        verbose_name='Текст',
+        blank=True,
+    )
+    from_email = models.CharField(
+        verbose_name='Отправитель',
+        max_length=254,
+    )
+    to = models.JSONField(
+        verbose_name='Получатели',
+        default=list,
+    )
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    reply_to = models.JSONField(default=list, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+    alternatives = models.JSONField(
+        verbose_name='Альтернативные версии',
+        default=list,
+        blank=True,
+        help_text='Пары [содержимое, MIME-тип], например HTML-версия',
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток',
+        default=0,
+    )
+    send_after = models.DateTimeField(
+        verbose_name='Отправить после',
+        default=timezone.now,
+    )
+    locked_by = models.CharField(
+        verbose_name='Обработчик',
+        max_length=64,
+        blank=True,
+    )
+    locked_at = models.DateTimeField(
+        verbose_name='Взято в работу',
+        blank=True,
+        null=True,
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True,
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True,
+    )
+    sent = models.DateTimeField(
+        verbose_name='Дата отправки',
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        verbose_name = 'Письмо'
+        verbose_name_plural = 'Исходящие письма'
+        ordering = ['send_after']
+        indexes = [
+            models.Index(fields=['status', 'send_after']),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} ({self.get_status_display()})'
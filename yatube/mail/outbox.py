@@ -0,0 +1,107 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempt):
+    """Экспоненциальная задержка перед повторной отправкой."""
+    return settings.MAIL_RETRY_DELAY * 2 ** (attempt - 1)
+
+
+def claim(worker, limit):
+    """Забирает пачку писем, готовых к отправке, для обработчика.
+
+    Письма захватываются одним UPDATE, поэтому несколько
+    обработчиков не отправят одно письмо дважды.
+    """
+    now = timezone.now()
+    OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENDING,
+        locked_at__lt=now - timedelta(seconds=settings.MAIL_LOCK_TIMEOUT),
+    ).update(status=OutgoingEmail.PENDING, locked_by='')
+    due = OutgoingEmail.objects.filter(
+        status=OutgoingEmail.PENDING, send_after__lte=now,
+    ).values_list('pk', flat=True)[:limit]
+    OutgoingEmail.objects.filter(
+        pk__in=list(due), status=OutgoingEmail.PENDING,
+    ).update(status=OutgoingEmail.SENDING, locked_by=worker, locked_at=now)
+    return list(OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENDING, locked_by=worker, locked_at=now,
+    ))
+
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        cc=email.cc,
+        bcc=email.bcc,
+        reply_to=email.reply_to,
+        headers=email.headers,
+        connection=connection,
+    )
+    for content, mimetype in email.alternatives:
+        message.attach_alternative(content, mimetype)
+    return message
+
+
+def failed(email, error):
+    email.attempts += 1
+    email.last_error = error
+    if email.attempts >= settings.MAIL_MAX_ATTEMPTS:
+        email.status = OutgoingEmail.FAILED
+    else:
+        email.status = OutgoingEmail.PENDING
+        email.send_after = timezone.now() + timedelta(
+            seconds=retry_delay(email.attempts))
+
+
+def send(email, connection):
+    try:
+        connection.send_messages([build_message(email, connection)])
+    except Exception:
+        logger.exception('Email %s failed', email.pk)
+        failed(email, traceback.format_exc())
+    else:
+        email.attempts += 1
+        email.status = OutgoingEmail.SENT
+        email.sent = timezone.now()
+
+
+def deliver(emails):
+    """Отправляет пачку писем через одно соединение.
+
+    Ошибка одного письма не мешает остальным; неотправленные письма
+    возвращаются в очередь с задержкой, после MAIL_MAX_ATTEMPTS
+    попыток помечаются как ошибочные. Возвращает число отправленных.
+    """
+    connection = get_connection(settings.MAIL_DELIVERY_BACKEND)
+    try:
+        connection.open()
+    except Exception:
+        logger.exception('Could not open mail connection')
+        error = traceback.format_exc()
+        for email in emails:
+            failed(email, error)
+    else:
+        try:
+            for email in emails:
+                send(email, connection)
+        finally:
+            connection.close()
+    for email in emails:
+        email.locked_by = ''
+    OutgoingEmail.objects.bulk_update(emails, [
+        'status', 'attempts', 'send_after', 'locked_by', 'last_error', 'sent',
+    ])
+    return sum(email.status == OutgoingEmail.SENT for email in emails)
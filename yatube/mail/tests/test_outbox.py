@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives, send_mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import OutgoingEmail
+
+User = get_user_model()
+
+
+class FlakyBackend(EmailBackend):
+    """Не доставляет письма на bad@example.com, считает соединения."""
+
+    opened = 0
+
+    def open(self):
+        FlakyBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if 'bad@example.com' in message.to:
+                raise ConnectionError('Сервер отклонил письмо')
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='mail.backends.OutboxBackend',
+    MAIL_DELIVERY_BACKEND=f'{__name__}.FlakyBackend',
+    MAIL_RETRY_DELAY=0,
+    MAIL_MAX_ATTEMPTS=2,
+)
+class OutboxTests(TestCase):
+    def setUp(self):
+        FlakyBackend.opened = 0
+
+    def send_queued(self):
+        call_command('send_queued_mail', '--once', stdout=StringIO())
+
+    def test_password_reset_enqueues_email(self):
+        """Сброс пароля ставит письмо в очередь, а не отправляет его."""
+        User.objects.create_user(
+            username='User', email='user@example.com', password='pass')
+        response = self.client.post(
+            reverse('users:password_reset'), {'email': 'user@example.com'})
+        self.assertRedirects(response, reverse('users:password_reset_done'))
+        self.assertEqual(mail.outbox, [])
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.to, ['user@example.com'])
+        self.send_queued()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body, email.body)
+
+    def test_batch_sent_over_one_connection(self):
+        """Пачка писем отправляется через одно соединение."""
+        for number in range(3):
+            send_mail(f'Тема {number}', 'Текст', None, [f'{number}@a.ru'])
+        message = EmailMultiAlternatives('HTML', 'Текст', to=['html@a.ru'])
+        message.attach_alternative('<p>Текст</p>', 'text/html')
+        message.send()
+        self.send_queued()
+        self.assertEqual(FlakyBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual(
+            mail.outbox[3].alternatives, [('<p>Текст</p>', 'text/html')])
+        self.assertFalse(OutgoingEmail.objects.exclude(
+            status=OutgoingEmail.SENT).exists())
+
+    def test_failed_email_retried(self):
+        """Неотправленное письмо повторяется, затем помечается ошибкой."""
+        send_mail('Тема', 'Текст', None, ['bad@example.com'])
+        send_mail('Тема', 'Текст', None, ['good@example.com'])
+        self.send_queued()
+        self.assertEqual([m.to for m in mail.outbox], [['good@example.com']])
+        bad = OutgoingEmail.objects.get(to=['bad@example.com'])
+        self.assertEqual(bad.status, OutgoingEmail.FAILED)
+        self.assertEqual(bad.attempts, 2)
+        self.assertIn('Сервер отклонил письмо', bad.last_error)
@@ -1,6 +1,28 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.auth.admin import UserAdmin
 
-from .models import Comment, Follow, Group, Post
+from core.pagination import EstimatedCountPaginator
+from .models import Comment, Follow, Group, ModerationJob, Post, User
+from .search import search_posts
+from .tasks import delete_account, run_moderation_job
+
+
+@admin.action(description='Удалить всё содержимое их авторов (в фоне)')
+def delete_authors_content(modeladmin, request, queryset):
+    author_ids = set(queryset.values_list('author_id', flat=True))
+    for author_id in author_ids:
+        job = ModerationJob.objects.create(
+            kind=ModerationJob.DELETE_USER_CONTENT,
+            user_id=author_id,
+            created_by=request.user,
+        )
+        run_moderation_job.delay(job.pk)
+    modeladmin.message_user(
+        request,
+        f'Запущено заданий модерации: {len(author_ids)}. '
+        f'Ход выполнения - в разделе «Задания модерации».',
+        messages.SUCCESS,
+    )
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -11,13 +33,116 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = (delete_authors_content,)
+    empty_value_display = '-пусто-'
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по полнотекстовому индексу вместо LIKE '%...%'."""
+        if search_term:
+            found = search_posts(queryset, search_term)
+            if found is not None:
+                return found, False
+        return super().get_search_results(request, queryset, search_term)
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('title', 'slug')
+    search_fields = ('title', 'slug')
+
+
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    raw_id_fields = ('post', 'parent')
+    autocomplete_fields = ('author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = (delete_authors_content,)
     empty_value_display = '-пусто-'
 
 
+class ModerationJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'kind',
+        'status',
+        'progress',
+        'created_by',
+        'created',
+        'finished',
+    )
+    list_filter = ('status', 'kind')
+    autocomplete_fields = ('user', 'source_group', 'target_group')
+    fields = ('kind', 'user', 'source_group', 'target_group', 'pattern')
+
+    @admin.display(description='Прогресс')
+    def progress(self, job):
+        total = '?' if job.total is None else job.total
+        return f'{job.processed} / {total}'
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            return ()
+        return self.fields + ('status', 'progress', 'created_by', 'finished')
+
+    def get_fields(self, request, obj=None):
+        return self.get_readonly_fields(request, obj) or self.fields
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            return
+        obj.created_by = request.user
+        obj.save()
+        run_moderation_job.delay(obj.pk)
+
+
+class AccountAdmin(UserAdmin):
+    """Удаляет пользователей в фоне задачей delete_account.
+
+    Стандартное удаление (и его страница подтверждения) загружает в
+    память все посты, комментарии и подписки пользователя.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        perms_needed = {
+            model._meta.verbose_name
+            for model in (Post, Comment, Follow)
+            if not request.user.has_perm(
+                f'{model._meta.app_label}.delete_{model._meta.model_name}')
+        }
+        deleted = [
+            f'{user}: посты, комментарии и подписки удаляются в фоне'
+            for user in objs
+        ]
+        return deleted, {}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        delete_account.delay(obj.pk)
+        self.message_user(
+            request, 'Пользователь будет удалён в фоне.', messages.INFO)
+
+    def delete_queryset(self, request, queryset):
+        user_ids = list(queryset.values_list('pk', flat=True))
+        for user_id in user_ids:
+            delete_account.delay(user_id)
+        self.message_user(
+            request,
+            f'Пользователей будет удалено в фоне: {len(user_ids)}.',
+            messages.INFO,
+        )
+
+
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow)
+admin.site.register(ModerationJob, ModerationJobAdmin)
+admin.site.unregister(User)
+admin.site.register(User, AccountAdmin)
@@ -0,0 +1,140 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils.http import quote_etag
+
+from core.cache import generation_key, get_generations, invalidation
+from .models import Follow, Group, Post, User
+
+INDEX_SCOPE = 'index'
+FOLLOWING_TIMEOUT = 60 * 60 * 24
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(author_id):
+    return f'profile:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def following_key(user_id):
+    return f'following:{user_id}'
+
+
+def get_following_ids(user):
+    """Возвращает множество id авторов, на которых подписан user.
+
+    Множество хранится в кеше кортежем id и сбрасывается при изменении
+    подписок, так что проверка подписки не требует запросов к базе.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    key = following_key(user.pk)
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = tuple(Follow.objects.filter(user_id=user.pk).order_by(
+            'author_id').values_list('author_id', flat=True))
+        cache.set(key, author_ids, FOLLOWING_TIMEOUT)
+    return frozenset(author_ids)
+
+
+def invalidate_post(post, old_group_id=None):
+    """Сбрасывает ленты и страницы, где выводится пост."""
+    scopes = [
+        INDEX_SCOPE,
+        profile_scope(post.author_id),
+        post_scope(post.pk),
+    ]
+    for group_id in {post.group_id, old_group_id} - {None}:
+        scopes.append(group_scope(group_id))
+    invalidation.invalidate(*scopes)
+
+    def follower_feeds():
+        followers = Follow.objects.filter(
+            author_id=post.author_id).values_list('user_id', flat=True)
+        return [
+            generation_key(follow_scope(user_id))
+            for user_id in followers.iterator()
+        ]
+    invalidation.add_lazy(('followers', post.author_id), follower_feeds)
+
+
+def invalidate_group(group):
+    invalidation.invalidate(group_scope(group.pk))
+
+
+def invalidate_comment(comment):
+    invalidation.invalidate(post_scope(comment.post_id))
+
+
+def invalidate_follows(user_id):
+    invalidation.invalidate(follow_scope(user_id))
+    invalidation.add(following_key(user_id))
+
+
+def invalidate_follow(follow):
+    invalidate_follows(follow.user_id)
+
+
+def page_validators(scopes, *dates):
+    """Возвращает ETag и Last-Modified страницы без её рендеринга.
+
+    Валидаторы строятся из поколений областей кеша (меняются при любой
+    записи) и дат последних публикаций (меняются и при массовых
+    вставках в обход сигналов).
+    """
+    generations = get_generations(scopes)
+    parts = [str(generations[scope]) for scope in scopes]
+    parts += [str(date.timestamp()) for date in dates if date]
+    etag = quote_etag(hashlib.md5('.'.join(parts).encode()).hexdigest())
+    modified = [date for date in dates if date]
+    modified += [
+        datetime.fromtimestamp(generation / 1e9, timezone.utc)
+        for generation in generations.values()
+    ]
+    return etag, max(modified)
+
+
+def index_validators(request):
+    latest = Post.objects.values_list('pub_date', flat=True).first()
+    return page_validators([INDEX_SCOPE], latest)
+
+
+def group_validators(request, slug):
+    row = Group.objects.filter(slug=slug).annotate(
+        latest=Max('posts__pub_date')).values_list('pk', 'latest').first()
+    if row is None:
+        return None
+    group_id, latest = row
+    return page_validators([group_scope(group_id)], latest)
+
+
+def profile_validators(request, username):
+    row = User.objects.filter(username=username).annotate(
+        latest=Max('posts__pub_date')).values_list('pk', 'latest').first()
+    if row is None:
+        return None
+    author_id, latest = row
+    return page_validators([profile_scope(author_id)], latest)
+
+
+def post_detail_validators(request, post_id):
+    row = Post.objects.filter(pk=post_id).annotate(
+        latest=Max('comments__created'),
+    ).values_list('author_id', 'pub_date', 'latest').first()
+    if row is None:
+        return None
+    author_id, pub_date, latest = row
+    scopes = [post_scope(post_id), profile_scope(author_id)]
+    return page_validators(scopes, pub_date, latest)
@@ -0,0 +1,140 @@
+"""Удаление пользователя вместе с его содержимым.
+
+Каскадное удаление Django загружает все связанные объекты в память,
+чтобы послать сигналы. Здесь строки удаляются пачками по возрастанию
+id прямыми DELETE, а то, что делали сигналы (сброс кеша, рейтинги),
+делается явно: страницы постов - после каждой пачки, ленты - один раз
+в конце. Файлы картинок удаляет фоновая задача после коммита.
+"""
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from core.cache import invalidation
+from core.routers import raw_delete
+from . import trending
+from .cache import (INDEX_SCOPE, follow_scope, following_key, group_scope,
+                    post_scope, profile_scope)
+from .models import (Comment, Follow, Notification, Post, Suggestion,
+                     TrendingPost, User)
+
+# SQLite не разбирает условие глубже 1000 уровней, а каждое OR в
+# условии удаления поддеревьев - уровень.
+SUBTREES_PER_DELETE = 500
+
+
+def keyset_batches(queryset, fields, batch_size):
+    """Пачки строк (id, *fields) по возрастанию id.
+
+    Каждая пачка выбирается по индексу от последнего id предыдущей,
+    так что удалённые строки не просматриваются повторно.
+    """
+    last_id = 0
+    while True:
+        batch = queryset.filter(pk__gt=last_id).order_by('pk')
+        rows = list(batch.values_list('pk', *fields)[:batch_size])
+        if rows:
+            yield rows
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1][0]
+
+
+def delete_posts(rows):
+    """Удаляет пачку постов с комментариями и записями рейтинга."""
+    # tasks импортирует модули, которые импортируют этот.
+    from .tasks import delete_media
+
+    post_ids = [post_id for post_id, _, _ in rows]
+    with transaction.atomic():
+        raw_delete(Comment.objects.filter(post_id__in=post_ids))
+        raw_delete(TrendingPost.objects.filter(post_id__in=post_ids))
+        raw_delete(Notification.objects.filter(post_id__in=post_ids))
+        raw_delete(Post.objects.filter(pk__in=post_ids))
+        invalidation.invalidate(*map(post_scope, post_ids))
+        images = [image for _, _, image in rows if image]
+        if images:
+            delete_media.delay(images)
+
+
+def delete_comments(rows):
+    """Удаляет пачку комментариев вместе с ответами на них.
+
+    Ответы - поддеревья комментариев, их пути начинаются с путей
+    комментариев пачки: всё удаляется одним DELETE по началу путей
+    (на каждые SUBTREES_PER_DELETE поддеревьев). Пути, вложенные в
+    другие пути пачки, отбрасываются.
+    """
+    prefixes = []
+    for path in sorted(path for _, _, path in rows if path):
+        if not prefixes or not path.startswith(prefixes[-1]):
+            prefixes.append(path)
+    # Комментарий без пути (не дописанный при сохранении) - без ответов.
+    conditions = [Q(pk__in=[pk for pk, _, path in rows if not path])]
+    conditions += [Q(path__startswith=prefix) for prefix in prefixes]
+    with transaction.atomic():
+        for start in range(0, len(conditions), SUBTREES_PER_DELETE):
+            raw_delete(Comment.objects.filter(reduce(
+                operator.or_, conditions[start:start + SUBTREES_PER_DELETE])))
+        post_ids = {post_id for _, post_id, _ in rows} - {None}
+        invalidation.invalidate(*map(post_scope, post_ids))
+
+
+def delete_followers(rows):
+    """Удаляет подписки на автора и сбрасывает ленты подписчиков."""
+    with transaction.atomic():
+        raw_delete(Follow.objects.filter(pk__in=[pk for pk, _ in rows]))
+        user_ids = [user_id for _, user_id in rows]
+        invalidation.invalidate(*map(follow_scope, user_ids))
+        invalidation.add(*map(following_key, user_ids))
+
+
+def delete_user(user_id, batch_size=None):
+    """Удаляет пользователя и всё, что он опубликовал.
+
+    Память не зависит от числа постов, комментариев и подписчиков:
+    в ней держится только текущая пачка. Прерванное удаление можно
+    запустить снова. Возвращает число удалённых постов и комментариев.
+    """
+    batch_size = batch_size or settings.USER_DELETION_BATCH_SIZE
+    stats = {'posts': 0, 'comments': 0}
+    group_ids = set()
+    posts = Post.objects.filter(author_id=user_id)
+    for rows in keyset_batches(posts, ['group_id', 'image'], batch_size):
+        delete_posts(rows)
+        group_ids.update(group_id for _, group_id, _ in rows)
+        stats['posts'] += len(rows)
+    comments = Comment.objects.filter(author_id=user_id)
+    for rows in keyset_batches(
+            comments, ['post_id', 'path'], batch_size):
+        delete_comments(rows)
+        stats['comments'] += len(rows)
+    followers = Follow.objects.filter(author_id=user_id)
+    for rows in keyset_batches(followers, ['user_id'], batch_size):
+        delete_followers(rows)
+    querysets = [
+        Follow.objects.filter(user_id=user_id),
+        Suggestion.objects.filter(Q(user_id=user_id) | Q(author_id=user_id)),
+        Notification.objects.filter(user_id=user_id),
+    ]
+    for queryset in querysets:
+        for rows in keyset_batches(queryset, [], batch_size):
+            raw_delete(queryset.model.objects.filter(
+                pk__in=[pk for pk, in rows]))
+    group_ids.discard(None)
+    with transaction.atomic():
+        # Связанных строк уже нет, и каскад ничего не загружает.
+        User.objects.filter(pk=user_id).delete()
+        invalidation.invalidate(
+            INDEX_SCOPE,
+            profile_scope(user_id),
+            *map(group_scope, group_ids),
+        )
+        invalidation.add(following_key(user_id))
+        scopes = [trending.POSTS_SCOPE, trending.GROUPS_SCOPE]
+        scopes += map(trending.group_posts_scope, group_ids)
+        transaction.on_commit(lambda: trending.forget(*scopes))
+    return stats
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.routers import primary
+from posts.trending import backfill
+
+
+class Command(BaseCommand):
+    help = 'Заполняет рейтинги «в тренде» постов, у которых их нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов обрабатывать за одну транзакцию.')
+
+    def handle(self, *args, **options):
+        with primary():
+            total = backfill(batch_size=options['batch_size'])
+        self.stdout.write(f'Добавлено рейтингов постов: {total}')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import compute_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «на кого подписаться».'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', type=int,
+            help='Сколько рекомендаций хранить для пользователя.')
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help='Сколько пользователей обрабатывать за одну транзакцию.')
+
+    def handle(self, *args, **options):
+        total = compute_suggestions(
+            count=options['count'], chunk_size=options['chunk_size'])
+        self.stdout.write(f'Сохранено рекомендаций: {total}')
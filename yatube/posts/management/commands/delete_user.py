@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.routers import primary
+from posts.deletion import delete_user
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Удаляет пользователя вместе с его постами и комментариями.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Сколько строк удалять за одну транзакцию.')
+
+    def handle(self, *args, **options):
+        with primary():
+            user_id = User.objects.filter(
+                username=options['username'],
+            ).values_list('pk', flat=True).first()
+            if user_id is None:
+                raise CommandError('Пользователь не найден.')
+            stats = delete_user(user_id, batch_size=options['batch_size'])
+        self.stdout.write(
+            f'Удалено постов: {stats["posts"]}, '
+            f'комментариев: {stats["comments"]}')
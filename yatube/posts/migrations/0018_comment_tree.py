@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_paths(apps, schema_editor):
+    # До появления ответов все комментарии - верхнего уровня.
+    Comment = apps.get_model('posts', 'Comment')
+    comments = Comment.objects.filter(path='').only('id')
+    batch = []
+    for comment in comments.iterator(chunk_size=1000):
+        comment.path = f'{comment.id:010d}'
+        batch.append(comment)
+        if len(batch) == 1000:
+            Comment.objects.bulk_update(batch, ['path'])
+            batch = []
+    Comment.objects.bulk_update(batch, ['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Уровень вложенности'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.comment', verbose_name='Ответ на комментарий'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=60, verbose_name='Путь в дереве'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='thread',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.comment', verbose_name='Комментарий верхнего уровня'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'depth', 'created'], name='posts_comme_post_id_505e92_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['thread', 'path'], name='posts_comme_thread__f15131_idx'),
+        ),
+        migrations.RunPython(set_paths, migrations.RunPython.noop),
+    ]
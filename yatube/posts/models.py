@@ -1,7 +1,11 @@
+import re
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, router, transaction
 
-from yatube.settings import MAX_CHAR_TITLE
+from core.routers import raw_delete
+from yatube.settings import COMMENTS_MAX_DEPTH, MAX_CHAR_TITLE
 
 User = get_user_model()
 
@@ -40,6 +44,11 @@ class Post(models.Model):
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date']),
+            models.Index(fields=['author', '-pub_date']),
+            models.Index(fields=['group', '-pub_date']),
+        ]
 
     def __str__(self):
         return self.text[:MAX_CHAR_TITLE]
@@ -58,6 +67,54 @@ class Group(models.Model):
         return self.title
 
 
+# Длина сегмента материализованного пути комментария: id с нулями слева.
+PATH_SEGMENT_LENGTH = 10
+
+
+def path_segment(pk):
+    return f'{pk:0{PATH_SEGMENT_LENGTH}d}'
+
+
+class CommentQuerySet(models.QuerySet):
+    def subtree(self, comment, max_depth=COMMENTS_MAX_DEPTH):
+        """Комментарий и все ответы на него одним запросом.
+
+        Порядок по пути - обход дерева в глубину, ответы после
+        родителя в порядке добавления.
+        """
+        return self.filter(
+            path__startswith=comment.path, depth__lte=max_depth,
+        ).order_by('path')
+
+    def threads(self, roots, max_depth=COMMENTS_MAX_DEPTH):
+        """Ответы на комментарии верхнего уровня roots одним запросом."""
+        return self.filter(
+            thread__in=roots, depth__lte=max_depth,
+        ).order_by('path')
+
+    def with_reply_cutoff(self, limit):
+        """Добавляет replies_cutoff - путь ответа номер limit + 1.
+
+        Ответы с путём меньше него - первые limit ответов ветки в
+        порядке обхода; None - ответов не больше limit. Подзапрос
+        читает по индексу (thread, path) не больше limit + 1 строк.
+        """
+        replies = Comment.objects.filter(
+            thread=models.OuterRef('pk')).order_by('path')
+        return self.annotate(replies_cutoff=models.Subquery(
+            replies.values('path')[limit:limit + 1]))
+
+    def first_replies(self, roots):
+        """Ответы roots, аннотированных with_reply_cutoff, до отсечки."""
+        condition = models.Q(thread__in=[
+            root for root in roots if root.replies_cutoff is None])
+        for root in roots:
+            if root.replies_cutoff is not None:
+                condition |= models.Q(
+                    thread=root, path__lt=root.replies_cutoff)
+        return self.filter(condition).order_by('path')
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         'Post',
@@ -81,15 +138,97 @@ class Comment(models.Model):
         verbose_name='Дата публикации комментария',
         auto_now_add=True,
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='replies',
+        verbose_name='Ответ на комментарий',
+    )
+    thread = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name='Комментарий верхнего уровня',
+    )
+    depth = models.PositiveSmallIntegerField('Уровень вложенности', default=0)
+    path = models.CharField(
+        'Путь в дереве',
+        max_length=PATH_SEGMENT_LENGTH * (COMMENTS_MAX_DEPTH + 1),
+        blank=True,
+        editable=False,
+        db_index=True,
+    )
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', 'created']),
+            models.Index(fields=['post', 'depth', 'created']),
+            models.Index(fields=['thread', 'path']),
+        ]
+
+    def save(self, *args, **kwargs):
+        creating = self.pk is None
+        if not creating:
+            return super().save(*args, **kwargs)
+        if self.parent_id is not None:
+            self.depth = self.parent.depth + 1
+            self.thread_id = self.parent.thread_id or self.parent_id
+        using = kwargs.get('using') or router.db_for_write(
+            Comment, instance=self)
+        # Без пути комментарий не виден в дереве: вставка и запись пути
+        # выполняются вместе.
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            # Путь включает собственный id, известный только после вставки.
+            parent_path = self.parent.path if self.parent_id else ''
+            self.path = parent_path + path_segment(self.pk)
+            Comment.objects.using(using).filter(pk=self.pk).update(
+                path=self.path)
 
     def __str__(self):
         return self.text
 
 
+class FollowManager(models.Manager):
+    def follow(self, user, usernames):
+        """Подписывает user на авторов из списка одним INSERT.
+
+        Существующие подписки, несуществующие имена и сам user
+        пропускаются.
+        """
+        authors = User.objects.filter(
+            username__in=usernames).exclude(pk=user.pk).values_list(
+                'pk', flat=True)
+        self.bulk_create(
+            [self.model(user=user, author_id=pk) for pk in authors],
+            ignore_conflicts=True,
+        )
+        self._changed(user)
+
+    def unfollow(self, user, usernames):
+        """Отписывает user от авторов из списка одним DELETE."""
+        raw_delete(self.filter(user=user, author__username__in=usernames))
+        self._changed(user)
+
+    def following_usernames(self, user):
+        return set(self.filter(user=user).values_list(
+            'author__username', flat=True))
+
+    def _changed(self, user):
+        # bulk_create и _raw_delete не посылают сигналы, поэтому
+        # производные данные обновляются один раз на всю пачку.
+        from .cache import invalidate_follows
+        invalidate_follows(user.pk)
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -104,9 +243,226 @@ class Follow(models.Model):
         related_name='following',
     )
 
+    objects = FollowManager()
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+        ]
 
     def __str__(self):
         return f'{self.user} - {self.author}'
+
+
+class Suggestion(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='suggestions',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Рекомендуемый автор',
+        related_name='+',
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_suggestion'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score']),
+        ]
+
+    def __str__(self):
+        return f'{self.user} -> {self.author}'
+
+
+class TrendingPost(models.Model):
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Пост',
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name='Группа',
+    )
+    rank = models.FloatField('Рейтинг')
+
+    class Meta:
+        verbose_name = 'Рейтинг поста'
+        verbose_name_plural = 'Рейтинги постов'
+        indexes = [
+            models.Index(fields=['-rank']),
+            models.Index(fields=['group', '-rank']),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.rank}'
+
+
+class TrendingGroup(models.Model):
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Группа',
+    )
+    rank = models.FloatField('Рейтинг', db_index=True)
+
+    class Meta:
+        verbose_name = 'Рейтинг группы'
+        verbose_name_plural = 'Рейтинги групп'
+
+    def __str__(self):
+        return f'{self.group_id}: {self.rank}'
+
+
+class ModerationJob(models.Model):
+    DELETE_USER_CONTENT = 'delete_user_content'
+    MOVE_POSTS = 'move_posts'
+    PURGE_COMMENTS = 'purge_comments'
+    KINDS = (
+        (DELETE_USER_CONTENT, 'Удалить посты и комментарии пользователя'),
+        (MOVE_POSTS, 'Перенести посты в другую группу'),
+        (PURGE_COMMENTS, 'Удалить комментарии по шаблону'),
+    )
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнено'),
+    )
+
+    kind = models.CharField('Действие', max_length=32, choices=KINDS)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name='Пользователь',
+    )
+    source_group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name='Из группы',
+    )
+    target_group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name='В группу',
+    )
+    pattern = models.CharField(
+        'Шаблон',
+        max_length=200,
+        blank=True,
+        help_text='Регулярное выражение, регистр не учитывается',
+    )
+    status = models.CharField(
+        'Статус', max_length=10, choices=STATUSES, default=PENDING)
+    total = models.PositiveIntegerField('Всего', blank=True, null=True)
+    processed = models.PositiveIntegerField('Обработано', default=0)
+    cursor = models.PositiveBigIntegerField(default=0, editable=False)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name='Модератор',
+    )
+    created = models.DateTimeField('Создано', auto_now_add=True)
+    finished = models.DateTimeField('Завершено', blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Задание модерации'
+        verbose_name_plural = 'Задания модерации'
+        ordering = ['-created']
+
+    def __str__(self):
+        return f'{self.get_kind_display()} ({self.get_status_display()})'
+
+    def clean(self):
+        required = {
+            self.DELETE_USER_CONTENT: ['user'],
+            self.MOVE_POSTS: ['source_group', 'target_group'],
+            self.PURGE_COMMENTS: ['pattern'],
+        }
+        errors = {
+            field: 'Обязательное поле для этого действия.'
+            for field in required.get(self.kind, [])
+            if not getattr(self, field)
+        }
+        if (self.kind == self.MOVE_POSTS and self.source_group_id
+                and self.source_group_id == self.target_group_id):
+            errors['target_group'] = 'Группы должны различаться.'
+        if self.kind == self.PURGE_COMMENTS and self.pattern:
+            try:
+                re.compile(self.pattern)
+            except re.error as error:
+                errors['pattern'] = f'Неверное регулярное выражение: {error}'
+        if errors:
+            raise ValidationError(errors)
+
+
+class Notification(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Получатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Новая запись',
+    )
+    created = models.DateTimeField('Создано', auto_now_add=True)
+    is_read = models.BooleanField('Прочитано', default=False)
+
+    class Meta:
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+        ordering = ['-id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_notification'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-id']),
+            models.Index(
+                fields=['user'],
+                condition=models.Q(is_read=False),
+                name='notification_unread',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
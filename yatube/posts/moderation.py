@@ -0,0 +1,99 @@
+"""Массовая модерация пачками в фоновых задачах.
+
+Задание обрабатывает MODERATION_CHUNK_SIZE строк за одну задачу, в
+одной транзакции с записью прогресса и постановкой следующей пачки,
+так что прерванное задание продолжается с места остановки.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import trending
+from .cache import invalidate_post
+from .models import Comment, ModerationJob, Post
+
+
+def chunk_ids(queryset):
+    return list(queryset.order_by('id').values_list(
+        'id', flat=True)[:settings.MODERATION_CHUNK_SIZE])
+
+
+def delete_user_content(job):
+    comments = chunk_ids(Comment.objects.filter(author_id=job.user_id))
+    if comments:
+        Comment.objects.filter(id__in=comments).delete()
+        return len(comments)
+    posts = chunk_ids(Post.objects.filter(author_id=job.user_id))
+    Post.objects.filter(id__in=posts).delete()
+    return len(posts)
+
+
+def move_posts(job):
+    source, target = job.source_group_id, job.target_group_id
+    # Страницы по курсору, как в purge_comments: перенесённые посты не
+    # обязаны выпадать из выборки (например, если группы совпадают).
+    posts = list(Post.objects.filter(
+        id__gt=job.cursor, group_id=source).order_by('id').values_list(
+        'id', 'author_id')[:settings.MODERATION_CHUNK_SIZE])
+    if not posts:
+        return 0
+    ids = [post_id for post_id, _ in posts]
+    job.cursor = ids[-1]
+    Post.objects.filter(id__in=ids).update(group_id=target)
+    # update() не посылает сигналы: кеш и рейтинги обновляются здесь.
+    for post_id, author_id in posts:
+        invalidate_post(
+            Post(id=post_id, author_id=author_id, group_id=target), source)
+    trending.move_posts(ids, source, target)
+    return len(posts)
+
+
+def purge_comments(job):
+    comments = chunk_ids(Comment.objects.filter(
+        id__gt=job.cursor, text__iregex=job.pattern))
+    if comments:
+        Comment.objects.filter(id__in=comments).delete()
+        job.cursor = comments[-1]
+    return len(comments)
+
+
+HANDLERS = {
+    ModerationJob.DELETE_USER_CONTENT: delete_user_content,
+    ModerationJob.MOVE_POSTS: move_posts,
+    ModerationJob.PURGE_COMMENTS: purge_comments,
+}
+
+
+def count_targets(job):
+    if job.kind == ModerationJob.DELETE_USER_CONTENT:
+        return (
+            Comment.objects.filter(author_id=job.user_id).count()
+            + Post.objects.filter(author_id=job.user_id).count()
+        )
+    if job.kind == ModerationJob.MOVE_POSTS:
+        return Post.objects.filter(group_id=job.source_group_id).count()
+    return Comment.objects.filter(text__iregex=job.pattern).count()
+
+
+def run_chunk(job_id):
+    """Обрабатывает очередную пачку задания, возвращает True по окончании."""
+    # tasks импортирует этот модуль.
+    from .tasks import run_moderation_job
+
+    with transaction.atomic():
+        job = ModerationJob.objects.select_for_update().filter(
+            pk=job_id).first()
+        if job is None or job.status == ModerationJob.DONE:
+            return True
+        if job.total is None:
+            job.total = count_targets(job)
+        processed = HANDLERS[job.kind](job)
+        job.processed += processed
+        if processed:
+            job.status = ModerationJob.RUNNING
+            run_moderation_job.delay(job.pk)
+        else:
+            job.status = ModerationJob.DONE
+            job.finished = timezone.now()
+        job.save()
+    return job.status == ModerationJob.DONE
@@ -0,0 +1,66 @@
+"""Уведомления подписчиков о новых постах.
+
+Уведомления создаёт фоновая задача notify_followers: одна задача -
+одна пачка из NOTIFICATIONS_CHUNK_SIZE подписчиков по возрастанию id
+подписки, следующая пачка ставится в очередь той же транзакцией.
+Память и время задачи не зависят от числа подписчиков автора.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import invalidation
+from core.routers import primary
+from .models import Follow, Notification, Post
+
+
+def unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def get_unread_count(user):
+    """Число непрочитанных уведомлений, из кеша."""
+    if not user.is_authenticated:
+        return 0
+    key = unread_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(
+            user_id=user.pk, is_read=False).count()
+        cache.set(key, count, settings.NOTIFICATIONS_COUNT_TIMEOUT)
+    return count
+
+
+def fan_out(post_id, after=0):
+    """Уведомляет подписчиков автора с id подписки больше after.
+
+    Возвращает id последней подписки пачки или None, если подписчики
+    закончились. Повторный запуск не создаёт дублей. Задача ставится
+    сразу после публикации, и реплика может ещё не знать о посте,
+    поэтому пост и подписки читаются с основной базы.
+    """
+    with primary():
+        author_id = Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True).first()
+        if author_id is None:
+            return None
+        size = settings.NOTIFICATIONS_CHUNK_SIZE
+        follows = list(Follow.objects.filter(
+            author_id=author_id, pk__gt=after,
+        ).order_by('pk').values_list('pk', 'user_id')[:size])
+    user_ids = [user_id for _, user_id in follows]
+    Notification.objects.bulk_create(
+        [Notification(user_id=user_id, post_id=post_id)
+         for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+    invalidation.add(*map(unread_key, user_ids))
+    if len(follows) < size:
+        return None
+    return follows[-1][0]
+
+
+def mark_read(user_id, notification_ids):
+    Notification.objects.filter(
+        user_id=user_id, pk__in=notification_ids, is_read=False,
+    ).update(is_read=True)
+    invalidation.add(unread_key(user_id))
@@ -0,0 +1,136 @@
+"""Полнотекстовый поиск по тексту постов.
+
+Индекс создаёт миграция 0019_post_text_search: в SQLite - таблица FTS5
+с триггерами, в PostgreSQL - GIN-индекс по to_tsvector. Для других баз
+индекса нет, и search_posts возвращает None. Наличие индекса проверяет
+check_search_index (manage.py check --database default).
+"""
+import re
+
+from django.core.checks import Error, Tags, register
+from django.db import NotSupportedError, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Lookup, TextField
+
+from .models import Post
+
+WORD = re.compile(r'\w+')
+FTS_TABLE = 'posts_post_fts'
+FTS_TRIGGERS = (
+    'posts_post_fts_insert',
+    'posts_post_fts_delete',
+    'posts_post_fts_update',
+)
+GIN_INDEX = 'posts_post_text_fts'
+SEARCH_CONFIG = 'russian'
+VENDORS = ('sqlite', 'postgresql')
+
+
+def fts_query(term):
+    """Запрос FTS5: каждое слово - префикс в кавычках.
+
+    Синтаксис FTS5 в запросе пользователя не интерпретируется.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD.findall(term))
+
+
+@TextField.register_lookup
+class FullTextMatch(Lookup):
+    """text__fulltext='слова' - поиск по индексу миграции 0019.
+
+    Индекс есть только у Post.text, для других полей поиск запрещён:
+    в SQLite он сопоставил бы их id с rowid постов. В SQLite слова
+    ищутся по началу, в PostgreSQL - по словоформам конфигурации
+    SEARCH_CONFIG.
+    """
+
+    lookup_name = 'fulltext'
+
+    def check_field(self):
+        target = getattr(self.lhs, 'target', None)
+        if target is not Post._meta.get_field('text'):
+            raise NotSupportedError(
+                'Полнотекстовый поиск есть только по Post.text.')
+
+    def as_sql(self, compiler, connection):
+        raise NotSupportedError(
+            f'Полнотекстовый поиск не поддерживается для '
+            f'{connection.vendor}.')
+
+    def as_sqlite(self, compiler, connection):
+        self.check_field()
+        rhs, params = self.process_rhs(compiler, connection)
+        alias = compiler.quote_name_unless_alias(self.lhs.alias)
+        pk = connection.ops.quote_name(Post._meta.pk.column)
+        sql = (
+            f'{alias}.{pk} IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH {rhs})'
+        )
+        return sql, [fts_query(param) for param in params]
+
+    def as_postgresql(self, compiler, connection):
+        self.check_field()
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        sql = (
+            f"to_tsvector('{SEARCH_CONFIG}', {lhs}) "
+            f"@@ plainto_tsquery('{SEARCH_CONFIG}', {rhs})"
+        )
+        return sql, lhs_params + rhs_params
+
+
+def search_posts(queryset, term):
+    if connections[queryset.db].vendor not in VENDORS:
+        return None
+    if not WORD.search(term):
+        return queryset.none()
+    return queryset.filter(text__fulltext=term)
+
+
+def missing_index(connection):
+    """Имена недостающих объектов индекса миграции 0019."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type IN "
+                "('table', 'trigger') AND name LIKE %s",
+                [f'{FTS_TABLE}%'],
+            )
+            expected = (FTS_TABLE, *FTS_TRIGGERS)
+        else:
+            cursor.execute(
+                'SELECT indexname FROM pg_indexes WHERE indexname = %s',
+                [GIN_INDEX],
+            )
+            expected = (GIN_INDEX,)
+        found = {name for name, in cursor.fetchall()}
+    return [name for name in expected if name not in found]
+
+
+@register(Tags.database)
+def check_search_index(app_configs, databases=None, **kwargs):
+    """Индекс поиска на месте, если миграция 0019 применена.
+
+    В SQLite изменение таблицы posts_post в миграции пересоздаёт её и
+    удаляет триггеры FTS, после чего новые посты не находятся.
+    """
+    errors = []
+    for alias in databases or ():
+        connection = connections[alias]
+        if connection.vendor not in VENDORS:
+            continue
+        recorder = MigrationRecorder(connection)
+        if not recorder.has_table() or (
+                ('posts', '0019_post_text_search')
+                not in recorder.applied_migrations()):
+            continue
+        missing = missing_index(connection)
+        if missing:
+            errors.append(Error(
+                f'В базе {alias!r} нет индекса поиска постов: '
+                f'{", ".join(missing)}.',
+                hint='Создайте их заново, как в миграции '
+                     'posts.0019_post_text_search.',
+                id='posts.E001',
+            ))
+    return errors
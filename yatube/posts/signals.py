@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+
+from core import events
+from . import trending
+from .cache import (invalidate_comment, invalidate_follow, invalidate_group,
+                    invalidate_post)
+from .models import Comment, Follow, Group, Post
+from .tasks import notify_followers
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_group(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._old_group_id = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    invalidate_post(instance, getattr(instance, '_old_group_id', None))
+
+
+@receiver(post_save, sender=Post)
+def post_trending(sender, instance, created, **kwargs):
+    if created:
+        trending.record_event(
+            instance.pk, instance.group_id, instance.pub_date,
+            settings.TRENDING_POST_WEIGHT)
+        return
+    old_group_id = getattr(instance, '_old_group_id', instance.group_id)
+    if old_group_id != instance.group_id:
+        trending.move_post(instance.pk, old_group_id, instance.group_id)
+
+
+@receiver(post_save, sender=Post)
+def post_notify_followers(sender, instance, created, **kwargs):
+    if created:
+        notify_followers.delay(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_publish_event(sender, instance, created, **kwargs):
+    if created:
+        channels = ['posts', f'author:{instance.author_id}']
+        if instance.group_id is not None:
+            channels.append(f'group:{instance.group_id}')
+        events.publish(channels, 'post', {'id': instance.pk})
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted_trending(sender, instance, **kwargs):
+    trending.forget_post(instance.pk, instance.group_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_trending(sender, instance, created, **kwargs):
+    if created and instance.post_id is not None:
+        trending.record_event(
+            instance.post_id, instance.post.group_id, instance.created)
+
+
+@receiver(post_save, sender=Comment)
+def comment_publish_event(sender, instance, created, **kwargs):
+    if created and instance.post_id is not None:
+        events.publish([f'post:{instance.post_id}'], 'comment', {
+            'id': instance.pk,
+            'parent': instance.parent_id,
+            'html': render_to_string(
+                'posts/includes/comments.html', {'comments': [instance]}),
+        })
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    invalidate_comment(instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    invalidate_follow(instance)
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    invalidate_group(instance)
@@ -0,0 +1,50 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
+from sorl.thumbnail import delete, get_thumbnail
+
+from tasks.queue import task
+from .deletion import delete_user
+from .models import Post
+from .moderation import run_chunk
+from .notifications import fan_out
+
+# Миниатюра, которую выводят шаблоны лент и страницы поста.
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+@task
+def make_thumbnails(post_id):
+    """Заранее создаёт миниатюру картинки поста."""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is not None and post.image:
+        get_thumbnail(post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS)
+
+
+@task
+def run_moderation_job(job_id):
+    """Выполняет очередную пачку задания модерации."""
+    run_chunk(job_id)
+
+
+@task
+def delete_media(names):
+    """Удаляет картинки удалённых постов вместе с их миниатюрами."""
+    for name in names:
+        if default_storage.exists(name):
+            delete(name)
+
+
+@task
+def delete_account(user_id):
+    """Удаляет пользователя и его содержимое (см. delete_user)."""
+    delete_user(user_id)
+
+
+@task
+def notify_followers(post_id, after=0):
+    """Уведомляет о посте очередную пачку подписчиков автора."""
+    with transaction.atomic():
+        last = fan_out(post_id, after)
+        if last is not None:
+            notify_followers.delay(post_id, last)
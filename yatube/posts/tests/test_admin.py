@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.db import NotSupportedError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.pagination import EstimatedCountPaginator
+from ..models import Comment, Group, Post
+from ..search import FTS_TRIGGERS, check_search_index, search_posts
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.admin, group=cls.group, text='Пушистые Котики')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списка постов не зависит от числа строк."""
+        queries = self.changelist_queries()
+        for number in range(10):
+            Post.objects.create(
+                author=User.objects.create_user(username=f'user{number}'),
+                group=Group.objects.create(
+                    title=f'Группа {number}', slug=f'group-{number}',
+                    description='Описание'),
+                text=f'Пост {number}',
+            )
+        self.assertEqual(self.changelist_queries(), queries)
+
+    def test_full_text_search(self):
+        """Поиск находит слова по началу без учёта регистра."""
+        Post.objects.create(author=self.admin, text='Собаки')
+        found = search_posts(Post.objects.all(), 'котик')
+        self.assertEqual(list(found), [self.post])
+        self.post.text = 'Теперь про собак'
+        self.post.save()
+        self.assertFalse(search_posts(Post.objects.all(), 'котик').exists())
+        self.assertEqual(
+            search_posts(Post.objects.all(), '(собак*"').count(), 2)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'})
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+
+    def test_full_text_only_post_text(self):
+        """Поиск по другим текстовым полям не выполняется."""
+        Comment.objects.create(
+            post=self.post, author=self.admin, text='Комментарий')
+        with self.assertRaises(NotSupportedError):
+            list(Comment.objects.filter(text__fulltext='котик'))
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=3)
+    def test_estimated_count(self):
+        """Большие таблицы не считаются через COUNT(*) целиком."""
+        posts = [
+            Post.objects.create(author=self.admin, text=f'Пост {number}')
+            for number in range(6)
+        ]
+        posts[0].delete()
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, posts[-1].pk)
+        querysets = (
+            Post.objects.filter(author=self.admin),
+            search_posts(Post.objects.all(), 'пост'),
+            Post.objects.values('author').distinct(),
+        )
+        # Выборки считаются точно и за порогом.
+        for queryset, count in zip(querysets, (6, 5, 1)):
+            with self.subTest(query=str(queryset.query)):
+                paginator = EstimatedCountPaginator(queryset, 10)
+                self.assertEqual(paginator.count, count)
+
+    def test_search_index_check(self):
+        """Проверка находит пропавшие триггеры поиска."""
+        self.assertEqual(check_search_index(None, databases=['default']), [])
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {FTS_TRIGGERS[0]}')
+        errors = check_search_index(None, databases=['default'])
+        self.assertEqual([error.id for error in errors], ['posts.E001'])
+        self.assertIn(FTS_TRIGGERS[0], errors[0].msg)
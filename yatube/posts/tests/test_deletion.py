@@ -0,0 +1,165 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.routers import reset_pinning
+from tasks.models import Task
+from ..cache import get_following_ids
+from ..deletion import delete_comments, delete_user
+from ..models import Comment, Follow, Group, Post, Suggestion, TrendingPost
+from ..tasks import delete_account, delete_media
+from ..trending import top_post_ids
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_BACKEND='db')
+class DeleteUserTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.reader = User.objects.create_user(username='Reader')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {n}')
+            for n in range(5)
+        ]
+        self.post = Post.objects.create(author=self.reader, text='Чужой пост')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.author, author=self.reader)
+        Suggestion.objects.create(
+            user=self.reader, author=self.author, score=1)
+
+    def test_deletes_content_in_batches(self):
+        """Удаляются посты, комментарии и подписки пользователя."""
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий')
+        own = Comment.objects.create(
+            post=self.post, author=self.author, text='Ответ автора')
+        reply = Comment.objects.create(
+            post=self.post, author=self.reader, text='Ответ', parent=own)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Ещё ответ',
+            parent=reply)
+        kept = Comment.objects.create(
+            post=self.post, author=self.reader, text='Остаётся')
+        self.assertEqual(get_following_ids(self.reader), {self.author.pk})
+        stats = delete_user(self.author.pk, batch_size=2)
+        self.assertEqual(stats, {'posts': 5, 'comments': 1})
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertEqual(list(Post.objects.all()), [self.post])
+        self.assertEqual(list(Comment.objects.all()), [kept])
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(Suggestion.objects.exists())
+        self.assertEqual(
+            list(TrendingPost.objects.values_list('post_id', flat=True)),
+            [self.post.pk],
+        )
+        self.assertEqual(get_following_ids(self.reader), set())
+        self.assertEqual(top_post_ids(), [self.post.pk])
+        self.assertEqual(top_post_ids(self.group.pk), [])
+
+    # Реплики нет в DATABASES: чтение с неё упадёт.
+    @override_settings(REPLICA_DATABASES=['missing_replica'])
+    def test_comment_subtrees_in_one_query(self):
+        """Ответы любой глубины удаляются одним DELETE в основной базе."""
+        own = Comment.objects.create(
+            post=self.post, author=self.author, text='Ответ автора')
+        nested = Comment.objects.create(
+            post=self.post, author=self.author, text='Вложенный', parent=own)
+        parent = nested
+        for depth in range(3):
+            parent = Comment.objects.create(
+                post=self.post, author=self.reader, text=f'Ответ {depth}',
+                parent=parent)
+        kept = Comment.objects.create(
+            post=self.post, author=self.reader, text='Остаётся')
+        rows = [
+            (comment.pk, comment.post_id, comment.path)
+            for comment in (nested, own)
+        ]
+        reset_pinning()
+        # BEGIN и DELETE.
+        with self.assertNumQueries(2):
+            delete_comments(rows)
+        self.assertEqual(
+            list(Comment.objects.using('default').all()), [kept])
+
+    def test_queries_do_not_grow_with_content(self):
+        """Число запросов зависит от числа пачек, а не строк."""
+        for number in range(20):
+            Comment.objects.create(
+                post=self.posts[0], author=self.reader, text=f'К {number}')
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'Fan{number}'),
+                author=self.author,
+            )
+        with self.assertNumQueries(29):
+            delete_user(self.author.pk, batch_size=100)
+
+    def test_media_deleted_in_background(self):
+        """Картинки удаляются фоновой задачей."""
+        post = Post.objects.create(
+            author=self.author,
+            text='С картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        path = post.image.path
+        delete_user(self.author.pk)
+        self.assertTrue(os.path.exists(path))
+        task = Task.objects.get(name='posts.tasks.delete_media')
+        self.assertEqual(task.args, [[post.image.name]])
+        delete_media(*task.args)
+        self.assertFalse(os.path.exists(path))
+
+    def test_admin_deletes_in_background(self):
+        """Удаление в админке ставит задачу delete_account, а не удаляет
+        содержимое в запросе."""
+        admin = User.objects.create_superuser(username='admin')
+        client = Client()
+        client.force_login(admin)
+        address = reverse('admin:auth_user_delete', args=[self.author.pk])
+        # Страница подтверждения не собирает содержимое пользователя.
+        with self.assertNumQueries(3):
+            response = client.get(address)
+        self.assertContains(response, 'удаляются в фоне')
+        response = client.post(address, {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        response = client.post(reverse('admin:auth_user_changelist'), {
+            'action': 'delete_selected',
+            '_selected_action': [self.reader.pk],
+            'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(User.objects.filter(pk=self.author.pk).exists())
+        tasks = Task.objects.filter(name='posts.tasks.delete_account')
+        self.assertCountEqual(
+            [task.args for task in tasks],
+            [[self.author.pk], [self.reader.pk]],
+        )
+        delete_account(self.author.pk)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Post.objects.filter(author=self.author).exists())
@@ -3,10 +3,12 @@ import tempfile
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from tasks.models import Task
 from ..models import Comment, Post
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -33,6 +35,7 @@ class PostCreateFormTests(TestCase):
     def setUp(self):
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        cache.clear()
 
     def test_create_post(self):
         """Валидная форма создает запись."""
@@ -64,6 +67,9 @@ class PostCreateFormTests(TestCase):
                 image=f'posts/{uploaded}',
             ).exists()
         )
+        self.assertTrue(
+            Task.objects.filter(name='posts.tasks.make_thumbnails').exists()
+        )
 
     def test_edit_post(self):
         """Валидная форма редактирует существующую запись."""
@@ -1,9 +1,13 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
 
-from yatube.settings import MAX_CHAR_TITLE
+from core.routers import reset_pinning
+from yatube.settings import COMMENTS_MAX_DEPTH, MAX_CHAR_TITLE
 
-from ..models import Group, Post
+from ..models import Comment, CommentQuerySet, Follow, Group, Post
 
 User = get_user_model()
 
@@ -64,3 +68,84 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     expected_value, str(field)
                 )
+
+
+class CommentTreeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.root = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Корень')
+        cls.reply = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Ответ', parent=cls.root)
+        cls.other = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Второй ответ',
+            parent=cls.root)
+        cls.nested = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Ответ на ответ',
+            parent=cls.reply)
+
+    def test_path_depth_and_thread(self):
+        """Путь, уровень и ветка заполняются при создании."""
+        self.assertEqual(self.root.depth, 0)
+        self.assertEqual(self.nested.depth, 2)
+        self.assertEqual(self.nested.thread_id, self.root.id)
+        self.assertTrue(self.nested.path.startswith(self.reply.path))
+        self.assertEqual(
+            Comment.objects.get(pk=self.nested.pk).path, self.nested.path)
+
+    def test_subtree_in_one_ordered_query(self):
+        """Поддерево загружается одним запросом в порядке обхода."""
+        with self.assertNumQueries(1):
+            subtree = list(Comment.objects.subtree(self.root))
+        self.assertEqual(
+            subtree, [self.root, self.reply, self.nested, self.other])
+        with self.assertNumQueries(1):
+            subtree = list(Comment.objects.subtree(self.root, max_depth=1))
+        self.assertEqual(subtree, [self.root, self.reply, self.other])
+        self.assertEqual(
+            list(Comment.objects.threads([self.root])),
+            [self.reply, self.nested, self.other],
+        )
+
+    def test_path_written_with_insert(self):
+        """Если путь не записался, комментарий не сохраняется."""
+        count = Comment.objects.count()
+        with mock.patch.object(
+                CommentQuerySet, 'update', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                Comment.objects.create(
+                    post=self.post, author=self.user, text='Без пути',
+                    parent=self.root)
+        self.assertEqual(Comment.objects.count(), count)
+
+    def test_max_depth_in_path_length(self):
+        """Путь самого глубокого комментария помещается в поле."""
+        parent = self.root
+        for _ in range(COMMENTS_MAX_DEPTH):
+            parent = Comment.objects.create(
+                post=self.post, author=self.user, text='Ответ',
+                parent=parent)
+        self.assertEqual(parent.depth, COMMENTS_MAX_DEPTH)
+
+
+class FollowManagerTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='follower')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        Follow.objects.create(user=self.user, author=self.author)
+
+    # Реплики нет в DATABASES: чтение с неё упадёт.
+    @override_settings(REPLICA_DATABASES=['missing_replica'])
+    def test_unfollow_writes_to_primary(self):
+        """Отписка одним DELETE идёт в основную базу, а не в реплику."""
+        reset_pinning()
+        with self.assertNumQueries(1):
+            Follow.objects.unfollow(self.user, ['author'])
+        self.assertFalse(Follow.objects.using('default').exists())
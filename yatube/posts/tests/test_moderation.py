@@ -0,0 +1,148 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from tasks.models import Task
+from ..models import Comment, Group, ModerationJob, Post, TrendingPost
+from ..moderation import run_chunk
+from ..trending import top_post_ids
+
+User = get_user_model()
+TASK_NAME = 'posts.tasks.run_moderation_job'
+
+
+@override_settings(MODERATION_CHUNK_SIZE=2, TASKS_BACKEND='db')
+class ModerationJobTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.spammer = User.objects.create_user(username='Spammer')
+        self.user = User.objects.create_user(username='User')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.other = Group.objects.create(title='Другая', slug='other')
+        self.posts = [
+            Post.objects.create(
+                author=self.spammer, group=self.group, text=f'Пост {n}')
+            for n in range(3)
+        ]
+        self.post = Post.objects.create(author=self.user, text='Свой пост')
+
+    def run_job(self, job):
+        """Выполняет задание до конца, возвращает число пачек."""
+        chunks = 1
+        while not run_chunk(job.pk):
+            chunks += 1
+        job.refresh_from_db()
+        return chunks
+
+    def test_delete_user_content(self):
+        """Посты и комментарии пользователя удаляются пачками."""
+        for n in range(3):
+            Comment.objects.create(
+                post=self.post, author=self.spammer, text=f'Спам {n}')
+        job = ModerationJob.objects.create(
+            kind=ModerationJob.DELETE_USER_CONTENT, user=self.spammer)
+        chunks = self.run_job(job)
+        self.assertEqual(chunks, 5)
+        self.assertEqual(job.status, ModerationJob.DONE)
+        self.assertEqual((job.processed, job.total), (6, 6))
+        self.assertIsNotNone(job.finished)
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertFalse(Comment.objects.filter(author=self.spammer).exists())
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertEqual(Task.objects.filter(name=TASK_NAME).count(), 4)
+
+    def test_move_posts(self):
+        """Посты переносятся в другую группу вместе с рейтингом."""
+        self.assertEqual(len(top_post_ids(self.group.pk)), 3)
+        job = ModerationJob.objects.create(
+            kind=ModerationJob.MOVE_POSTS,
+            source_group=self.group,
+            target_group=self.other,
+        )
+        self.run_job(job)
+        self.assertEqual((job.processed, job.total), (3, 3))
+        self.assertEqual(
+            Post.objects.filter(group=self.other).count(), 3)
+        self.assertFalse(
+            TrendingPost.objects.filter(group=self.group).exists())
+        self.assertEqual(top_post_ids(self.group.pk), [])
+        self.assertCountEqual(
+            top_post_ids(self.other.pk), [post.pk for post in self.posts])
+
+    def test_move_posts_same_group(self):
+        """Перенос в ту же группу завершается, а не повторяется вечно."""
+        job = ModerationJob.objects.create(
+            kind=ModerationJob.MOVE_POSTS,
+            source_group=self.group,
+            target_group=self.group,
+        )
+        self.assertEqual(self.run_job(job), 3)
+        self.assertEqual(job.status, ModerationJob.DONE)
+        self.assertEqual(
+            Post.objects.filter(group=self.group).count(), 3)
+
+    def test_purge_comments(self):
+        """Удаляются только комментарии, подходящие под шаблон."""
+        for text in ('Купите СКИДКИ', 'скидки тут', 'Хороший пост', 'скидки'):
+            Comment.objects.create(post=self.post, author=self.user, text=text)
+        job = ModerationJob.objects.create(
+            kind=ModerationJob.PURGE_COMMENTS, pattern='скидки')
+        self.run_job(job)
+        self.assertEqual(job.processed, 3)
+        self.assertEqual(
+            list(Comment.objects.values_list('text', flat=True)),
+            ['Хороший пост'],
+        )
+
+    def test_clean_requires_fields(self):
+        """Задание проверяет поля, нужные выбранному действию."""
+        with self.assertRaises(ValidationError):
+            ModerationJob(kind=ModerationJob.MOVE_POSTS).full_clean()
+        with self.assertRaises(ValidationError):
+            ModerationJob(
+                kind=ModerationJob.PURGE_COMMENTS, pattern='(').full_clean()
+        with self.assertRaises(ValidationError):
+            ModerationJob(
+                kind=ModerationJob.MOVE_POSTS,
+                source_group=self.group,
+                target_group=self.group,
+            ).full_clean()
+
+    def test_admin_action_enqueues_jobs(self):
+        """Действие админки ставит по заданию на каждого автора."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.post(reverse('admin:posts_post_changelist'), {
+            'action': 'delete_authors_content',
+            '_selected_action': [post.pk for post in self.posts],
+        })
+        self.assertEqual(response.status_code, 302)
+        job = ModerationJob.objects.get()
+        self.assertEqual(job.user, self.spammer)
+        self.assertEqual(job.created_by, admin)
+        self.assertEqual(job.status, ModerationJob.PENDING)
+        self.assertTrue(Post.objects.filter(author=self.spammer).exists())
+        task = Task.objects.get(name=TASK_NAME)
+        self.assertEqual(task.args, [job.pk])
+
+    def test_admin_creates_job(self):
+        """Задание, созданное в админке, сразу ставится в очередь."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.post(reverse('admin:posts_moderationjob_add'), {
+            'kind': ModerationJob.PURGE_COMMENTS,
+            'pattern': 'скидки',
+        })
+        self.assertEqual(response.status_code, 302)
+        job = ModerationJob.objects.get()
+        self.assertEqual(job.created_by, admin)
+        self.assertTrue(Task.objects.filter(name=TASK_NAME).exists())
+        response = client.get(
+            reverse('admin:posts_moderationjob_change', args=[job.pk]))
+        self.assertContains(response, '0 / ?')
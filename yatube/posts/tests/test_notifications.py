@@ -0,0 +1,82 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.routers import reset_pinning
+from tasks.models import Task
+from ..models import Follow, Notification, Post
+from ..notifications import fan_out, get_unread_count
+
+User = get_user_model()
+
+
+@override_settings(NOTIFICATIONS_CHUNK_SIZE=2, TASKS_BACKEND='db')
+class NotificationTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.followers = [
+            User.objects.create_user(username=f'Follower{number}')
+            for number in range(5)
+        ]
+        for user in self.followers:
+            Follow.objects.create(user=user, author=self.author)
+        self.reader = self.followers[0]
+
+    def publish(self, text='Новый пост'):
+        post = Post.objects.create(author=self.author, text=text)
+        call_command('run_tasks', once=True, stdout=StringIO())
+        return post
+
+    # Реплики нет в DATABASES: чтение с неё упадёт.
+    @override_settings(REPLICA_DATABASES=['missing_replica'])
+    def test_fan_out_reads_primary(self):
+        """Пост и подписчики читаются с основной базы, а не с реплики."""
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        reset_pinning()
+        self.assertIsNotNone(fan_out(post.pk))
+        self.assertEqual(
+            Notification.objects.using('default').count(), 2)
+
+    def test_followers_notified_in_chunks(self):
+        """Подписчики получают уведомления пачками в фоновых задачах."""
+        post = self.publish()
+        self.assertEqual(
+            Task.objects.filter(name='posts.tasks.notify_followers').count(),
+            3,
+        )
+        self.assertCountEqual(
+            Notification.objects.values_list('user_id', flat=True),
+            [user.pk for user in self.followers],
+        )
+        self.assertFalse(
+            Notification.objects.exclude(post=post).exists())
+        self.assertFalse(
+            Notification.objects.filter(user=self.author).exists())
+
+    def test_unread_count_cached(self):
+        """Число непрочитанных берётся из кеша и сбрасывается."""
+        self.publish()
+        self.assertEqual(get_unread_count(self.reader), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.reader), 1)
+        self.publish('Ещё пост')
+        self.assertEqual(get_unread_count(self.reader), 2)
+
+    def test_list_marks_notifications_read(self):
+        """Показанные уведомления отмечаются прочитанными."""
+        self.publish()
+        client = Client()
+        client.force_login(self.reader)
+        header = client.get(reverse('posts:fragments')).json()['header']
+        self.assertIn('badge', header)
+        response = client.get(reverse('posts:notifications'))
+        self.assertContains(response, 'Новый пост')
+        self.assertEqual(len(response.context['unread_ids']), 1)
+        self.assertEqual(get_unread_count(self.reader), 0)
+        response = client.get(reverse('posts:notifications'))
+        self.assertEqual(response.context['unread_ids'], set())
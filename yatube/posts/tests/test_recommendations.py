@@ -0,0 +1,78 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.routers import reset_pinning
+from ..models import Follow, Suggestion
+from ..recommendations import compute_suggestions, save_chunk
+
+User = get_user_model()
+
+
+class SuggestionsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.friend = User.objects.create_user(username='Friend')
+        cls.similar = User.objects.create_user(username='Similar')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Follow.objects.create(user=cls.author, author=cls.friend)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.similar)
+
+    def setUp(self):
+        cache.clear()
+
+    def suggested(self, user):
+        return list(Suggestion.objects.filter(user=user).order_by(
+            '-score').values_list('author__username', flat=True))
+
+    def test_friends_of_friends_and_co_follow(self):
+        """Рекомендуются друзья друзей и авторы с общими подписчиками."""
+        compute_suggestions(chunk_size=2)
+        suggested = self.suggested(self.user)
+        self.assertCountEqual(suggested, ['Friend', 'Similar'])
+        self.assertNotIn('Author', suggested)
+        self.assertNotIn('User', self.suggested(self.reader))
+
+    def test_recompute_replaces_suggestions(self):
+        """Пересчёт убирает устаревшие рекомендации."""
+        compute_suggestions()
+        Follow.objects.filter(user=self.user).delete()
+        Follow.objects.create(user=self.user, author=self.friend)
+        call_command('compute_suggestions', stdout=StringIO())
+        self.assertEqual(self.suggested(self.user), [])
+        Follow.objects.all().delete()
+        compute_suggestions()
+        self.assertFalse(Suggestion.objects.exists())
+
+    # Реплики нет в DATABASES: чтение с неё упадёт.
+    @override_settings(REPLICA_DATABASES=['missing_replica'])
+    def test_save_chunk_writes_to_primary(self):
+        """Старые рекомендации удаляются в основной базе, а не в реплике."""
+        Suggestion.objects.create(
+            user=self.user, author=self.reader, score=1)
+        # Присвоение связи в конструкторе модели тоже закрепляет поток.
+        fresh = [Suggestion(user=self.user, author=self.reader, score=2)]
+        reset_pinning()
+        save_chunk(None, self.user.pk, fresh)
+        self.assertEqual(
+            Suggestion.objects.using('default').get().score, 2)
+
+    def test_follow_index_shows_suggestions(self):
+        """Рекомендации выводятся в ленте подписок."""
+        compute_suggestions()
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [author.username for author in response.context['suggestions']],
+            self.suggested(self.user),
+        )
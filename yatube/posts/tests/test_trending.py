@@ -0,0 +1,106 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Group, Post, TrendingGroup, TrendingPost
+from ..trending import (POSTS_SCOPE, TOP_TIMEOUT, current_key, record_event,
+                        top_group_ids, top_key, top_post_ids)
+
+User = get_user_model()
+
+
+class TrendingTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='User')
+        self.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        self.old = Post.objects.create(author=self.user, text='Старый пост')
+        self.new = Post.objects.create(
+            author=self.user, group=self.group, text='Новый пост')
+
+    def comment(self, post, count=1):
+        for number in range(count):
+            Comment.objects.create(
+                post=post, author=self.user, text=f'Комментарий #{number}')
+
+    def test_comments_raise_post(self):
+        """Комментарии поднимают пост в рейтинге."""
+        self.assertEqual(top_post_ids(), [self.new.pk, self.old.pk])
+        self.comment(self.old, 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(top_post_ids(), [self.old.pk, self.new.pk])
+
+    def test_locked_update_not_lost(self):
+        """Обновление при занятом топе не затирается записью владельца."""
+        self.assertEqual(top_post_ids(), [self.new.pk, self.old.pk])
+        stale_key = current_key(POSTS_SCOPE)
+        stale = cache.get(stale_key)
+        cache.add(f'{top_key(POSTS_SCOPE)}:lock', True)
+        self.comment(self.old, 2)
+        # Владелец блокировки дописывает топ, прочитанный до события.
+        cache.set(stale_key, stale, TOP_TIMEOUT)
+        self.assertEqual(top_post_ids(), [self.old.pk, self.new.pk])
+
+    def test_backfill(self):
+        """Команда заполняет рейтинги постов, созданных до рейтинга."""
+        self.comment(self.old, 2)
+        TrendingPost.objects.all().delete()
+        TrendingGroup.objects.all().delete()
+        self.assertEqual(top_post_ids(), [])
+        call_command('backfill_trending', batch_size=1, stdout=StringIO())
+        self.assertEqual(top_post_ids(), [self.old.pk, self.new.pk])
+        self.assertEqual(top_post_ids(self.group.pk), [self.new.pk])
+        self.assertEqual(top_group_ids(), [self.group.pk])
+        call_command('backfill_trending', stdout=StringIO())
+        self.assertEqual(TrendingPost.objects.count(), 2)
+
+    def test_old_activity_decays(self):
+        """Давние комментарии весят меньше свежих."""
+        week_ago = timezone.now() - timedelta(days=7)
+        for _ in range(20):
+            record_event(self.old.pk, None, week_ago)
+        self.comment(self.new)
+        self.assertEqual(top_post_ids(), [self.new.pk, self.old.pk])
+
+    def test_group_ranking(self):
+        """Рейтинг группы содержит только её посты и следует за постом."""
+        self.assertEqual(top_post_ids(self.group.pk), [self.new.pk])
+        self.assertEqual(top_group_ids(), [self.group.pk])
+        self.old.group = self.group
+        self.old.save()
+        self.assertCountEqual(
+            top_post_ids(self.group.pk), [self.new.pk, self.old.pk])
+        self.new.delete()
+        self.assertEqual(top_post_ids(self.group.pk), [self.old.pk])
+        self.assertEqual(top_post_ids(), [self.old.pk])
+
+    @override_settings(TRENDING_SIZE=2)
+    def test_top_is_bounded(self):
+        """В топе хранится не больше TRENDING_SIZE постов."""
+        top_post_ids()
+        latest = Post.objects.create(author=self.user, text='Последний')
+        self.assertEqual(top_post_ids(), [latest.pk, self.new.pk])
+        self.comment(self.old, 3)
+        self.assertEqual(top_post_ids(), [self.old.pk, latest.pk])
+        self.assertEqual(TrendingPost.objects.count(), 3)
+
+    def test_trending_pages(self):
+        """Страницы популярного выводят посты по рейтингу."""
+        self.comment(self.old, 2)
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.old, self.new])
+        self.assertEqual(response.context['groups'], [self.group])
+        response = self.client.get(reverse(
+            'posts:group_trending', kwargs={'slug': self.group.slug}))
+        self.assertEqual(list(response.context['page_obj']), [self.new])
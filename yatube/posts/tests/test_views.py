@@ -6,11 +6,14 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.test import (AsyncClient, Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
 
-from yatube.settings import (COUNT_POSTS, FIRST_OBJ, POSTS_ON_FIRST_PAGE,
-                             POSTS_ON_SECOND_PAGE)
+from yatube.settings import (COMMENT_REPLIES_PER_PAGE, COMMENTS_MAX_DEPTH,
+                             COMMENTS_PER_PAGE, COUNT_POSTS, FIRST_OBJ,
+                             POSTS_ON_FIRST_PAGE, POSTS_ON_SECOND_PAGE)
+from ..cache import get_following_ids
 from ..models import Comment, Follow, Group, Post
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -252,6 +255,260 @@ class PostPagesTests(TestCase):
         self.assertNotIn(new_post, response.context['page_obj'])
 
 
+class CacheInvalidationTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='User')
+        cache.clear()
+
+    def test_index_cache_reset_after_new_post(self):
+        """Новый пост сбрасывает кеш главной страницы после коммита."""
+        response_1 = self.client.get(reverse('posts:index'))
+        Post.objects.create(author=self.user, text='Новый пост')
+        response_2 = self.client.get(reverse('posts:index'))
+        self.assertNotEqual(response_1.content, response_2.content)
+        self.assertIn('Новый пост', response_2.content.decode())
+
+    def test_following_ids_reset_after_follow(self):
+        """Множество подписок берётся из кеша и сбрасывается подпиской."""
+        author = User.objects.create_user(username='Author')
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(get_following_ids(self.user), frozenset())
+        with self.assertNumQueries(0):
+            get_following_ids(self.user)
+        client.get(reverse(
+            'posts:profile_follow', kwargs={'username': author.username}))
+        self.assertEqual(get_following_ids(self.user), {author.pk})
+        Post.objects.create(author=author, text='Пост автора')
+        response = client.get(reverse('posts:follow_index'))
+        unfollow = reverse(
+            'posts:profile_unfollow', kwargs={'username': author.username})
+        self.assertContains(response, f'href="{unfollow}">')
+        client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': author.username}))
+        self.assertEqual(get_following_ids(self.user), frozenset())
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+        cls.addresses = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        ]
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_matching_etag_returns_not_modified(self):
+        """Совпавший ETag даёт ответ 304 без тела."""
+        for address in self.addresses:
+            with self.subTest(address=address):
+                etag = self.client.get(address)['ETag']
+                response = self.client.get(
+                    address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_pages_shared_between_users(self):
+        """Страницы одинаковы для анонима и пользователя."""
+        for address in self.addresses:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                response_auth = self.authorized_client.get(
+                    address, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response_auth.status_code, 304)
+                self.assertNotIn('Cookie', response.get('Vary', ''))
+
+    def test_new_comment_changes_post_etag(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        address = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id})
+        etag = self.client.get(address)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_cache_control(self):
+        """Общие страницы кеширует прокси-сервер, а браузер перепроверяет."""
+        for address in self.addresses:
+            with self.subTest(address=address):
+                response = self.authorized_client.get(address)
+                directives = {
+                    directive.strip()
+                    for directive in response['Cache-Control'].split(',')
+                }
+                self.assertEqual(directives, {
+                    'public',
+                    'max-age=0',
+                    f's-maxage={settings.PUBLIC_PAGE_MAX_AGE}',
+                })
+
+    def test_fragments(self):
+        """Фрагменты страницы зависят от пользователя."""
+        address = reverse('posts:fragments')
+        query = {'author': self.user.username, 'post': self.post.id}
+        fragments = self.authorized_client.get(address, query).json()
+        self.assertIn(self.user.username, fragments['header'])
+        self.assertIn('csrfmiddlewaretoken', fragments['comment_form'])
+        self.assertIn('редактировать', fragments['post_actions'])
+        self.assertEqual(fragments['follow'].strip(), '')
+        self.assertEqual(fragments['following'], [])
+        fragments = self.client.get(address, query).json()
+        self.assertEqual(fragments['comment_form'].strip(), '')
+        self.assertIn('Подписаться', fragments['follow'])
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {n}')
+            for n in range(COMMENTS_PER_PAGE + 5)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_page_embedded_in_post_detail(self):
+        """На странице поста только первая страница комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertEqual(
+            len(response.context['comments']), COMMENTS_PER_PAGE)
+        self.assertContains(response, 'Показать ещё')
+
+    def test_load_more_walks_all_comments(self):
+        """Курсоры проходят по всем комментариям по порядку."""
+        address = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.id})
+        ids = []
+        params = {'format': 'json'}
+        while True:
+            with self.assertNumQueries(3):
+                data = self.client.get(address, params).json()
+            ids += [comment['id'] for comment in data['comments']]
+            if data['next'] is None:
+                break
+            params['cursor'] = data['next']
+        self.assertEqual(ids, list(Comment.objects.filter(
+            post=self.post).order_by('created', 'id').values_list(
+                'id', flat=True)))
+
+    def test_load_more_fragment(self):
+        """Фрагмент последней страницы без кнопки «Показать ещё»."""
+        address = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.id})
+        cursor = self.client.get(address, {'format': 'json'}).json()['next']
+        response = self.client.get(address, {'cursor': cursor})
+        self.assertContains(response, 'Комментарий', count=5)
+        self.assertNotContains(response, 'Показать ещё')
+        response = self.client.get(address, {'cursor': 'broken'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.root = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Корень')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def reply(self, parent):
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': f'Ответ на {parent.id}', 'parent': parent.id},
+        )
+        return Comment.objects.latest('id')
+
+    def test_reply_and_depth_limit(self):
+        """Ответ на самый глубокий комментарий поднимается на уровень."""
+        parent = self.root
+        for depth in range(1, COMMENTS_MAX_DEPTH + 1):
+            parent = self.reply(parent)
+            self.assertEqual(parent.depth, depth)
+        reply = self.reply(parent)
+        self.assertEqual(reply.depth, COMMENTS_MAX_DEPTH)
+        self.assertEqual(reply.parent_id, parent.parent_id)
+
+    def test_threads_follow_their_roots(self):
+        """Ответы выводятся сразу после своего комментария."""
+        reply = self.reply(self.root)
+        second = Comment.objects.create(
+            post=self.post, author=self.user, text='Второй')
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertEqual(
+            response.context['comments'], [self.root, reply, second])
+
+    def test_long_thread_is_paged(self):
+        """Длинная ветка выводится частями по COMMENT_REPLIES_PER_PAGE."""
+        parent = self.root
+        for number in range(COMMENT_REPLIES_PER_PAGE + 3):
+            # Ответы чередуются: на корень и вглубь.
+            parent = Comment.objects.create(
+                post=self.post, author=self.user, text=f'Ответ {number}',
+                parent=self.root if number % 2 else parent)
+        address = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.id})
+        with self.assertNumQueries(3):
+            data = self.client.get(address, {'format': 'json'}).json()
+        ids = [comment['id'] for comment in data['comments']]
+        self.assertEqual(len(ids), COMMENT_REPLIES_PER_PAGE + 1)
+        cursor = data['comments'][-1]['replies_cursor']
+        self.assertIsNotNone(cursor)
+        address = reverse('posts:comment_replies', kwargs={
+            'post_id': self.post.id, 'comment_id': self.root.id})
+        with self.assertNumQueries(3):
+            data = self.client.get(
+                address, {'format': 'json', 'after': cursor}).json()
+        ids += [comment['id'] for comment in data['comments']]
+        self.assertIsNone(data['comments'][-1]['replies_cursor'])
+        self.assertEqual(ids, list(Comment.objects.subtree(
+            self.root).values_list('id', flat=True)))
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertContains(response, f'?after={cursor}')
+        response = self.client.get(address, {'after': cursor})
+        self.assertContains(response, 'data-reply-to', count=3)
+        response = self.client.get(address, {'after': 'broken'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('posts:comment_replies', kwargs={
+            'post_id': self.post.id, 'comment_id': parent.id}), {
+                'after': cursor})
+        self.assertEqual(response.status_code, 404)
+
+
 class PaginatorViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -299,3 +556,44 @@ class PaginatorViewsTest(TestCase):
                 cache.clear()
                 response = self.authorized_client.get(reverse_name)
                 self.assertEqual(len(response.context['page_obj']), posts)
+
+
+class AsyncViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='User')
+        cls.group = Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+
+    def setUp(self):
+        self.async_client = AsyncClient()
+        cache.clear()
+
+    async def test_read_views_served_by_asgi_handler(self):
+        """Страницы чтения отдаются через ASGI-обработчик."""
+        addresses = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                response = await self.async_client.get(address)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(self.post.text, response.content.decode())
+
+    async def test_follow_index_redirects_anonymous(self):
+        """Анонимный пользователь перенаправляется на страницу входа."""
+        response = await self.async_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse('users:login')))
@@ -0,0 +1,21 @@
+import time
+
+from sorl.thumbnail.base import ThumbnailBackend
+
+from core.metrics import THUMBNAILS
+
+
+class TimedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, замеряющий создание миниатюр.
+
+    Готовые миниатюры берутся из хранилища ключей и не замеряются.
+    """
+
+    def _create_thumbnail(self, source_image, geometry_string, options,
+                          thumbnail):
+        start = time.perf_counter()
+        try:
+            return super()._create_thumbnail(
+                source_image, geometry_string, options, thumbnail)
+        finally:
+            THUMBNAILS.observe(time.perf_counter() - start)
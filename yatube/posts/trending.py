@@ -0,0 +1,234 @@
+"""Рейтинг «в тренде» с экспоненциальным затуханием.
+
+Событие (новый пост, комментарий) в момент t весит
+w * 2 ** (-(now - t) / TRENDING_HALF_LIFE). Чтобы не пересчитывать веса
+с ходом времени, хранится rank = log2(sum(w * 2 ** ((t - EPOCH) / T))):
+текущий вес равен 2 ** (rank - (now - EPOCH) / T), множитель одинаков
+для всех постов, поэтому порядок по rank совпадает с порядком по
+текущему весу. rank меняется только при новом событии, и топ-K
+обновляется инкрементально: выпавший из топа пост может вернуться
+в него только со своим новым событием.
+
+Топ в кеше лежит под ключом текущего поколения области. Когда топ
+нельзя обновить на месте (его держит другой процесс, его нет в кеше,
+элементы ушли из области), поколение увеличивается: запись, начатая
+по старому поколению, попадает в ключ, который никто не читает, и топ
+собирается заново из базы.
+
+Рейтинги постов, созданных до появления рейтинга, заполняет команда
+backfill_trending.
+"""
+import bisect
+import math
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Comment, Post, TrendingGroup, TrendingPost
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+POSTS_SCOPE = 'posts'
+GROUPS_SCOPE = 'groups'
+# Топ в кеше пересобирается из базы не реже, чем раз в час.
+TOP_TIMEOUT = 60 * 60
+LOCK_TIMEOUT = 10
+
+
+def group_posts_scope(group_id):
+    return f'posts:{group_id}'
+
+
+def top_key(scope):
+    return f'trending:{scope}'
+
+
+def generation_key(scope):
+    return f'{top_key(scope)}:generation'
+
+
+def current_key(scope):
+    """Ключ топа области в текущем поколении."""
+    # Если счётчик вытеснен из кеша, новое поколение не совпадёт
+    # ни с одним из прежних.
+    generation = cache.get_or_set(generation_key(scope), time.time_ns, None)
+    return f'{top_key(scope)}:{generation}'
+
+
+def new_generation(scope):
+    try:
+        cache.incr(generation_key(scope))
+    except ValueError:
+        # Счётчика нет - следующее чтение начнёт новое поколение.
+        pass
+
+
+def event_rank(when, weight=1):
+    seconds = (when - EPOCH).total_seconds()
+    return math.log2(weight) + seconds / settings.TRENDING_HALF_LIFE
+
+
+def add_ranks(first, second):
+    """log2(2 ** first + 2 ** second) без переполнения."""
+    high, low = max(first, second), min(first, second)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def bump(model, rank, defaults=None, **lookup):
+    row, created = model.objects.select_for_update().get_or_create(
+        defaults={'rank': rank, **(defaults or {})}, **lookup)
+    if not created:
+        row.rank = add_ranks(row.rank, rank)
+        row.save(update_fields=['rank'])
+    return row.rank
+
+
+def record_event(post_id, group_id, when, weight=1):
+    """Учитывает событие поста в рейтингах поста и его группы."""
+    rank = event_rank(when, weight)
+    with transaction.atomic():
+        post_rank = bump(
+            TrendingPost, rank, {'group_id': group_id}, post_id=post_id)
+        updates = [(POSTS_SCOPE, post_id, post_rank)]
+        if group_id is not None:
+            group_rank = bump(TrendingGroup, rank, group_id=group_id)
+            updates += [
+                (group_posts_scope(group_id), post_id, post_rank),
+                (GROUPS_SCOPE, group_id, group_rank),
+            ]
+        transaction.on_commit(lambda: push_all(updates))
+
+
+def push_all(updates):
+    for scope, item_id, rank in updates:
+        push(scope, item_id, rank)
+
+
+def push(scope, item_id, rank):
+    """Обновляет топ-K области в кеше после роста rank элемента."""
+    lock = f'{top_key(scope)}:lock'
+    if not cache.add(lock, True, LOCK_TIMEOUT):
+        # Топ обновляет другой процесс - проще собрать его заново, а
+        # его запись уйдёт в старое поколение.
+        new_generation(scope)
+        return
+    try:
+        key = current_key(scope)
+        top = cache.get(key)
+        if top is None:
+            # Топ может собираться из базы, прочитанной до события.
+            new_generation(scope)
+            return
+        top = [entry for entry in top if entry[1] != item_id]
+        size = settings.TRENDING_SIZE
+        if len(top) >= size and -rank >= top[-1][0]:
+            return
+        bisect.insort(top, (-rank, item_id))
+        cache.set(key, top[:size], TOP_TIMEOUT)
+    finally:
+        cache.delete(lock)
+
+
+def forget(*scopes):
+    """Сбрасывает топы областей, из которых элементы ушли."""
+    for scope in scopes:
+        new_generation(scope)
+
+
+def move_post(post_id, old_group_id, group_id):
+    move_posts([post_id], old_group_id, group_id)
+
+
+def move_posts(post_ids, old_group_id, group_id):
+    TrendingPost.objects.filter(post_id__in=post_ids).update(
+        group_id=group_id)
+    scopes = [
+        group_posts_scope(group)
+        for group in (old_group_id, group_id) if group is not None
+    ]
+    transaction.on_commit(lambda: forget(*scopes))
+
+
+def forget_post(post_id, group_id):
+    scopes = [POSTS_SCOPE]
+    if group_id is not None:
+        scopes.append(group_posts_scope(group_id))
+    transaction.on_commit(lambda: forget(*scopes))
+
+
+def top_ids(scope, queryset):
+    """id элементов топа по убыванию рейтинга.
+
+    Топ хранится в кеше списком пар (-rank, id) длиной не больше
+    TRENDING_SIZE и при промахе собирается одним запросом по индексу.
+    """
+    key = current_key(scope)
+    top = cache.get(key)
+    if top is None:
+        top = [
+            (-rank, item_id) for rank, item_id in queryset.order_by(
+                '-rank').values_list('rank', 'pk')[:settings.TRENDING_SIZE]
+        ]
+        cache.add(key, top, TOP_TIMEOUT)
+    return [item_id for _, item_id in top]
+
+
+def top_post_ids(group_id=None):
+    if group_id is None:
+        return top_ids(POSTS_SCOPE, TrendingPost.objects.all())
+    return top_ids(
+        group_posts_scope(group_id),
+        TrendingPost.objects.filter(group_id=group_id),
+    )
+
+
+def top_group_ids():
+    return top_ids(GROUPS_SCOPE, TrendingGroup.objects.all())
+
+
+def backfill(batch_size=1000):
+    """Заполняет рейтинги постов, у которых их нет.
+
+    Рейтинг поста собирается из публикации и всех его комментариев,
+    посты обрабатываются пачками по возрастанию id, каждая - в своей
+    транзакции. Рейтинги групп увеличиваются на рейтинги добавленных
+    постов. Возвращает число постов.
+    """
+    missing = Post.objects.filter(trending__isnull=True).order_by('pk')
+    last_id = 0
+    total = 0
+    group_ids = set()
+    while True:
+        posts = list(missing.filter(pk__gt=last_id).values_list(
+            'pk', 'group_id', 'pub_date')[:batch_size])
+        if not posts:
+            break
+        last_id = posts[-1][0]
+        ranks = {
+            pk: event_rank(pub_date, settings.TRENDING_POST_WEIGHT)
+            for pk, _, pub_date in posts
+        }
+        comments = Comment.objects.filter(
+            post_id__in=ranks).order_by().values_list('post_id', 'created')
+        for post_id, created in comments.iterator():
+            ranks[post_id] = add_ranks(ranks[post_id], event_rank(created))
+        group_ranks = {}
+        for pk, group_id, _ in posts:
+            if group_id is not None:
+                rank = group_ranks.get(group_id)
+                group_ranks[group_id] = (
+                    ranks[pk] if rank is None else add_ranks(rank, ranks[pk]))
+        with transaction.atomic():
+            # Пост, получивший событие во время заполнения, уже в рейтинге.
+            TrendingPost.objects.bulk_create([
+                TrendingPost(post_id=pk, group_id=group_id, rank=ranks[pk])
+                for pk, group_id, _ in posts
+            ], ignore_conflicts=True)
+            for group_id, rank in group_ranks.items():
+                bump(TrendingGroup, rank, group_id=group_id)
+        group_ids.update(group_ranks)
+        total += len(posts)
+    forget(POSTS_SCOPE, GROUPS_SCOPE, *map(group_posts_scope, group_ids))
+    return total
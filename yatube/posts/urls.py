@@ -12,6 +12,14 @@ urlpatterns = [
         'group/<slug:slug>/',
         views.group_posts, name='group_list'
     ),
+    path(
+        'trending/', views.trending,
+        name='trending'
+    ),
+    path(
+        'group/<slug:slug>/trending/',
+        views.group_trending, name='group_trending'
+    ),
     path(
         'profile/<str:username>/',
         views.profile, name='profile'
@@ -20,6 +28,18 @@ urlpatterns = [
         'posts/<int:post_id>/',
         views.post_detail, name='post_detail'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments, name='post_comments'
+    ),
+    path(
+        'posts/<int:post_id>/comments/<int:comment_id>/replies/',
+        views.comment_replies, name='comment_replies'
+    ),
+    path(
+        'fragments/', views.fragments,
+        name='fragments'
+    ),
     path(
         'create/', views.post_create,
         name='post_create'
@@ -36,6 +56,14 @@ urlpatterns = [
         'follow/', views.follow_index,
         name='follow_index'
     ),
+    path(
+        'posts/<int:post_id>/card/', views.post_card,
+        name='post_card'
+    ),
+    path(
+        'notifications/', views.notifications,
+        name='notifications'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow, name='profile_follow'
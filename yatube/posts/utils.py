@@ -1,9 +1,176 @@
+from calendar import timegm
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import HttpResponseNotModified
+from django.shortcuts import get_object_or_404
+from django.middleware.cache import CacheMiddleware
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 
-from yatube.settings import AMOUNT_POSTS
+from core.cache import get_generation
+from core.metrics import page_cache
+from core.pagination import decode_cursor, encode_cursor
+from yatube.settings import (AMOUNT_POSTS, COMMENT_REPLIES_PER_PAGE,
+                             COMMENTS_PER_PAGE)
+from .models import PATH_SEGMENT_LENGTH, Comment
 
 
 def get_page(request, post_list):
     paginator = Paginator(post_list, AMOUNT_POSTS)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def get_comments_page(post_id, cursor=None):
+    """Ветки комментариев поста после курсора и курсор следующей страницы.
+
+    Страница - COMMENTS_PER_PAGE комментариев верхнего уровня по
+    (created, id) и первые COMMENT_REPLIES_PER_PAGE ответов каждого из
+    них: два запроса при любой длине и глубине веток. Комментарии
+    возвращаются плоским списком в порядке обхода дерева; у последнего
+    показанного ответа урезанной ветки replies_cursor - курсор для
+    get_replies_page. Неверный курсор - ValueError.
+    """
+    roots = Comment.objects.filter(post_id=post_id, depth=0).select_related(
+        'author').with_reply_cutoff(COMMENT_REPLIES_PER_PAGE).order_by(
+            'created', 'id')
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        roots = roots.filter(
+            Q(created__gt=created) | Q(created=created, id__gt=pk))
+    roots = list(roots[:COMMENTS_PER_PAGE + 1])
+    next_cursor = None
+    if len(roots) > COMMENTS_PER_PAGE:
+        roots = roots[:COMMENTS_PER_PAGE]
+        last = roots[-1]
+        next_cursor = encode_cursor(last.created, last.pk)
+    replies = {}
+    if roots:
+        first_replies = Comment.objects.first_replies(roots).select_related(
+            'author')
+        for reply in first_replies:
+            replies.setdefault(reply.thread_id, []).append(reply)
+    comments = []
+    for root in roots:
+        comments.append(root)
+        thread = replies.get(root.pk, [])
+        if root.replies_cutoff is not None:
+            thread[-1].replies_cursor = thread[-1].path
+        comments += thread
+    return comments, next_cursor
+
+
+def get_replies_page(post_id, thread_id, after):
+    """Следующие COMMENT_REPLIES_PER_PAGE ответов ветки thread_id.
+
+    after - путь последнего показанного ответа (replies_cursor), ответы
+    выбираются из поддерева корня по пути одним запросом. Возвращает
+    список в порядке обхода; replies_cursor последнего ответа задан,
+    если в ветке есть ещё ответы. Неверный курсор - ValueError.
+    """
+    if not after.isdigit() or len(after) % PATH_SEGMENT_LENGTH:
+        raise ValueError('Неверный курсор')
+    root = get_object_or_404(
+        Comment.objects.only('path'),
+        pk=thread_id, post_id=post_id, depth=0)
+    replies = list(Comment.objects.subtree(root).filter(
+        path__gt=after).select_related('author')[
+            :COMMENT_REPLIES_PER_PAGE + 1])
+    if len(replies) > COMMENT_REPLIES_PER_PAGE:
+        replies = replies[:COMMENT_REPLIES_PER_PAGE]
+        replies[-1].replies_cursor = replies[-1].path
+    return replies
+
+
+def cache_page_async(timeout, key_prefix, scope=None):
+    """Аналог cache_page для асинхронных представлений.
+
+    Обращения к кешу выполняются в пуле потоков, чтобы не блокировать
+    цикл событий. Если задана область кеша scope, в ключ входит её
+    поколение, и инвалидация области сбрасывает закешированные страницы.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapped_view(request, *args, **kwargs):
+            prefix = key_prefix
+            if scope is not None:
+                generation = await sync_to_async(get_generation)(scope)
+                prefix = f'{key_prefix}.{generation}'
+            middleware = CacheMiddleware(
+                view_func, page_timeout=timeout, key_prefix=prefix)
+            response = await sync_to_async(middleware.process_request)(
+                request)
+            page_cache(key_prefix, response is not None)
+            if response is not None:
+                return response
+            response = await view_func(request, *args, **kwargs)
+            return await sync_to_async(middleware.process_response)(
+                request, response)
+        return wrapped_view
+    return decorator
+
+
+def login_required_async(view_func):
+    """Аналог login_required для асинхронных представлений."""
+    @wraps(view_func)
+    async def wrapped_view(request, *args, **kwargs):
+        if await sync_to_async(is_authenticated)(request):
+            return await view_func(request, *args, **kwargs)
+        return redirect_to_login(request.get_full_path())
+    return wrapped_view
+
+
+def is_authenticated(request):
+    """Загружает ленивого request.user, обращаясь к сессии и базе."""
+    return request.user.is_authenticated
+
+
+def condition_async(validators):
+    """Условный GET для асинхронных представлений.
+
+    validators(request, *args, **kwargs) возвращает пару (ETag,
+    Last-Modified) без рендеринга страницы или None, если объекта нет.
+    Совпавшие If-None-Match/If-Modified-Since дают ответ 304.
+    Страницы не зависят от пользователя, поэтому их разрешено
+    кешировать прокси-серверу; браузер их перепроверяет.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapped_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view_func(request, *args, **kwargs)
+            result = await sync_to_async(validators)(
+                request, *args, **kwargs)
+            if result is None:
+                return await view_func(request, *args, **kwargs)
+            etag, last_modified = result
+            response = get_conditional_response(
+                request,
+                etag=etag,
+                last_modified=timegm(last_modified.utctimetuple()),
+            )
+            page_cache('conditional', response is not None)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            if (response.status_code == 200
+                    or isinstance(response, HttpResponseNotModified)):
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapped_view
+    return decorator
+
+
+def set_validators(response, etag, last_modified):
+    response.headers.setdefault('ETag', etag)
+    response.headers.setdefault('Last-Modified', http_date(
+        timegm(last_modified.utctimetuple())))
+    # Браузер проверяет страницу при каждом переходе, иначе после
+    # записи он показал бы её копию до записи.
+    patch_cache_control(
+        response, public=True, max_age=0,
+        s_maxage=settings.PUBLIC_PAGE_MAX_AGE)
@@ -1,64 +1,251 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.template.loader import render_to_string
+from django.views.decorators.cache import never_cache
 
+from core.cache import get_generation
+from core.metrics import page_cache
+from core.ratelimit import is_duplicate, ratelimit
+from .cache import (INDEX_SCOPE, get_following_ids, group_validators,
+                    index_validators, post_detail_validators, post_scope,
+                    profile_validators)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import get_page
+from .models import (Comment, Follow, Group, Notification, Post, Suggestion,
+                     User)
+from .notifications import mark_read
+from .tasks import make_thumbnails
+from .trending import top_group_ids, top_post_ids
+from .utils import (cache_page_async, condition_async, get_comments_page,
+                    get_page, get_replies_page, login_required_async)
 
+render_async = sync_to_async(render)
 
-@cache_page(20, key_prefix='index_page')
-def index(request):
+POST_CARD_TIMEOUT = 60 * 60
+
+
+@condition_async(index_validators)
+@cache_page_async(20, key_prefix='index_page', scope=INDEX_SCOPE)
+async def index(request):
     post_list = Post.objects.all().select_related('group', 'author')
-    page_obj = get_page(request, post_list)
+    page_obj = await sync_to_async(get_page)(request, post_list)
     context = {
         'page_obj': page_obj,
         'index': True,
+        'shared_page': True,
+        'live_channels': 'posts',
     }
-    return render(request, 'posts/index.html', context)
+    return await render_async(request, 'posts/index.html', context)
 
 
-def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+@condition_async(group_validators)
+async def group_posts(request, slug):
+    group = await sync_to_async(get_object_or_404)(Group, slug=slug)
     post_list = Post.objects.filter(
         group=group).select_related('group', 'author')
-    page_obj = get_page(request, post_list)
+    page_obj = await sync_to_async(get_page)(request, post_list)
     context = {
         'group': group,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'shared_page': True,
+        'live_channels': f'group:{group.pk}',
     }
-    return render(request, 'posts/group_list.html', context)
+    return await render_async(request, 'posts/group_list.html', context)
 
 
-def profile(request, username):
-    author = get_object_or_404(User, username=username)
+def get_ranked_page(request, post_ids):
+    """Страница постов из готового рейтинга: запрос только за её постами."""
+    page_obj = get_page(request, post_ids)
+    posts = Post.objects.select_related('group', 'author').in_bulk(
+        page_obj.object_list)
+    page_obj.object_list = [
+        posts[post_id] for post_id in page_obj.object_list
+        if post_id in posts
+    ]
+    return page_obj
+
+
+def get_trending_groups():
+    group_ids = top_group_ids()[:settings.TRENDING_GROUPS_SHOWN]
+    groups = Group.objects.in_bulk(group_ids)
+    return [groups[group_id] for group_id in group_ids if group_id in groups]
+
+
+async def trending(request):
+    post_ids = await sync_to_async(top_post_ids)()
+    context = {
+        'page_obj': await sync_to_async(get_ranked_page)(request, post_ids),
+        'groups': await sync_to_async(get_trending_groups)(),
+        'shared_page': True,
+    }
+    return await render_async(request, 'posts/trending.html', context)
+
+
+async def group_trending(request, slug):
+    group = await sync_to_async(get_object_or_404)(Group, slug=slug)
+    post_ids = await sync_to_async(top_post_ids)(group.pk)
+    context = {
+        'group': group,
+        'page_obj': await sync_to_async(get_ranked_page)(request, post_ids),
+        'shared_page': True,
+    }
+    return await render_async(request, 'posts/trending.html', context)
+
+
+def is_following(request, author):
+    return author.pk in get_following_ids(request.user)
+
+
+@condition_async(profile_validators)
+async def profile(request, username):
+    author = await sync_to_async(get_object_or_404)(User, username=username)
     post_list = Post.objects.filter(
         author_id=author.id).select_related('group')
-    page_obj = get_page(request, post_list)
-    following = (
-        request.user.is_authenticated and request.user.follower.filter(
-            author=author).exists())
+    page_obj = await sync_to_async(get_page)(request, post_list)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
+        'shared_page': True,
     }
-    return render(request, 'posts/profile.html', context)
+    return await render_async(request, 'posts/profile.html', context)
 
 
-def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+@condition_async(post_detail_validators)
+async def post_detail(request, post_id):
+    post = await sync_to_async(get_object_or_404)(
+        Post.objects.select_related('group', 'author'), id=post_id)
+    comments, next_cursor = await sync_to_async(get_comments_page)(post.id)
     context = {
         'post': post,
-        'form': form,
+        'form': CommentForm(),
         'comments': comments,
+        'next_cursor': next_cursor,
+        'shared_page': True,
+        'live_channels': f'post:{post.pk}',
     }
-    return render(request, 'posts/post_detail.html', context)
+    return await render_async(request, 'posts/post_detail.html', context)
+
+
+async def post_comments(request, post_id):
+    """Следующая страница комментариев поста.
+
+    Отдаёт HTML-фрагмент для кнопки «Показать ещё» или, с ?format=json,
+    список комментариев и курсор следующей страницы.
+    """
+    post = await sync_to_async(get_object_or_404)(
+        Post.objects.only('id'), id=post_id)
+    try:
+        comments, next_cursor = await sync_to_async(get_comments_page)(
+            post.id, request.GET.get('cursor'))
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    return await render_comments(request, post, comments, next_cursor)
+
+
+async def comment_replies(request, post_id, comment_id):
+    """Следующие ответы ветки комментария comment_id.
+
+    Курсор ?after - replies_cursor последнего показанного ответа;
+    формат ответа тот же, что у post_comments.
+    """
+    post = await sync_to_async(get_object_or_404)(
+        Post.objects.only('id'), id=post_id)
+    try:
+        comments = await sync_to_async(get_replies_page)(
+            post.id, comment_id, request.GET.get('after', ''))
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    return await render_comments(request, post, comments, None)
+
+
+async def render_comments(request, post, comments, next_cursor):
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'parent': comment.parent_id,
+                    'depth': comment.depth,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created,
+                    'replies_cursor': getattr(
+                        comment, 'replies_cursor', None),
+                }
+                for comment in comments
+            ],
+            'next': next_cursor,
+        })
+    context = {
+        'post': post,
+        'comments': comments,
+        'next_cursor': next_cursor,
+    }
+    return await render_async(
+        request, 'posts/includes/comments.html', context)
+
+
+@never_cache
+def post_card(request, post_id):
+    """Карточка поста для вставки в ленту без перезагрузки.
+
+    Её запрашивают все открытые ленты сразу после публикации поста,
+    поэтому разметка кешируется до изменения поста.
+    """
+    key = f'post_card:{get_generation(post_scope(post_id))}:{post_id}'
+    html = cache.get(key)
+    page_cache('post_card', html is not None)
+    if html is None:
+        post = get_object_or_404(
+            Post.objects.select_related('group', 'author'), id=post_id)
+        html = render_to_string(
+            'posts/includes/post_card.html', {'post': post})
+        cache.set(key, html, POST_CARD_TIMEOUT)
+    return HttpResponse(html)
+
+
+def fragments(request):
+    """Фрагменты общих страниц, зависящие от пользователя.
+
+    Ленты и страницы постов одинаковы для всех и кешируются целиком,
+    а шапку, кнопки и форму комментария браузер получает отсюда.
+    """
+    fragments = {
+        'header': render_to_string(
+            'includes/header_nav.html', request=request),
+    }
+    if 'switcher' in request.GET:
+        fragments['switcher'] = render_to_string(
+            'posts/includes/switcher.html', {'index': True}, request)
+    if request.user.is_authenticated:
+        fragments['viewer'] = request.user.pk
+        fragments['following'] = sorted(get_following_ids(request.user))
+    username = request.GET.get('author')
+    if username:
+        author = get_object_or_404(User, username=username)
+        fragments['follow'] = render_to_string(
+            'posts/includes/follow_button.html',
+            {'author': author, 'following': is_following(request, author)},
+            request,
+        )
+    post_id = request.GET.get('post', '')
+    if post_id.isdigit():
+        post = get_object_or_404(Post.objects.only('author_id'), id=post_id)
+        fragments['post_actions'] = render_to_string(
+            'posts/includes/post_actions.html', {'post': post}, request)
+        fragments['comment_form'] = render_to_string(
+            'posts/includes/add_comment.html',
+            {'post': post, 'form': CommentForm()},
+            request,
+        )
+    return JsonResponse(fragments)
 
 
 @login_required
+@ratelimit('post')
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -71,6 +258,8 @@ def post_create(request):
         post = form.save(False)
         post.author = request.user
         form.save()
+        if post.image:
+            make_thumbnails.delay(post.id)
         return redirect('posts:profile', request.user)
     return render(request, 'posts/create_post.html', context)
 
@@ -91,36 +280,96 @@ def post_edit(request, post_id):
     }
     if request.method == 'POST':
         if form.is_valid():
-            form.save()
+            post = form.save()
+            if 'image' in form.changed_data and post.image:
+                make_thumbnails.delay(post.id)
             return redirect('posts:post_detail', post_id)
     return render(request, 'posts/create_post.html', context)
 
 
+def get_reply_parent(post, parent_id):
+    """Комментарий, на который отвечают, с учётом предела вложенности.
+
+    Ответ на комментарий самого глубокого уровня становится ответом
+    на его родителя.
+    """
+    if not parent_id or not parent_id.isdigit():
+        return None
+    parent = Comment.objects.filter(post=post, id=parent_id).select_related(
+        'parent').first()
+    if parent is not None and parent.depth >= settings.COMMENTS_MAX_DEPTH:
+        return parent.parent
+    return parent
+
+
 @login_required
+@ratelimit('comment')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and not is_duplicate(
+            f'comment:{post.id}', request.user.pk,
+            form.cleaned_data['text']):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        comment.parent = get_reply_parent(post, request.POST.get('parent'))
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
-@login_required
-def follow_index(request):
+def get_suggestions(user, following_ids):
+    """Рекомендованные авторы из заранее посчитанной таблицы.
+
+    Таблица обновляется периодически, поэтому авторы, на которых
+    пользователь уже подписался, отбрасываются по множеству подписок.
+    """
+    suggestions = Suggestion.objects.filter(user=user).exclude(
+        author_id__in=following_ids).select_related('author').order_by(
+            '-score')[:settings.SUGGESTIONS_COUNT]
+    return [suggestion.author for suggestion in suggestions]
+
+
+@login_required_async
+async def follow_index(request):
     post_list = Post.objects.filter(
         author__following__user=request.user).select_related('group', 'author')
-    page_obj = get_page(request, post_list)
+    page_obj = await sync_to_async(get_page)(request, post_list)
+    following_ids = await sync_to_async(get_following_ids)(request.user)
     context = {
         'page_obj': page_obj,
         'follow': True,
+        'following_ids': following_ids,
+        'viewer_id': request.user.pk,
+        'suggestions': await sync_to_async(get_suggestions)(
+            request.user, following_ids),
+        'live_channels': ','.join(
+            f'author:{author_id}' for author_id in
+            sorted(following_ids)[:settings.EVENTS_MAX_CHANNELS]),
+    }
+    return await render_async(request, 'posts/follow.html', context)
+
+
+@login_required
+def notifications(request):
+    """Уведомления о новых постах; показанные отмечаются прочитанными."""
+    notification_list = Notification.objects.filter(
+        user=request.user).select_related('post__author', 'post__group')
+    page_obj = get_page(request, notification_list)
+    context = {
+        'page_obj': page_obj,
+        'unread_ids': {
+            notification.pk for notification in page_obj
+            if not notification.is_read
+        },
     }
-    return render(request, 'posts/follow.html', context)
+    if context['unread_ids']:
+        mark_read(request.user.pk, context['unread_ids'])
+    return render(request, 'posts/notifications.html', context)
 
 
 @login_required
+@ratelimit('follow', methods=('GET', 'POST'))
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
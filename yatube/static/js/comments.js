@@ -0,0 +1,28 @@
+// Кнопка «Показать ещё» подгружает следующую страницу комментариев
+// и заменяется полученным фрагментом (с новой кнопкой, если есть ещё).
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('[data-load-more]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.href, {credentials: 'same-origin'})
+    .then(function (response) {
+      return response.text();
+    })
+    .then(function (html) {
+      link.insertAdjacentHTML('beforebegin', html);
+      link.remove();
+    });
+});
+
+// «Ответить» делает следующий комментарий ответом на выбранный.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('[data-reply-to]');
+  var form = document.getElementById('comment-form');
+  if (!link || !form) {
+    return;
+  }
+  form.elements.parent.value = link.dataset.replyTo;
+  form.elements.text.focus();
+});
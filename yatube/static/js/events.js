@@ -0,0 +1,56 @@
+// Новые посты и комментарии приходят потоком событий (core.events)
+// и вставляются в страницу без перезагрузки.
+(function () {
+  var script = document.currentScript;
+  if (!window.EventSource || !script) {
+    return;
+  }
+  var source = new EventSource(script.dataset.url);
+
+  // Пост: карточку отдаёт отдельный URL, её разметка кешируется.
+  source.addEventListener('post', function (event) {
+    var data = JSON.parse(event.data);
+    var feed = document.querySelector('[data-live-feed]');
+    if (!feed || feed.querySelector('[data-post-id="' + data.id + '"]')) {
+      return;
+    }
+    var url = script.dataset.cardUrl.replace('/0/', '/' + data.id + '/');
+    fetch(url, {credentials: 'same-origin'})
+      .then(function (response) {
+        return response.ok ? response.text() : '';
+      })
+      .then(function (html) {
+        if (html && !feed.querySelector('[data-post-id="' + data.id + '"]')) {
+          feed.insertAdjacentHTML('afterbegin', html + '<hr>');
+        }
+      });
+  });
+
+  // Комментарий: ответ встаёт после ветки родителя, новый - в конец
+  // списка, если список загружен целиком.
+  source.addEventListener('comment', function (event) {
+    var data = JSON.parse(event.data);
+    var list = document.getElementById('comments');
+    if (!list || document.getElementById('comment-' + data.id)) {
+      return;
+    }
+    if (data.parent === null) {
+      if (!list.querySelector('[data-load-more]')) {
+        list.insertAdjacentHTML('beforeend', data.html);
+      }
+      return;
+    }
+    var parent = document.getElementById('comment-' + data.parent);
+    if (!parent) {
+      return;
+    }
+    var depth = Number(parent.dataset.depth);
+    var last = parent;
+    var next = last.nextElementSibling;
+    while (next && Number(next.dataset.depth) > depth) {
+      last = next;
+      next = last.nextElementSibling;
+    }
+    last.insertAdjacentHTML('afterend', data.html);
+  });
+})();
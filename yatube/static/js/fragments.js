@@ -0,0 +1,32 @@
+// Подставляет в общую закешированную страницу фрагменты,
+// которые зависят от пользователя: шапку, кнопки, форму комментария.
+(function () {
+  var url = document.currentScript.dataset.url;
+  fetch(url, {credentials: 'same-origin'})
+    .then(function (response) {
+      return response.json();
+    })
+    .then(function (fragments) {
+      document.querySelectorAll('[data-fragment]').forEach(function (element) {
+        var html = fragments[element.dataset.fragment];
+        if (html !== undefined) {
+          element.innerHTML = html;
+        }
+      });
+      if (fragments.following === undefined) {
+        return;
+      }
+      // Кнопки подписки в карточках постов: проверка по множеству id.
+      var following = new Set(fragments.following);
+      document.querySelectorAll('[data-follow-author]').forEach(function (element) {
+        var author = Number(element.dataset.followAuthor);
+        if (author === fragments.viewer) {
+          return;
+        }
+        var state = String(following.has(author));
+        element.querySelectorAll('[data-following]').forEach(function (button) {
+          button.hidden = button.dataset.following !== state;
+        });
+      });
+    });
+})();
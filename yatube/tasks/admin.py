@@ -0,0 +1,20 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'attempts',
+        'run_after',
+        'created',
+    )
+    list_filter = ('status',)
+    search_fields = ('name',)
+    readonly_fields = ('locked_by', 'locked_at', 'last_error')
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,59 @@
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import metrics
+from core.routers import primary
+from tasks.queue import claim, execute
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в базе данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Размер пула обработчиков.')
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Использовать пул процессов вместо пула потоков.')
+        parser.add_argument(
+            '--batch', type=int, default=100,
+            help='Сколько задач забирать из очереди за раз.')
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться.')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        if options['processes']:
+            # Задачи считают метрики в дочерних процессах.
+            pool = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                initializer=metrics.start_flusher,
+            )
+        else:
+            pool = ThreadPoolExecutor(max_workers=options['workers'])
+        done = 0
+        with metrics.exporting(), pool:
+            while True:
+                with primary():
+                    batch = claim(worker, options['batch'])
+                if batch:
+                    if options['processes']:
+                        # Дочерние процессы не должны наследовать
+                        # соединения с базой.
+                        connections.close_all()
+                    done += len(list(pool.map(execute, batch)))
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        self.stdout.write(f'Обработано задач: {done}')
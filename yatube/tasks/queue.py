@@ -0,0 +1,144 @@
+import logging
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from core.routers import primary
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+_executor = None
+
+
+def task(func):
+    """Регистрирует функцию как фоновую задачу.
+
+    func.delay(*args, **kwargs) ставит вызов в очередь. Аргументы
+    должны сериализоваться в JSON: передавайте id, а не объекты.
+    """
+    name = f'{func.__module__}.{func.__name__}'
+    registry[name] = func
+
+    def delay(*args, **kwargs):
+        return enqueue(name, *args, **kwargs)
+
+    func.delay = delay
+    return func
+
+
+def enqueue(name, *args, **kwargs):
+    """Ставит задачу в очередь согласно TASKS_BACKEND.
+
+    db - строка Task в текущей транзакции, её выполнит run_tasks;
+    thread - пул потоков текущего процесса после коммита;
+    sync - выполнение в текущем потоке после коммита.
+    """
+    if settings.TASKS_BACKEND == 'db':
+        return Task.objects.create(name=name, args=args, kwargs=kwargs)
+    if settings.TASKS_BACKEND == 'thread':
+        transaction.on_commit(
+            lambda: get_executor().submit(run_in_thread, name, args, kwargs))
+    else:
+        transaction.on_commit(lambda: call(name, args, kwargs))
+    return None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.TASKS_THREADS,
+            thread_name_prefix='tasks',
+        )
+    return _executor
+
+
+def call(name, args, kwargs):
+    """Выполняет задачу, возвращает текст ошибки или None.
+
+    Задача читает с основной базы: реплика может ещё не получить
+    данные, ради которых задача поставлена.
+    """
+    try:
+        with primary():
+            registry[name](*args, **kwargs)
+    except Exception:
+        logger.exception('Task %s failed', name)
+        return traceback.format_exc()
+    return None
+
+
+def run_in_thread(name, args, kwargs):
+    close_old_connections()
+    try:
+        for attempt in range(1, settings.TASKS_MAX_ATTEMPTS + 1):
+            if call(name, args, kwargs) is None:
+                return
+            if attempt < settings.TASKS_MAX_ATTEMPTS:
+                time.sleep(retry_delay(attempt))
+    finally:
+        close_old_connections()
+
+
+def retry_delay(attempt):
+    """Экспоненциальная задержка перед повторной попыткой."""
+    return settings.TASKS_RETRY_DELAY * 2 ** (attempt - 1)
+
+
+def claim(worker, limit):
+    """Забирает пачку готовых к выполнению задач для обработчика.
+
+    Задачи захватываются одним UPDATE, поэтому несколько
+    обработчиков не выполнят одну задачу дважды.
+    """
+    now = timezone.now()
+    Task.objects.filter(
+        status=Task.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT),
+    ).update(status=Task.PENDING, locked_by='')
+    due = Task.objects.filter(
+        status=Task.PENDING, run_after__lte=now,
+    ).values_list('pk', flat=True)[:limit]
+    Task.objects.filter(pk__in=list(due), status=Task.PENDING).update(
+        status=Task.RUNNING, locked_by=worker, locked_at=now)
+    return list(Task.objects.filter(
+        status=Task.RUNNING, locked_by=worker, locked_at=now,
+    ).values_list('pk', flat=True))
+
+
+def execute(pk):
+    """Выполняет захваченную задачу и записывает результат."""
+    close_old_connections()
+    try:
+        with primary():
+            task = Task.objects.get(pk=pk)
+            if task.name not in registry:
+                error = f'Unknown task {task.name}'
+                task.attempts = settings.TASKS_MAX_ATTEMPTS - 1
+            else:
+                error = call(task.name, task.args, task.kwargs)
+            task.attempts += 1
+            task.locked_by = ''
+            if error is None:
+                task.status = Task.DONE
+            elif task.attempts >= settings.TASKS_MAX_ATTEMPTS:
+                task.status = Task.FAILED
+                task.last_error = error
+            else:
+                task.status = Task.PENDING
+                task.last_error = error
+                task.run_after = timezone.now() + timedelta(
+                    seconds=retry_delay(task.attempts))
+            task.save(update_fields=(
+                'status', 'attempts', 'locked_by', 'last_error',
+                'run_after'))
+            return task.status
+    finally:
+        close_old_connections()
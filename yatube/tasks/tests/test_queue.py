@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core import metrics
+from ..models import Task
+from ..queue import task
+
+calls = []
+
+
+@task
+def remember(value):
+    calls.append(value)
+
+
+@task
+def explode():
+    raise ValueError('Ошибка задачи')
+
+
+@task
+def observe_thumbnail():
+    metrics.THUMBNAILS.observe(0.1)
+
+
+@task
+def count_tasks():
+    calls.append(Task.objects.count())
+
+
+class EnqueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_db_backend_creates_task(self):
+        """В режиме db задача сохраняется в очередь, а не выполняется."""
+        remember.delay(1)
+        task = Task.objects.get()
+        self.assertEqual(task.name, f'{__name__}.remember')
+        self.assertEqual(task.args, [1])
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertEqual(calls, [])
+
+    @override_settings(TASKS_BACKEND='sync')
+    def test_sync_backend_runs_after_commit(self):
+        """В режиме sync задача выполняется только после коммита."""
+        with self.captureOnCommitCallbacks(execute=True):
+            remember.delay(2)
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, [2])
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(TASKS_RETRY_DELAY=0, TASKS_MAX_ATTEMPTS=2)
+class RunTasksCommandTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_executes_pending_tasks(self):
+        """Обработчик выполняет задачи из очереди."""
+        remember.delay(3)
+        remember.delay(4)
+        call_command('run_tasks', once=True, stdout=StringIO())
+        self.assertCountEqual(calls, [3, 4])
+        self.assertEqual(
+            Task.objects.filter(status=Task.DONE).count(), 2)
+
+    @override_settings(REPLICA_DATABASES=['missing_replica'])
+    def test_worker_reads_primary(self):
+        """Обработчик и задачи читают с основной базы, а не с реплики."""
+        count_tasks.delay()
+        call_command('run_tasks', once=True, stdout=StringIO())
+        self.assertEqual(calls, [1])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_worker_retries_and_fails(self):
+        """Упавшая задача повторяется, затем помечается ошибочной."""
+        explode.delay()
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            call_command('run_tasks', once=True, stdout=StringIO())
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+        self.assertIn('Ошибка задачи', task.last_error)
+
+    def test_worker_exports_metrics(self):
+        """С METRICS_DIR обработчик пишет метрики задач в каталог."""
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        observe_thumbnail.delay()
+        with override_settings(METRICS_DIR=metrics_dir), \
+                mock.patch.object(metrics, 'start_flusher') as start_flusher:
+            call_command('run_tasks', once=True, stdout=StringIO())
+            path = metrics.snapshot_path(os.getpid())
+        start_flusher.assert_called_once_with()
+        with open(path) as file:
+            state = json.load(file)
+        self.assertEqual(
+            state[metrics.THUMBNAILS.name],
+            [[[], metrics.THUMBNAILS.values[()]]],
+        )
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache import invalidation
+from core.routers import primary
+
+
+def user_key(user_id):
+    return f'user:{user_id}'
+
+
+def invalidate_user(user_id):
+    invalidation.add(user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кеша.
+
+    AuthenticationMiddleware загружает пользователя на каждом запросе;
+    здесь это запрос к кешу, а не к auth_user. Запись сбрасывается при
+    сохранении и удалении пользователя (в том числе при смене пароля и
+    входе, меняющем last_login).
+    """
+
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            # Запись сбрасывается сразу после изменения пользователя, и
+            # реплика могла его ещё не получить: в кеш на
+            # USER_CACHE_TIMEOUT попала бы старая версия.
+            with primary():
+                user = super().get_user(user_id)
+            if user is None:
+                return None
+            # Внутри транзакции пользователь мог быть прочитан до её
+            # отката, поэтому в кеш он попадает только после коммита.
+            transaction.on_commit(
+                lambda: cache.set(key, user, settings.USER_CACHE_TIMEOUT))
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.checks import Error, Tags, Warning, register
+
+
+@register(Tags.security)
+def check_password_hasher(app_configs, **kwargs):
+    """Выбранный хешер паролей доступен и годится для продакшена."""
+    hasher = get_hasher()
+    try:
+        # Хешер с недоступной библиотекой не может ничего захешировать.
+        hasher.encode('check', hasher.salt())
+    except ValueError as error:
+        return [Error(
+            f'Хешер паролей {settings.PASSWORD_HASHER!r} недоступен: '
+            f'{error}',
+            hint='Установите библиотеку или смените '
+                 'YATUBE_PASSWORD_HASHER.',
+            id='users.E001',
+        )]
+    if settings.PASSWORD_HASHER == 'md5' and not settings.TESTING:
+        return [Warning(
+            'Пароли хешируются MD5 - это допустимо только в тестах.',
+            id='users.W001',
+        )]
+    return []
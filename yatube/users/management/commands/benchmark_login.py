@@ -0,0 +1,75 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+
+from users.backends import CachedModelBackend, user_key
+
+User = get_user_model()
+PASSWORD = 'benchmark-Pa55word'
+
+
+def measure(func, number):
+    """Среднее время вызова func в секундах."""
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) / number
+
+
+class Command(BaseCommand):
+    help = ('Замеряет скорость входа с разными хешерами паролей и '
+            'стоимость загрузки пользователя на каждом запросе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--logins', type=int, default=20,
+            help='Сколько проверок пароля делать для каждого хешера.')
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Сколько раз загружать пользователя сессии.')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Проверка пароля:')
+        for name, path in settings.PASSWORD_HASHER_CHOICES.items():
+            hasher = import_string(path)()
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError:
+                self.stdout.write(f'  {name:12} библиотека не установлена')
+                continue
+            seconds = measure(
+                lambda: hasher.verify(PASSWORD, encoded), options['logins'])
+            self.stdout.write(
+                f'  {name:12} {seconds * 1000:8.3f} мс '
+                f'{1 / seconds:10.0f} входов/с')
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username='benchmark-login', password=PASSWORD)
+            seconds = measure(
+                lambda: authenticate(
+                    username=user.username, password=PASSWORD),
+                options['logins'],
+            )
+            self.stdout.write(
+                f'authenticate() с {settings.PASSWORD_HASHER}: '
+                f'{1 / seconds:.0f} входов/с')
+            self.stdout.write('Загрузка пользователя сессии:')
+            for backend in (ModelBackend(), CachedModelBackend()):
+                with CaptureQueriesContext(connection) as queries:
+                    seconds = measure(
+                        lambda: backend.get_user(user.pk),
+                        options['requests'],
+                    )
+                self.stdout.write(
+                    f'  {type(backend).__name__:20} '
+                    f'{seconds * 1e6:8.1f} мкс/запрос, '
+                    f'запросов к БД: {len(queries) / options["requests"]:.2f}')
+            cache.delete(user_key(user.pk))
+            transaction.set_rollback(True)
@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (BCryptSHA256PasswordHasher,
+                                         make_password)
+from django.core.cache import cache
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.routers import reset_pinning
+from users.backends import CachedModelBackend
+from users.checks import check_password_hasher
+
+User = get_user_model()
+PASSWORD = 'Secret-pa55word'
+
+
+class PasswordHashingTests(TestCase):
+    def test_tests_use_fast_hasher(self):
+        """В тестах пароли хешируются быстрым хешером."""
+        user = User.objects.create_user(username='User', password=PASSWORD)
+        self.assertTrue(user.password.startswith('md5$'))
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    ])
+    def test_password_rehashed_on_login(self):
+        """Пароль со старым хешем перехешируется при входе."""
+        user = User.objects.create(
+            username='User',
+            password=make_password(PASSWORD, hasher='pbkdf2_sha256'),
+        )
+        response = Client().post(reverse('users:login'), {
+            'username': 'User', 'password': PASSWORD})
+        self.assertEqual(response.status_code, 302)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('md5$'))
+
+    def test_check_missing_library(self):
+        """Хешер без установленной библиотеки - ошибка проверки."""
+        hasher = BCryptSHA256PasswordHasher()
+        hasher.library = 'yatube_missing_library'
+        with mock.patch('users.checks.get_hasher', return_value=hasher):
+            errors = check_password_hasher(None)
+        self.assertEqual([error.id for error in errors], ['users.E001'])
+        self.assertEqual(check_password_hasher(None), [])
+
+
+class CachedBackendTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='User')
+        self.backend = CachedModelBackend()
+
+    def test_user_loaded_from_cache(self):
+        """Пользователь сессии загружается из кеша без запроса к базе."""
+        self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    def test_cache_reset_on_save(self):
+        """Изменение пользователя сбрасывает запись в кеше."""
+        self.backend.get_user(self.user.pk)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    # Реплики нет в DATABASES: чтение с неё упадёт.
+    @override_settings(REPLICA_DATABASES=['missing_replica'])
+    def test_cache_filled_from_primary(self):
+        """Пользователь для кеша читается с основной базы, а не с реплики."""
+        reset_pinning()
+        self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+
+    def test_request_does_not_query_users(self):
+        """Запрос авторизованного пользователя не читает auth_user."""
+        client = Client()
+        client.force_login(self.user)
+        client.get(reverse('about:author'))
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('about:author'))
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+        self.assertFalse(
+            any('auth_user' in query['sql'] for query in queries))
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -41,6 +42,9 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'tasks.apps.TasksConfig',
+    'mail.apps.MailConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -52,11 +56,16 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.LoadSheddingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaPinningMiddleware',
+    'core.middleware.BatchedInvalidationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,6 +85,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.notifications.notifications',
             ],
         },
     },
@@ -94,6 +104,29 @@ DATABASES = {
     }
 }
 
+# Read replicas: comma separated SQLite files, e.g.
+# YATUBE_REPLICAS=db_replica.sqlite3 python manage.py runserver
+# Replica schema is created with `migrate --database=replica_1`.
+
+for number, name in enumerate(
+        filter(None, os.environ.get('YATUBE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica_{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, name.strip()),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# Seconds during which a client reads from the primary after a write
+
+REPLICA_PIN_SECONDS = 15
+REPLICA_PIN_COOKIE = 'pin_primary'
+
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -113,6 +146,51 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing: YATUBE_PASSWORD_HASHER picks the hasher for new
+# passwords - 'argon2' (needs argon2-cffi) or 'bcrypt' (needs bcrypt) for
+# production, 'pbkdf2' by default, 'md5' for test runs only (manage.py
+# test; pytest switches to it in conftest.py). Passwords hashed by the
+# other hashers still work and are rehashed on next login.
+
+TESTING = sys.argv[1:2] == ['test']
+PASSWORD_HASHER = os.environ.get(
+    'YATUBE_PASSWORD_HASHER', 'md5' if TESTING else 'pbkdf2')
+PASSWORD_HASHER_CHOICES = {
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'pbkdf2_sha1': 'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'md5': 'django.contrib.auth.hashers.MD5PasswordHasher',
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[PASSWORD_HASHER]] + [
+    path for name, path in PASSWORD_HASHER_CHOICES.items()
+    if name not in (PASSWORD_HASHER, 'md5')
+]
+
+# Users are loaded from the cache instead of auth_user on every request.
+# ModelBackend stays for sessions created before the cached backend.
+
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+USER_CACHE_TIMEOUT = 5 * 60
+
+# Sessions: YATUBE_SESSION_ENGINE selects 'cached_db' (reads from the
+# cache, writes through to the database; several worker processes need
+# a shared cache), 'db' or 'signed_cookies' (no server-side storage, the
+# data is limited to ~4 KB and readable by the client).
+# `manage.py clear_expired_sessions` deletes expired database sessions.
+
+SESSION_ENGINE_CHOICES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'db': 'django.contrib.sessions.backends.db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINE_CHOICES[
+    os.environ.get('YATUBE_SESSION_ENGINE', 'cached_db')]
+SESSION_CLEANUP_BATCH_SIZE = 1000
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -140,6 +218,53 @@ STATIC_URL = '/static/'
 
 AMOUNT_POSTS = 10
 
+# Number of top-level comments per page of a post thread, replies shown
+# per thread at a time, and the deepest reply level (replies to deeper
+# comments are attached one level up)
+
+COMMENTS_PER_PAGE = 20
+COMMENT_REPLIES_PER_PAGE = 10
+COMMENTS_MAX_DEPTH = 5
+
+# Write rate limits per user ("count/period", period is s, m, h or d);
+# a client IP may send RATELIMIT_IP_MULTIPLIER times more. Repeated
+# comment text from the same user is dropped for DUPLICATE_WINDOW seconds.
+
+RATELIMITS = {
+    'comment': '10/m',
+    'post': '20/h',
+    'follow': '60/m',
+}
+RATELIMIT_IP_MULTIPLIER = 5
+DUPLICATE_WINDOW = 10 * 60
+
+# Client address used by rate limits, load shedding and IP allowlists.
+# Without a reverse proxy it is REMOTE_ADDR. Behind proxies set
+# CLIENT_IP_HEADER to the request.META key they fill (for example
+# 'HTTP_X_FORWARDED_FOR') and TRUSTED_PROXY_COUNT to the number of proxies
+# appending to it: the client is that many entries from the right, the
+# entries to its left come from the client and are ignored.
+
+CLIENT_IP_HEADER = os.getenv('YATUBE_CLIENT_IP_HEADER')
+TRUSTED_PROXY_COUNT = int(os.getenv('YATUBE_TRUSTED_PROXY_COUNT', '1'))
+
+# Rows processed per transaction by admin moderation jobs
+
+MODERATION_CHUNK_SIZE = 500
+
+# Rows removed per transaction when deleting a user with their content
+
+USER_DELETION_BATCH_SIZE = 1000
+
+# Admin changelists of big tables show an estimated row count above this;
+# filtered and searched changelists are counted exactly
+
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Maximum page size of the JSON API
+
+API_MAX_LIMIT = 100
+
 # Maximum number of characters in the post title
 
 MAX_CHAR_TITLE = 15
@@ -160,8 +285,17 @@ LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Mail is queued in the OutgoingEmail table and sent in batches by
+# `manage.py send_queued_mail` through MAIL_DELIVERY_BACKEND: files in
+# EMAIL_FILE_PATH locally, console or smtp backend in production.
+
+EMAIL_BACKEND = 'mail.backends.OutboxBackend'
+MAIL_DELIVERY_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+MAIL_BATCH_SIZE = 100
+MAIL_MAX_ATTEMPTS = 5
+MAIL_RETRY_DELAY = 60
+MAIL_LOCK_TIMEOUT = 600
 
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -175,9 +309,123 @@ INTERNAL_IPS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Thumbnails are generated by a backend that reports timing to /metrics
+
+THUMBNAIL_BACKEND = 'posts.thumbnails.TimedThumbnailBackend'
+
+
+# Seconds a shared proxy may cache user-independent pages (s-maxage);
+# browsers get max-age=0 and revalidate, so a user sees their own writes
+
+PUBLIC_PAGE_MAX_AGE = 20
 
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+
+# Background tasks: 'db' - queue table processed by `manage.py run_tasks`,
+# 'thread' - in-process thread pool, 'sync' - run in the request thread.
+# Tasks start only after the surrounding transaction commits.
+
+TASKS_BACKEND = 'db'
+TASKS_THREADS = 4
+TASKS_MAX_ATTEMPTS = 3
+TASKS_RETRY_DELAY = 10
+TASKS_LOCK_TIMEOUT = 600
+
+
+# "Who to follow": suggestions kept per user and users scored per chunk
+# by `manage.py compute_suggestions`, a nightly cron job (see README).
+
+SUGGESTIONS_COUNT = 10
+SUGGESTIONS_CHUNK_SIZE = 1000
+
+# Trending: a comment's weight halves every TRENDING_HALF_LIFE seconds,
+# a new post counts as TRENDING_POST_WEIGHT comments, rankings keep
+# the top TRENDING_SIZE posts (globally and per group) and groups.
+
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_POST_WEIGHT = 3
+TRENDING_SIZE = 100
+TRENDING_GROUPS_SHOWN = 10
+
+# New post notifications: followers notified per background task and
+# how long the cached unread count lives (it is reset on every change)
+
+NOTIFICATIONS_CHUNK_SIZE = 1000
+NOTIFICATIONS_COUNT_TIMEOUT = 24 * 60 * 60
+
+# Server-sent events at EVENTS_PATH: 'core.events.LocalBroker' delivers
+# events to streams of the same process, 'core.events.DatabaseBroker' to
+# every worker (each polls the event table every EVENTS_POLL_INTERVAL
+# seconds and rereads the last EVENTS_POLL_OVERLAP seconds, so events
+# committed late or written by a worker with a lagging clock are not
+# missed). A stream ends after EVENTS_STREAM_TIMEOUT seconds and the
+# browser reconnects in EVENTS_RETRY seconds.
+
+EVENTS_BACKEND = 'core.events.LocalBroker'
+EVENTS_PATH = '/events/'
+EVENTS_HEARTBEAT = 15
+EVENTS_STREAM_TIMEOUT = 5 * 60
+EVENTS_RETRY = 3
+EVENTS_MAX_CHANNELS = 100
+EVENTS_POLL_INTERVAL = 1
+EVENTS_POLL_OVERLAP = 5
+
+# Sampled request profiling (off unless PROFILING_ENABLED): a share of
+# requests and those whose PROFILING_HEADER header equals the secret
+# PROFILING_TOKEN (the header is ignored while the token is empty) are
+# profiled, stack samples are written to PROFILING_DIR as folded stacks
+# for flame graph tools, the slowest requests are in the admin. Only the
+# newest PROFILING_MAX_PROFILES profiles and their files are kept.
+
+PROFILING_ENABLED = os.getenv('YATUBE_PROFILING') == '1'
+PROFILING_SAMPLE_RATE = 0.001
+PROFILING_HEADER = 'HTTP_X_PROFILE'
+PROFILING_TOKEN = os.getenv('YATUBE_PROFILING_TOKEN', '')
+PROFILING_MAX_PROFILES = 1000
+PROFILING_INTERVAL = 0.005
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# Prometheus metrics at METRICS_PATH, closed unless opted in: served to
+# requests with "Authorization: Bearer METRICS_TOKEN" and to client
+# addresses in METRICS_ALLOWED_IPS. The allowlist trusts the client
+# address, so behind a proxy it needs CLIENT_IP_HEADER set, otherwise
+# every request comes from the proxy. With several worker processes set
+# METRICS_DIR: each worker writes its values there every
+# METRICS_FLUSH_INTERVAL seconds and /metrics sums them. Clear the
+# directory when the service restarts.
+
+METRICS_PATH = '/metrics'
+METRICS_TOKEN = os.getenv('YATUBE_METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = list(
+    filter(None, os.getenv('YATUBE_METRICS_ALLOWED_IPS', '').split(',')))
+METRICS_DIR = os.getenv('YATUBE_METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 10
+
+# Load shedding: requests per client IP (see CLIENT_IP_HEADER when behind
+# a proxy), concurrent requests per worker process (overall and per group
+# of views), and degraded mode, in which GET requests get a stale copy of
+# a public page or a bare 503. None disables a limit.
+
+REQUEST_RATELIMIT = '1200/m'
+MAX_CONCURRENT_REQUESTS = None
+CONCURRENCY_LIMITS = {
+    'post_detail': {
+        'views': ['posts:post_detail', 'posts:post_comments'],
+        'limit': 20,
+    },
+    'feeds': {
+        'views': [
+            'posts:index', 'posts:group_list', 'posts:profile',
+            'posts:follow_index', 'posts:trending', 'posts:group_trending',
+        ],
+        'limit': 40,
+    },
+}
+DEGRADED_MODE = False
+STALE_PAGE_TIMEOUT = 60 * 60
+STALE_PAGE_REFRESH = 30
@@ -3,6 +3,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import events, metrics
+
 from . import settings
 
 handler404 = 'core.views.page_not_found'
@@ -14,6 +16,9 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path(settings.EVENTS_PATH.lstrip('/'), events, name='events'),
+    path(settings.METRICS_PATH.lstrip('/'), metrics, name='metrics'),
 ]
 
 # if settings.DEBUG: